@@ -0,0 +1,125 @@
+"""HTTP/JSON punch API for badge readers and turnstiles.
+
+    uvicorn attendance_api:app --host 0.0.0.0 --port 8000
+    python attendance_api.py --port 8000 --backend sqlite
+
+A small ASGI app (Starlette) around ``PunchService``, so a reader can punch
+with one request instead of rendering the Streamlit page.  It uses the same
+store and employee registry as the Streamlit app, so kiosk and reader
+punches show up in each other's status checks and on the dashboard.
+
+    POST /punch-in   {"employee_id": "1001"}   201 with the new record
+    POST /punch-out  {"employee_id": "1001"}   200 with the completed record
+    GET  /status/1001                          200 with today's state
+    GET  /health                               200, with the write-behind queue depth
+
+Refused punches answer ``404`` for an unregistered employee ID, ``409`` for
+a punch that conflicts with today's records (the record is included) and
+``400`` for a malformed request.  Any number of worker processes (and
+Streamlit kiosks) may share a store: the service checks and writes each
+punch under the store's cross-process write lock, or with write-behind
+punches leaves a duplicate punch in to be set aside when the queue flushes.
+
+Queued write-behind punches are flushed when the server shuts down; uvicorn
+re-raises SIGTERM once it has stopped, so the queue's atexit hook would not
+get the chance.
+"""
+import argparse
+import os
+import sys
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from attendance_service import PunchError, UnknownEmployeeError, punch_service
+from attendance_storage import BACKENDS, close_stores, store_layers
+
+
+def _error(status_code, message, record=None):
+    return JSONResponse({'error': message, 'record': record}, status_code=status_code)
+
+
+async def _employee_id(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        return None
+    if not isinstance(body, dict):
+        return None
+    emp_id = body.get('employee_id')
+    return str(emp_id).strip() if emp_id is not None else None
+
+
+# Function to run a punch in the thread pool and turn refusals into HTTP errors
+async def _punch(request, punch, status_code):
+    emp_id = await _employee_id(request)
+    if not emp_id:
+        return _error(400, "Expected a JSON body with an employee_id")
+    try:
+        # Store writes block, so they stay off the event loop
+        record = await run_in_threadpool(punch, emp_id)
+    except UnknownEmployeeError as e:
+        return _error(404, str(e))
+    except PunchError as e:
+        return _error(409, str(e), e.record)
+    return JSONResponse(record, status_code=status_code)
+
+
+async def punch_in(request):
+    return await _punch(request, punch_service.punch_in, 201)
+
+
+async def punch_out(request):
+    return await _punch(request, punch_service.punch_out, 200)
+
+
+async def status(request):
+    emp_id = request.path_params['employee_id']
+    if not await run_in_threadpool(punch_service.is_registered, emp_id):
+        return _error(404, f"Employee ID {emp_id} is not registered in the system")
+    result = await run_in_threadpool(punch_service.status, emp_id)
+    return JSONResponse({'employee_id': emp_id, **result})
+
+
+async def health(request):
+    queued = 0
+    for store in store_layers(punch_service.store):
+        if hasattr(store, 'metrics'):
+            queued += store.metrics()['depth']
+    return JSONResponse({'status': 'ok', 'backend': punch_service.store.name, 'queued': queued})
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await run_in_threadpool(close_stores)
+
+
+app = Starlette(routes=[
+    Route('/punch-in', punch_in, methods=['POST']),
+    Route('/punch-out', punch_out, methods=['POST']),
+    Route('/status/{employee_id}', status, methods=['GET']),
+    Route('/health', health, methods=['GET']),
+], lifespan=lifespan)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--backend", choices=sorted(BACKENDS),
+                        default=os.environ.get("AMS_STORAGE_BACKEND", "sqlite"))
+    args = parser.parse_args(argv)
+
+    # get_store reads the backend from the environment
+    os.environ["AMS_STORAGE_BACKEND"] = args.backend
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""Rendered attendance charts, cached.
+
+Charts are drawn on matplotlib ``Figure`` objects directly rather than
+through ``pyplot``, so no figure is ever registered with pyplot's global
+figure manager: each one is dropped as soon as its PNG has been written and
+memory stays flat however often the dashboard refreshes.
+
+Rendered PNGs are kept in an LRU cache keyed on the numbers they show, so
+repeated refreshes (and every kiosk showing the same day) re-use one image
+until a punch changes the counts.
+"""
+import functools
+import io
+
+from matplotlib.figure import Figure
+
+from attendance_metrics import timed
+
+# Rendered charts kept in memory
+CHART_CACHE_ENTRIES = 128
+
+# Resolution charts are rasterised at (matches st.pyplot's default)
+CHART_DPI = 200
+
+
+# Function to rasterise a figure to PNG bytes
+def figure_png(fig):
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', bbox_inches='tight', dpi=CHART_DPI)
+    return buffer.getvalue()
+
+
+# Function to draw the on-time / late pie chart as PNG bytes, once per pair of counts
+@functools.lru_cache(maxsize=CHART_CACHE_ENTRIES)
+@timed("charts.render")
+def punctuality_chart(on_time_count, late_count):
+    fig = Figure(figsize=(4, 4))
+    ax = fig.subplots()
+    ax.pie([on_time_count, late_count],
+           labels=['On Time', 'Late'],
+           autopct='%1.1f%%',
+           colors=['#CCFFCC', '#FFCCCC'],
+           startangle=90)
+    ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
+    ax.set_title('Punctuality Statistics')
+    return figure_png(fig)
+
+
+# Function to report how well the rendered charts are being re-used
+def chart_cache_stats():
+    info = punctuality_chart.cache_info()
+    total = info.hits + info.misses
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'hit_rate': info.hits / total if total else 0.0,
+        'entries': info.currsize
+    }
@@ -0,0 +1,97 @@
+"""Registered employees, cached with an index by employee ID.
+
+``employees.xlsx`` is read once and kept in memory together with a dict
+from normalised employee ID to that employee's row, so checking an ID at
+the punch kiosks and looking up the name are dictionary lookups.  The
+cache is dropped whenever ``save`` writes the workbook; workbooks written
+by another process are noticed through the file's mtime and size, the same
+check the attendance stores use, so a lookup costs one ``stat`` at most.
+"""
+import threading
+
+import pandas as pd
+
+from attendance_metrics import timed
+from attendance_schema import normalize_employee_id
+from attendance_storage import _file_signature, atomic_write
+
+# Define file path for the employee registry
+EMPLOYEES_FILE = "employees.xlsx"
+
+EMPLOYEE_COLUMNS = ['Employee ID', 'Employee Name', 'Date Added']
+
+
+class EmployeeRegistry:
+    """In-memory copy of the registered employees, indexed by employee ID."""
+
+    def __init__(self, path=EMPLOYEES_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._signature = None
+        self._df = None
+        # normalised employee ID -> {'Employee ID': ..., 'Employee Name': ..., ...}
+        self._index = {}
+
+    def _current(self):
+        signature = _file_signature(self.path)
+        with self._lock:
+            if self._df is not None and signature == self._signature:
+                return self._df, self._index
+
+        if signature is None:
+            # Create a new registry file if it doesn't exist
+            # Written atomically: concurrent readers must never see a half-written workbook
+            df = pd.DataFrame(columns=EMPLOYEE_COLUMNS)
+            with atomic_write(self.path) as tmp_path:
+                df.to_excel(tmp_path, index=False)
+            signature = _file_signature(self.path)
+        else:
+            with timed("employees.read_excel"):
+                df = pd.read_excel(self.path)
+        index = {
+            normalize_employee_id(record['Employee ID']): record
+            for record in df.to_dict('records')
+        }
+        with self._lock:
+            self._df, self._index, self._signature = df, index, signature
+        return df, index
+
+    def load(self):
+        """Return the registered employees as a frame the caller may change."""
+        return self._current()[0].copy()
+
+    def save(self, df):
+        """Write the registry and drop the cached copy."""
+        with timed("employees.write_excel"), atomic_write(self.path) as tmp_path:
+            df.to_excel(tmp_path, index=False)
+        self.invalidate()
+
+    def invalidate(self):
+        with self._lock:
+            self._df, self._index, self._signature = None, {}, None
+
+    def get(self, emp_id):
+        """Return the registered employee's row as a dict, or None."""
+        return self._current()[1].get(normalize_employee_id(emp_id))
+
+    def name(self, emp_id, default=None):
+        """Return the registered name for an employee ID."""
+        record = self.get(emp_id)
+        return default if record is None else record['Employee Name']
+
+    def ids(self):
+        """Return the normalised IDs of every registered employee."""
+        return self._current()[1].keys()
+
+    def names(self):
+        """Return a dict of normalised employee ID to registered name."""
+        return {emp_id: record['Employee Name'] for emp_id, record in self._current()[1].items()}
+
+    def __contains__(self, emp_id):
+        return self.get(emp_id) is not None
+
+    def __len__(self):
+        return len(self._current()[0])
+
+
+employee_registry = EmployeeRegistry()
@@ -0,0 +1,114 @@
+"""Streaming attendance exports (CSV, Excel, Parquet).
+
+Exports pull records from ``store.iter_chunks`` and write each chunk before
+reading the next, so memory stays bounded by the chunk size however many
+years or employees the range covers.  Excel exports use openpyxl's
+write-only mode, Parquet exports append one row group per chunk.
+
+Every format carries the strings shown in the app (``to_display``), so the
+three exports hold the same values.
+"""
+import tempfile
+
+from attendance_schema import COLUMNS, to_display
+from attendance_storage import EXPORT_CHUNK_ROWS, StorageError, atomic_write, write_excel_chunks
+
+# Format name -> (MIME type, file extension)
+EXPORT_FORMATS = {
+    'csv': ("text/csv", ".csv"),
+    'xlsx': ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", ".xlsx"),
+    'parquet': ("application/vnd.apache.parquet", ".parquet"),
+}
+
+
+# Function to keep only late (or only on-time) records in each chunk
+def filter_late(chunks, is_late=None):
+    for chunk in chunks:
+        if is_late is not None:
+            chunk = chunk[chunk['Is Late'] == is_late]
+        if not chunk.empty:
+            yield chunk
+
+
+# Function to turn record chunks into CSV bytes, one piece per chunk
+def iter_csv(chunks):
+    header = True
+    for chunk in chunks:
+        yield to_display(chunk)[COLUMNS].to_csv(index=False, header=header).encode('utf-8')
+        header = False
+    if header:
+        # No records: still hand out the header row
+        yield (",".join(COLUMNS) + "\n").encode('utf-8')
+
+
+# Function to write record chunks to a CSV file (a path or a binary file object)
+def write_csv_chunks(chunks, path):
+    if hasattr(path, 'write'):
+        for piece in iter_csv(chunks):
+            path.write(piece)
+        return path
+    with open(path, "wb") as handle:
+        write_csv_chunks(chunks, handle)
+    return path
+
+
+# Function to write record chunks to a Parquet file (or file object), one row group per chunk
+def write_parquet_chunks(chunks, path):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise StorageError("Parquet exports need pyarrow (pip install pyarrow)") from e
+
+    schema = pa.schema([
+        ('Employee ID', pa.string()),
+        ('Employee Name', pa.string()),
+        ('Date', pa.string()),
+        ('Punch In Time', pa.string()),
+        ('Punch Out Time', pa.string()),
+        ('Work Hours', pa.float64()),
+        ('Status', pa.string()),
+        ('Is Late', pa.bool_()),
+    ])
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in chunks:
+            display = to_display(chunk)[COLUMNS]
+            writer.write_table(pa.Table.from_pandas(display, schema=schema, preserve_index=False))
+    return path
+
+
+_WRITERS = {
+    'csv': write_csv_chunks,
+    'xlsx': write_excel_chunks,
+    'parquet': write_parquet_chunks,
+}
+
+
+def _export_chunks(store, fmt, start_date, end_date, employee_ids, is_late, chunk_size):
+    if fmt not in _WRITERS:
+        raise StorageError(f"Unknown export format: {fmt}")
+    return filter_late(store.iter_chunks(start_date, end_date, employee_ids, chunk_size), is_late)
+
+
+# Function to stream records from a store into an export file
+def export_records(store, fmt, path, start_date=None, end_date=None, employee_ids=None,
+                   is_late=None, chunk_size=EXPORT_CHUNK_ROWS):
+    chunks = _export_chunks(store, fmt, start_date, end_date, employee_ids, is_late, chunk_size)
+    with atomic_write(path) as tmp_path:
+        _WRITERS[fmt](chunks, tmp_path)
+    return path
+
+
+# Function to export into an anonymous temporary file, returned rewound for reading
+def export_to_tempfile(store, fmt, start_date=None, end_date=None, employee_ids=None,
+                       is_late=None, chunk_size=EXPORT_CHUNK_ROWS):
+    chunks = _export_chunks(store, fmt, start_date, end_date, employee_ids, is_late, chunk_size)
+    # Removed by the OS as soon as it is closed
+    handle = tempfile.TemporaryFile(prefix="attendance_export.", suffix=EXPORT_FORMATS[fmt][1])
+    try:
+        _WRITERS[fmt](chunks, handle)
+    except BaseException:
+        handle.close()
+        raise
+    handle.seek(0)
+    return handle
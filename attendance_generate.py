@@ -0,0 +1,203 @@
+"""Generate realistic synthetic attendance history for load and scale testing.
+
+    python attendance_generate.py --employees 500 --years 3 --to sqlite
+    python attendance_generate.py --employees 2000 --start 2020-01-01 --end 2024-12-31 --to partitioned --force
+    python attendance_generate.py --employees 50 --years 1 --out history.parquet --seed 7
+
+Each employee is given a shift (day, early, late or night), a punctuality
+profile and an absence rate, then punches on every working day between the
+two dates:
+
+* arrivals scatter around the shift start, and a per-employee share of days
+  (most people rarely, a few often) add an exponentially distributed delay;
+* a small share of days has no punch out (a forgotten swipe), left
+  ``In Progress`` as the kiosk would leave it;
+* night shifts punch out after midnight, which the work-hours rule wraps to
+  the next day.
+
+Lateness and work hours come from the same rules the app applies (the
+single 10:15 cutoff counts every late and night shift punch as late, as
+the app does).  The output depends only on the arguments and ``--seed``,
+so a benchmark or a capacity estimate can be reproduced exactly.
+Everything is built with whole-column numpy operations, so a million
+records take seconds.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from attendance_employees import EMPLOYEE_COLUMNS, EmployeeRegistry, employee_registry
+from attendance_rules import recompute
+from attendance_schema import DATE_FORMAT, SECONDS_PER_DAY, STATUS_IN_PROGRESS, normalize, to_display
+from attendance_storage import BACKENDS, get_store
+
+# Shift name -> (start, hours) and the share of employees working it
+SHIFTS = {
+    'day': (9 * 3600 + 30 * 60, 8.5),
+    'early': (7 * 3600, 8.0),
+    'late': (13 * 3600, 8.0),
+    'night': (22 * 3600, 8.0),
+}
+SHIFT_MIX = {'day': 0.7, 'early': 0.12, 'late': 0.12, 'night': 0.06}
+
+# Arrivals: minutes of scatter around the shift start, and the mean delay on a late day
+ARRIVAL_SPREAD_MINUTES = 12
+LATE_DELAY_MINUTES = 25
+
+# Per-employee share of late days is Beta distributed: mostly low, a long tail
+LATE_RATE_SHAPE = (1.2, 9.0)
+
+# Per-employee share of working days absent (holidays, sick days)
+ABSENCE_RATE_SHAPE = (2.0, 30.0)
+
+# Share of days without a punch out
+MISSING_PUNCH_OUT_RATE = 0.02
+
+# Minutes of scatter around the end of the shift
+DEPARTURE_SPREAD_MINUTES = 20
+
+FIRST_NAMES = ["Aarav", "Priya", "Rahul", "Ananya", "Vikram", "Sneha", "Arjun", "Kavya", "Rohan", "Meera",
+               "Karan", "Isha", "Nikhil", "Pooja", "Sanjay", "Divya", "Amit", "Neha", "Ravi", "Shreya"]
+LAST_NAMES = ["Sharma", "Patel", "Iyer", "Reddy", "Gupta", "Nair", "Singh", "Khan", "Das", "Mehta",
+              "Joshi", "Rao", "Kapoor", "Menon", "Verma", "Bose", "Pillai", "Kulkarni", "Chopra", "Shah"]
+
+
+# Function to build the synthetic employees: ID, name, shift and behaviour profile
+def generate_employees(count, seed=0):
+    rng = np.random.default_rng([seed, 0])
+    shifts = list(SHIFT_MIX)
+    return pd.DataFrame({
+        'Employee ID': [f"{1001 + i}" for i in range(count)],
+        'Employee Name': [f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}" for _ in range(count)],
+        'Shift': rng.choice(shifts, size=count, p=[SHIFT_MIX[s] for s in shifts]),
+        'Late Rate': rng.beta(*LATE_RATE_SHAPE, size=count),
+        'Absence Rate': rng.beta(*ABSENCE_RATE_SHAPE, size=count),
+    })
+
+
+# Function to generate the attendance records of ``employees`` between two dates (inclusive)
+def generate_history(employees, start, end, seed=0):
+    rng = np.random.default_rng([seed, 1])
+    days = pd.bdate_range(start, end)
+    count = len(employees)
+
+    # One candidate row per employee and working day, employee-major within each day
+    employee = np.tile(np.arange(count), len(days))
+    day = np.repeat(days.to_numpy(), count)
+    present = rng.random(len(employee)) >= employees['Absence Rate'].to_numpy()[employee]
+    employee, day = employee[present], day[present]
+    rows = len(employee)
+
+    shift_start = employees['Shift'].map(lambda s: SHIFTS[s][0]).to_numpy()[employee]
+    shift_hours = employees['Shift'].map(lambda s: SHIFTS[s][1]).to_numpy()[employee]
+
+    late_day = rng.random(rows) < employees['Late Rate'].to_numpy()[employee]
+    arrival = rng.normal(-5, ARRIVAL_SPREAD_MINUTES, rows) + late_day * rng.exponential(LATE_DELAY_MINUTES, rows)
+    punch_in = (shift_start + arrival * 60).round().astype('int64') % SECONDS_PER_DAY
+
+    stay = shift_hours * 3600 + rng.normal(0, DEPARTURE_SPREAD_MINUTES * 60, rows)
+    # Late arrivals make up some of the lost time
+    stay += np.where(late_day, arrival * 60 * 0.5, 0)
+    punch_out = (punch_in + stay.round().astype('int64')) % SECONDS_PER_DAY
+    forgot = rng.random(rows) < MISSING_PUNCH_OUT_RATE
+
+    records = normalize(pd.DataFrame({
+        'Employee ID': employees['Employee ID'].to_numpy()[employee],
+        'Employee Name': employees['Employee Name'].to_numpy()[employee],
+        'Date': day,
+        'Punch In Time': punch_in,
+        'Punch Out Time': pd.Series(punch_out).where(~forgot).to_numpy(),
+        'Work Hours': np.nan,
+        'Status': STATUS_IN_PROGRESS,
+        'Is Late': False,
+    }))
+    return recompute(records)
+
+
+# Function to generate about ``size`` records ending on ``end`` (the most recent days)
+def generate_records(size, employees=500, end=None, seed=0):
+    end = pd.Timestamp(end or date.today() - timedelta(days=1))
+    people = generate_employees(employees, seed)
+    # Enough working days for the size even after absences, then keep the latest records
+    days = int(size / employees / (1 - people['Absence Rate'].mean()) * 1.1) + 1
+    start = end - pd.offsets.BDay(days)
+    history = generate_history(people, start, end, seed)
+    return history.tail(size).reset_index(drop=True).rename_axis(history.index.name)
+
+
+# Function to write generated history to a file, by its extension
+def write_file(df, path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        df.to_csv(path, index=False)
+    elif extension == '.parquet':
+        df.to_parquet(path, index=False)
+    elif extension == '.xlsx':
+        df.to_excel(path, index=False)
+    else:
+        raise ValueError(f"Unsupported file type {extension or path!r}: use .csv, .parquet or .xlsx")
+
+
+def _date_range(args):
+    end = pd.Timestamp(args.end) if args.end else pd.Timestamp(date.today() - timedelta(days=1))
+    start = pd.Timestamp(args.start) if args.start else end - timedelta(days=round(365.25 * args.years) - 1)
+    return start, end
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--employees", type=int, default=100)
+    parser.add_argument("--years", type=float, default=1, help="history length, ending yesterday")
+    parser.add_argument("--start", help="first date (YYYY-MM-DD), instead of --years")
+    parser.add_argument("--end", help="last date (YYYY-MM-DD), default yesterday")
+    parser.add_argument("--seed", type=int, default=0)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--to", choices=sorted(BACKENDS), help="store to fill")
+    target.add_argument("--out", help="file to write instead (.csv, .parquet or .xlsx)")
+    parser.add_argument("--force", action="store_true", help="replace records already in the store")
+    parser.add_argument("--register", action="store_true",
+                        help="also add the generated employees to the employee registry")
+    parser.add_argument("--registry", default=employee_registry.path)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    start, end = _date_range(args)
+    employees = generate_employees(args.employees, args.seed)
+    df = generate_history(employees, start, end, args.seed)
+    generated = time.perf_counter() - started
+    print(f"Generated {len(df)} records for {args.employees} employees from "
+          f"{start.strftime(DATE_FORMAT)} to {end.strftime(DATE_FORMAT)} in {generated:.2f}s "
+          f"({df['Is Late'].mean():.1%} late, {(df['Status'] == STATUS_IN_PROGRESS).mean():.1%} without punch out)")
+
+    if args.out:
+        write_file(to_display(df).reset_index(drop=True), args.out)
+        destination = args.out
+    else:
+        # Opened as the app opens it, so a first run still imports the old workbook
+        store = get_store(args.to)
+        existing = store.count()
+        if existing and not args.force:
+            print(f"The {args.to} store already holds {existing} records; use --force to replace them")
+            return 1
+        store.save(df, expected_version=None)
+        destination = f"the {args.to} store"
+
+    if args.register:
+        registry = EmployeeRegistry(args.registry)
+        registered = registry.load()
+        new = employees.loc[~employees['Employee ID'].isin(registry.ids()), ['Employee ID', 'Employee Name']]
+        new = new.assign(**{'Date Added': start.strftime(DATE_FORMAT)})[EMPLOYEE_COLUMNS]
+        registry.save(pd.concat([registered, new], ignore_index=True))
+        print(f"Registered {len(new)} employees in {args.registry}")
+
+    print(f"Wrote {len(df)} records to {destination} in {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
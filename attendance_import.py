@@ -0,0 +1,225 @@
+"""Bulk import of employees and of raw punch events from CSV or Excel files.
+
+    python attendance_import.py employees new_hires.xlsx
+    python attendance_import.py punches device_log_2025-05.csv --to sqlite
+    python attendance_import.py punches gate.csv --allow-unregistered
+
+Employee files need ``Employee ID`` and ``Employee Name`` columns
+(``Date Added`` is optional and defaults to today).  Punch files hold one
+row per swipe from a biometric device: ``Employee ID`` plus either a
+``Timestamp`` column or separate ``Date`` and ``Time`` columns.  Each
+employee's first swipe of a day becomes the punch in and the last one (if
+there are two or more) the punch out; lateness and work hours follow the
+usual rules.
+
+Both imports validate and deduplicate whole columns at once, within the
+file and against what is already stored, then write everything in one go:
+one registry save for employees, one ``insert_many`` batch (one journal
+entry, one SQLite transaction) for punches.  Days already recorded for an
+employee are skipped, so re-importing the same log is harmless; they are
+looked up in the store's punch index under its write lock, so a kiosk
+punching in during the import is never doubled either.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from attendance_employees import EMPLOYEE_COLUMNS, employee_registry
+from attendance_rules import recompute
+from attendance_schema import (
+    COLUMNS,
+    DATE_FORMAT,
+    STATUS_IN_PROGRESS,
+    normalize,
+    to_display,
+)
+from attendance_storage import BACKENDS, file_lock, get_store
+
+
+# Function to read an uploaded or on-disk CSV/XLSX file with every column as text
+def read_table(source, name=None):
+    name = name or getattr(source, 'name', None) or str(source)
+    extension = os.path.splitext(name)[1].lower()
+    if extension == '.csv':
+        df = pd.read_csv(source, dtype=str, skipinitialspace=True)
+    elif extension in ('.xlsx', '.xls'):
+        df = pd.read_excel(source, dtype=str)
+    else:
+        raise ValueError(f"Unsupported file type {extension or name!r}: use .csv or .xlsx")
+    df.columns = [str(c).strip() for c in df.columns]
+    return df
+
+
+def _require(df, columns):
+    missing = [c for c in columns if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+
+
+# Function to normalise a whole column of employee IDs (as normalize_employee_id does)
+def clean_employee_ids(series):
+    ids = series.astype('string').str.strip()
+    # Excel hands whole numbers back as 1001.0
+    ids = ids.str.replace(r'^(\d+)\.0+$', r'\1', regex=True).fillna('')
+    # Plain Python strings hash far faster than Arrow strings in isin/groupby
+    return ids.astype(object)
+
+
+def _clean_text(series):
+    return series.astype('string').str.strip().fillna('')
+
+
+# Function to add the new, valid and unique employees from a file to the registry
+def import_employees(source, name=None, registry=employee_registry, today=None):
+    df = read_table(source, name)
+    _require(df, ['Employee ID', 'Employee Name'])
+    today = today or datetime.now().strftime(DATE_FORMAT)
+
+    ids = clean_employee_ids(df['Employee ID'])
+    names = _clean_text(df['Employee Name'])
+    added_on = _clean_text(df['Date Added']) if 'Date Added' in df.columns else pd.Series('', index=df.index)
+
+    invalid = ids.eq('') | names.eq('')
+    repeated = ~invalid & ids.duplicated(keep='first')
+
+    # The registry is re-read under the lock so concurrent imports don't overwrite each other
+    with file_lock(registry.path):
+        registered = ~invalid & ~repeated & ids.isin(registry.ids())
+        new = ~(invalid | repeated | registered)
+        added = pd.DataFrame({
+            'Employee ID': ids[new].astype(object),
+            'Employee Name': names[new].astype(object),
+            'Date Added': added_on[new].where(added_on[new] != '', today).astype(object),
+        }, columns=EMPLOYEE_COLUMNS)
+        if not added.empty:
+            registry.save(pd.concat([registry.load(), added], ignore_index=True))
+
+    return {
+        'rows': len(df),
+        'added': int(new.sum()),
+        'already_registered': int(registered.sum()),
+        'duplicates': int(repeated.sum()),
+        'invalid': int(invalid.sum()),
+    }
+
+
+# Function to turn raw device swipes into one attendance record per employee and day
+def punches_to_records(df, registry=employee_registry, allow_unregistered=False):
+    _require(df, ['Employee ID'])
+    if 'Timestamp' in df.columns:
+        text = _clean_text(df['Timestamp'])
+    else:
+        _require(df, ['Date', 'Time'])
+        text = _clean_text(df['Date']) + ' ' + _clean_text(df['Time'])
+    timestamps = pd.to_datetime(text.where(text.str.strip() != ''), errors='coerce')
+    ids = clean_employee_ids(df['Employee ID'])
+
+    invalid = ids.eq('') | timestamps.isna()
+    known = ids.isin(registry.ids())
+    unregistered = ~invalid & ~known if len(registry) and not allow_unregistered else pd.Series(False, index=df.index)
+
+    events = pd.DataFrame({'Employee ID': ids, 'Timestamp': timestamps})[~(invalid | unregistered)]
+    # A device reporting the same swipe twice is one swipe
+    events = events.drop_duplicates()
+    events['Date'] = events['Timestamp'].dt.normalize()
+    events['Seconds'] = (events['Timestamp'] - events['Date']).dt.total_seconds().astype('int64')
+
+    days = events.groupby(['Employee ID', 'Date'], sort=True)['Seconds'].agg(['min', 'max', 'count']).reset_index()
+
+    names = days['Employee ID'].map(registry.names()).astype(object)
+    if 'Employee Name' in df.columns:
+        file_names = pd.Series(_clean_text(df['Employee Name']).to_numpy(), index=ids.to_numpy())
+        file_names = file_names[file_names != ''].groupby(level=0).first()
+        names = names.fillna(days['Employee ID'].map(file_names))
+    names = names.fillna("Unknown")
+
+    records = normalize(pd.DataFrame({
+        'Employee ID': days['Employee ID'].astype(object),
+        'Employee Name': names,
+        'Date': days['Date'],
+        'Punch In Time': days['min'],
+        # A single swipe is a punch in still waiting for its punch out
+        'Punch Out Time': days['max'].where(days['count'] > 1),
+        'Work Hours': np.nan,
+        'Status': STATUS_IN_PROGRESS,
+        'Is Late': False,
+    }))
+    stats = {
+        'events': len(df),
+        'invalid': int(invalid.sum()),
+        'unregistered': int(unregistered.sum()),
+    }
+    return recompute(records), stats
+
+
+# Function to import raw punch events into an attendance store in one batch
+def import_punches(source, store, name=None, registry=employee_registry, allow_unregistered=False):
+    records, stats = punches_to_records(read_table(source, name), registry, allow_unregistered)
+
+    # The check and the insert hold the write lock, so a kiosk (or another
+    # import) cannot punch one of these employee days in between
+    with store.write_lock():
+        # Skip employee days the store already has (kiosk punches or an earlier import)
+        keys = list(zip(records['Employee ID'], records['Date'].dt.strftime(DATE_FORMAT)))
+        recorded = store.punch_index().recorded_days(keys)
+        already = np.array([key in recorded for key in keys], dtype=bool)
+
+        new = to_display(records[~already])[COLUMNS].astype(object)
+        new = new.where(new.notna(), None)
+        if not new.empty:
+            store.insert_many(new.to_dict('records'))
+
+    stats.update({
+        'days': len(records),
+        'already_recorded': int(already.sum()),
+        'added': len(new),
+    })
+    return stats
+
+
+def _print_stats(stats, elapsed):
+    print(", ".join(f"{key.replace('_', ' ')}: {value}" for key, value in stats.items()) + f" ({elapsed:.2f}s)")
+
+
+def employees_command(args):
+    started = time.perf_counter()
+    stats = import_employees(args.file)
+    _print_stats(stats, time.perf_counter() - started)
+    return 0
+
+
+def punches_command(args):
+    started = time.perf_counter()
+    # Opened as the app opens it, so a first run still imports the old workbook
+    stats = import_punches(args.file, get_store(args.to), allow_unregistered=args.allow_unregistered)
+    _print_stats(stats, time.perf_counter() - started)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    employees = commands.add_parser("employees", help="register the employees listed in a CSV/XLSX file")
+    employees.add_argument("file")
+    employees.set_defaults(run=employees_command)
+
+    punches = commands.add_parser("punches", help="import raw punch events from a CSV/XLSX device log")
+    punches.add_argument("file")
+    punches.add_argument("--to", choices=sorted(BACKENDS),
+                         default=os.environ.get("AMS_STORAGE_BACKEND", "sqlite"))
+    punches.add_argument("--allow-unregistered", action="store_true",
+                         help="keep punches from IDs missing from the employee registry")
+    punches.set_defaults(run=punches_command)
+
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
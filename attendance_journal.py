@@ -0,0 +1,487 @@
+"""Write-ahead journal and crash recovery for attendance writes.
+
+``JournaledStore`` wraps a real attendance store.  Every write is appended
+to ``<store path>.journal`` and fsynced before it is applied: punch ins
+(``insert``), punch outs and admin edits (``update``), bulk saves
+(``replace``) and clearing all records (``clear``).  An ``applied`` marker
+follows once the store has the write, or ``aborted`` if it failed.
+
+After ``checkpoint_every`` writes a background thread takes a checkpoint
+and cuts the journal back to the writes made since, so recovery never
+replays much more than that many events and punches never wait for it.
+For most backends the checkpoint is a snapshot of the records in
+``<store path>.checkpoint``, pickled outside the journal lock.  SQLite
+commits every write through its own write-ahead log, so its checkpoint only
+records the journal position.  A bulk save journals just a ``replace``
+marker and is checkpointed as soon as it is applied, instead of writing the
+whole frame into the journal.
+
+On startup ``recover`` compares the journal with the store:
+
+* if the store is missing or cannot be read (e.g. a torn workbook) it is
+  moved aside and rebuilt from the last checkpoint plus the journal (for
+  SQLite, from the journaled writes since the last checkpoint only);
+* otherwise journaled writes without an ``applied`` marker are re-applied.
+  Punch ins already stored for that employee and date are skipped, so a
+  crash between a write and its marker never duplicates a punch.
+
+Whether the store can be read is probed with ``date_bounds``, which does
+not load the records on the SQLite and partitioned backends.
+
+The journal is on by default; set ``AMS_JOURNAL=0`` to switch it off and
+``AMS_CHECKPOINT_EVENTS`` to change how often checkpoints are taken.
+"""
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+from attendance_queue import _json_default
+from attendance_schema import (
+    COLUMNS,
+    RECORD_ID,
+    assign_fields,
+    concat_frames,
+    empty_frame,
+    normalize,
+)
+from attendance_storage import (
+    VERSION_ATTR,
+    AttendanceStore,
+    ConflictError,
+    StorageError,
+    atomic_write,
+    file_lock,
+    quarantine,
+)
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_ENV = "AMS_JOURNAL"
+CHECKPOINT_EVENTS_ENV = "AMS_CHECKPOINT_EVENTS"
+
+DEFAULT_CHECKPOINT_EVENTS = 500
+
+# Journal entries that describe a write; the rest are bookkeeping
+WRITE_OPS = ('insert', 'update', 'replace', 'clear')
+
+
+# Function to check whether attendance writes are journaled
+def journal_enabled():
+    return os.environ.get(JOURNAL_ENV, "1").lower() in ("1", "true", "yes")
+
+
+# Function to turn a journal payload back into a canonical frame
+def _frame_from_payload(payload):
+    index = pd.Index(payload['ids'], name=RECORD_ID)
+    return normalize(pd.DataFrame(payload['rows'], columns=COLUMNS, index=index))
+
+
+# Function to read a journal into its checkpoint, writes and markers
+def read_journal(path):
+    state = {'checkpoint': 0, 'last_lsn': 0, 'events': [], 'applied': {}, 'aborted': set()}
+    if not os.path.exists(path):
+        return state
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                event = json.loads(line)
+            except ValueError:
+                # A torn final line: that write was never acknowledged
+                break
+            op = event.get('op')
+            if op == 'checkpoint':
+                state['checkpoint'] = max(state['checkpoint'], event['lsn'])
+            elif op == 'applied':
+                state['applied'][event['lsn']] = event.get('ids')
+            elif op == 'aborted':
+                state['aborted'].add(event['lsn'])
+            elif op in WRITE_OPS:
+                state['events'].append(event)
+            state['last_lsn'] = max(state['last_lsn'], event.get('lsn', 0))
+    return state
+
+
+# Function to apply one journaled write to an in-memory canonical frame
+def _apply_to_frame(df, event, record_ids=None):
+    op = event['op']
+    if op == 'insert':
+        records = event['records']
+        if not record_ids:
+            start = int(df.index.max()) + 1 if not df.empty else 0
+            record_ids = list(range(start, start + len(records)))
+        inserted = normalize(pd.DataFrame(records, index=pd.Index(record_ids, name=RECORD_ID)))
+        return concat_frames([df, inserted])
+    if op == 'update':
+        for record_id, fields in event['updates']:
+            if record_id in df.index:
+                assign_fields(df, record_id, fields)
+        return df
+    if op == 'replace':
+        # Journals written before replace became a marker carry the frame
+        if 'frame' in event:
+            return _frame_from_payload(event['frame'])
+        logger.warning("Journaled save %s has no records to rebuild from; keeping the records before it",
+                       event['lsn'])
+        return df
+    return empty_frame()
+
+
+class JournaledStore(AttendanceStore):
+    """Attendance store that journals every write before applying it."""
+
+    def __init__(self, store, checkpoint_every=None):
+        self.store = store
+        self.name = store.name
+        self.path = store.path
+        self.journal_path = store.path + ".journal"
+        self.checkpoint_path = store.path + ".checkpoint"
+        self.checkpoint_every = checkpoint_every or int(
+            os.environ.get(CHECKPOINT_EVENTS_ENV, DEFAULT_CHECKPOINT_EVENTS)
+        )
+
+        self._lsn = 0
+        self._since_checkpoint = 0
+        self._checkpoint_due = threading.Event()
+        self._checkpointer = None
+        self._stopping = False
+        # Journal size after this process last touched it; if another process
+        # wrote since, the position is re-read
+        self._journal_size = None
+
+        self._stats = {
+            'replayed': 0,
+            'rebuilt': False,
+            'checkpoints': 0,
+            'last_checkpoint_ms': 0.0,
+        }
+
+    def start(self):
+        self.recover()
+        if self._checkpointer is None:
+            self._stopping = False
+            self._checkpointer = threading.Thread(target=self._run_checkpoints, name="journal-checkpointer",
+                                                  daemon=True)
+            self._checkpointer.start()
+            atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        # A checkpoint in progress is finished; a due one is left to the next start
+        self._stopping = True
+        self._checkpoint_due.set()
+        if self._checkpointer is not None:
+            self._checkpointer.join()
+            self._checkpointer = None
+
+    def _run_checkpoints(self):
+        while True:
+            self._checkpoint_due.wait()
+            self._checkpoint_due.clear()
+            if self._stopping:
+                return
+            try:
+                self.checkpoint()
+            except Exception:
+                logger.exception("Journal checkpoint of %s failed; retrying after the next writes", self.store.path)
+
+    def journal_lock(self):
+        """Return the lock serialising journal appends across processes."""
+        return file_lock(self.journal_path)
+
+    # Journal file
+
+    def _sync_position(self):
+        size = os.path.getsize(self.journal_path) if os.path.exists(self.journal_path) else 0
+        if size == self._journal_size:
+            return
+        state = read_journal(self.journal_path)
+        self._lsn = state['last_lsn']
+        self._since_checkpoint = len(state['events'])
+        self._journal_size = size
+
+    def _append(self, event, sync=True):
+        with open(self.journal_path, "a", encoding="utf-8") as handle:
+            handle.write(json.dumps(event, default=_json_default) + "\n")
+            handle.flush()
+            if sync:
+                os.fsync(handle.fileno())
+            self._journal_size = handle.tell()
+
+    def _write(self, event, apply):
+        with self.journal_lock():
+            self._sync_position()
+            self._lsn += 1
+            event['lsn'] = self._lsn
+            # The write is durable once this returns
+            self._append(event)
+            try:
+                result = apply()
+            except BaseException:
+                self._append({'op': 'aborted', 'lsn': event['lsn']}, sync=False)
+                raise
+            # Losing this marker in a crash only means the write is re-applied
+            self._append({'op': 'applied', 'lsn': event['lsn'], 'ids': result}, sync=False)
+            self._since_checkpoint += 1
+            if self._since_checkpoint >= self.checkpoint_every:
+                self._checkpoint_due.set()
+            return result
+
+    def _read_checkpoint(self):
+        if not os.path.exists(self.checkpoint_path):
+            return 0, None
+        try:
+            checkpoint = pd.read_pickle(self.checkpoint_path)
+        except Exception as e:
+            logger.warning("Ignoring unreadable checkpoint %s: %s", self.checkpoint_path, e)
+            return 0, None
+        return checkpoint['lsn'], checkpoint['frame']
+
+    def _cut_journal(self, lsn):
+        # Keep only what was journaled after ``lsn``, behind a checkpoint line;
+        # called with the journal lock held
+        kept = []
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, encoding="utf-8") as handle:
+                for line in handle:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        break
+                    if event.get('lsn', 0) > lsn and event.get('op') != 'checkpoint':
+                        kept.append(event)
+        with atomic_write(self.journal_path) as tmp_path:
+            with open(tmp_path, "w", encoding="utf-8") as handle:
+                handle.write(json.dumps({'op': 'checkpoint', 'lsn': lsn}) + "\n")
+                for event in kept:
+                    handle.write(json.dumps(event) + "\n")
+        self._journal_size = os.path.getsize(self.journal_path)
+        self._since_checkpoint = sum(1 for event in kept if event['op'] in WRITE_OPS)
+
+    def _install_checkpoint(self, lsn, tmp_path=None):
+        # Put a snapshot taken at ``lsn`` in place and cut the journal, unless
+        # another process has checkpointed further meanwhile
+        with self.journal_lock():
+            if read_journal(self.journal_path)['checkpoint'] > lsn:
+                if tmp_path is not None:
+                    os.remove(tmp_path)
+                return False
+            if tmp_path is not None:
+                os.replace(tmp_path, self.checkpoint_path)
+            elif os.path.exists(self.checkpoint_path):
+                os.remove(self.checkpoint_path)
+            # Only cut the journal once the snapshot is safely on disk
+            self._cut_journal(lsn)
+            return True
+
+    def _snapshot(self, lsn, df):
+        directory = os.path.dirname(os.path.abspath(self.checkpoint_path))
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(self.checkpoint_path) + ".", suffix=".tmp",
+                                        dir=directory)
+        os.close(fd)
+        try:
+            df = df.copy()
+            df.attrs = {}
+            pd.to_pickle({'lsn': lsn, 'frame': df}, tmp_path)
+            with open(tmp_path, "rb+") as handle:
+                os.fsync(handle.fileno())
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return tmp_path
+
+    def checkpoint(self):
+        """Checkpoint the store and cut the journal back to the writes since.
+
+        The journal lock is only held to note the position and to cut the
+        journal; the snapshot is pickled while punches keep being journaled.
+        """
+        started = time.perf_counter()
+        if self.store.transactional:
+            with self.journal_lock():
+                self._sync_position()
+                installed = self._install_checkpoint(self._lsn)
+        else:
+            # Warm the frame cache so the read under the lock is a copy
+            self.store.load()
+            with self.journal_lock():
+                self._sync_position()
+                lsn = self._lsn
+                df = self.store.load()
+            installed = self._install_checkpoint(lsn, self._snapshot(lsn, df))
+        if installed:
+            self._stats['checkpoints'] += 1
+            self._stats['last_checkpoint_ms'] = (time.perf_counter() - started) * 1000
+
+    # Recovery
+
+    def _apply_to_store(self, event):
+        op = event['op']
+        if op == 'insert':
+            index = self.store.punch_index()
+            records = [
+                record for record in event['records']
+                if index.open_record(record.get('Employee ID'), record.get('Date')) is None
+                and index.completed_record(record.get('Employee ID'), record.get('Date')) is None
+            ]
+            self.store.insert_many(records)
+        elif op == 'update':
+            try:
+                self.store.update_many([(record_id, fields) for record_id, fields in event['updates']])
+            except StorageError as e:
+                logger.warning("Skipping journaled update %s: %s", event['lsn'], e)
+        elif op == 'replace':
+            if 'frame' in event:
+                self.store.save(_frame_from_payload(event['frame']))
+            else:
+                # Only a marker: the save was never acknowledged, so nothing is lost
+                logger.warning("Journaled save %s did not complete and cannot be re-applied", event['lsn'])
+        else:
+            self.store.save(empty_frame())
+
+    def _rebuild(self, base, events, applied):
+        df = base.copy() if base is not None else empty_frame()
+        for event in events:
+            df = _apply_to_frame(df, event, applied.get(event['lsn']))
+        with self.store.write_lock():
+            self.store._save(df)
+            self.store._changed()
+
+    def recover(self):
+        """Bring the store up to date with the journal; returns writes replayed."""
+        with self.journal_lock():
+            state = read_journal(self.journal_path)
+            base_lsn, base = self._read_checkpoint()
+            events = [
+                e for e in state['events']
+                if e['lsn'] > base_lsn and e['lsn'] not in state['aborted']
+            ]
+
+            readable = False
+            if self.store.exists():
+                try:
+                    self.store.date_bounds()
+                    readable = True
+                except Exception as e:
+                    with self.store.write_lock():
+                        quarantine(self.store.path, e)
+
+            if not readable and (base is not None or events):
+                self._rebuild(base, events, state['applied'])
+                replayed = len(events)
+                self._stats['rebuilt'] = True
+                logger.warning("Rebuilt %s from checkpoint %d and %d journaled writes",
+                               self.store.path, base_lsn, replayed)
+            else:
+                if not self.store.exists():
+                    self.store.initialize()
+                pending = [e for e in events if e['lsn'] not in state['applied']]
+                for event in pending:
+                    self._apply_to_store(event)
+                replayed = len(pending)
+                if replayed:
+                    logger.warning("Re-applied %d journaled writes to %s", replayed, self.store.path)
+
+            self._stats['replayed'] += replayed
+            self._journal_size = None
+            self._sync_position()
+            if replayed or (base is None and not self.store.transactional):
+                self._checkpoint_due.set()
+            return replayed
+
+    def journal_stats(self):
+        """Return the journal position, checkpoint counters and recovery results."""
+        stats = dict(self._stats)
+        stats['lsn'] = self._lsn
+        stats['since_checkpoint'] = self._since_checkpoint
+        stats['checkpoint_every'] = self.checkpoint_every
+        return stats
+
+    # Writes go through the journal
+
+    def insert_many(self, records):
+        records = [dict(record) for record in records]
+        if not records:
+            return []
+        return self._write({'op': 'insert', 'records': records},
+                           lambda: self.store.insert_many(records))
+
+    def update_many(self, updates):
+        updates = [(int(record_id), dict(fields)) for record_id, fields in updates if fields]
+        if not updates:
+            return
+        self._write({'op': 'update', 'updates': updates},
+                    lambda: self.store.update_many(updates))
+
+    def save(self, df, expected_version=None):
+        if expected_version is None and df is not None:
+            expected_version = df.attrs.get(VERSION_ATTR)
+        # Cheap early check so retried transactions don't journal stale frames
+        if expected_version is not None and self.store.version() != expected_version:
+            raise ConflictError("Attendance data changed since it was loaded")
+        event = {'op': 'clear' if df is None or df.empty else 'replace'}
+        with self.journal_lock():
+            self._write(event, lambda: self.store.save(df, expected_version))
+            # The journal only holds a marker, so the saved records are
+            # checkpointed before anything else is journaled
+            if self.store.transactional:
+                self._install_checkpoint(event['lsn'])
+            else:
+                self._install_checkpoint(event['lsn'], self._snapshot(event['lsn'], self.store.load()))
+
+    # Reads go straight to the wrapped store
+
+    def version(self):
+        return self.store.version()
+
+    def exists(self):
+        return self.store.exists()
+
+    def initialize(self):
+        # A missing store is rebuilt from the journal before starting empty
+        self.recover()
+        return self.load()
+
+    def load(self, start_date=None, end_date=None):
+        return self.store.load(start_date, end_date)
+
+    def date_bounds(self):
+        return self.store.date_bounds()
+
+    def rollups(self):
+        return self.store.rollups()
+
+    def query(self, *args, **kwargs):
+        return self.store.query(*args, **kwargs)
+
+    def iter_chunks(self, *args, **kwargs):
+        return self.store.iter_chunks(*args, **kwargs)
+
+    def count(self, *args, **kwargs):
+        return self.store.count(*args, **kwargs)
+
+    def page(self, *args, **kwargs):
+        return self.store.page(*args, **kwargs)
+
+    def get(self, *args, **kwargs):
+        return self.store.get(*args, **kwargs)
+
+    def punch_index(self):
+        return self.store.punch_index()
+
+    def resolve_record_id(self, record_id):
+        return self.store.resolve_record_id(record_id)
+
+    def export_excel(self, *args, **kwargs):
+        return self.store.export_excel(*args, **kwargs)
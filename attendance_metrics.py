@@ -0,0 +1,188 @@
+"""Call counts and latency histograms for the hot paths of the app.
+
+``timed(name)`` times a block of code, either as a context manager or as a
+decorator::
+
+    with timed("render.records_grid"):
+        st.dataframe(...)
+
+    @timed("load_data")
+    def load_data(...):
+        ...
+
+Each name keeps a call count, an error count, the total and the slowest
+time and a histogram over fixed buckets, Prometheus style.  Recording one
+call is a bisect and a few additions under a lock, so it is cheap enough
+to leave on everywhere.  Metrics are process-wide: every Streamlit session
+and the punch API add to the same figures, which the Admin Panel shows
+under "Performance".
+
+``metrics.export(path)`` writes everything in the Prometheus text format
+(``.prom``/``.txt``, e.g. for node_exporter's textfile collector) or as
+JSON (``.json``).  With ``AMS_METRICS_FILE`` set, the app rewrites that file
+after every rerun.
+"""
+import bisect
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# File the app exports the metrics to after every rerun, if set
+METRICS_FILE_ENV = "AMS_METRICS_FILE"
+
+# Prefix of every exported Prometheus metric
+PROMETHEUS_PREFIX = "ams"
+
+
+class Timing:
+    """Counts and a latency histogram for one instrumented step."""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        # One counter per bucket plus the overflow (+Inf) bucket
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def observe(self, seconds, failed=False):
+        self.count += 1
+        self.errors += failed
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+    def quantile(self, q):
+        """Estimate a quantile from the histogram, interpolating within a bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            if count and seen + count >= rank:
+                lower = BUCKETS[i - 1] if i else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else self.max
+                return min(self.max, lower + (upper - lower) * (rank - seen) / count)
+            seen += count
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'total_seconds': self.total,
+            'mean_seconds': self.total / self.count if self.count else 0.0,
+            'max_seconds': self.max,
+            'p50_seconds': self.quantile(0.5),
+            'p95_seconds': self.quantile(0.95),
+            'p99_seconds': self.quantile(0.99),
+            'buckets': {
+                **{str(bound): count for bound, count in zip(BUCKETS, self.buckets)},
+                '+Inf': self.buckets[-1]
+            }
+        }
+
+
+class Metrics:
+    """Process-wide registry of ``Timing`` by step name."""
+
+    def __init__(self):
+        self._timings = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def observe(self, name, seconds, failed=False):
+        with self._lock:
+            timing = self._timings.get(name)
+            if timing is None:
+                timing = self._timings[name] = Timing()
+            timing.observe(seconds, failed)
+
+    def snapshot(self):
+        """Return a dict of step name -> figures, safe to read while calls go on."""
+        with self._lock:
+            return {name: timing.to_dict() for name, timing in sorted(self._timings.items())}
+
+    def reset(self):
+        with self._lock:
+            self._timings.clear()
+            self.started = time.time()
+
+    def to_json(self):
+        return json.dumps({'started': self.started, 'steps': self.snapshot()}, indent=2)
+
+    def to_prometheus(self):
+        """Return the metrics in the Prometheus text exposition format."""
+        duration = f"{PROMETHEUS_PREFIX}_step_duration_seconds"
+        errors = f"{PROMETHEUS_PREFIX}_step_errors_total"
+        steps = self.snapshot()
+        lines = [
+            f"# HELP {duration} Time spent in an instrumented step of the attendance app.",
+            f"# TYPE {duration} histogram",
+        ]
+        for name, timing in steps.items():
+            label = _label(name)
+            cumulative = 0
+            for bound, count in timing['buckets'].items():
+                cumulative += count
+                lines.append(f'{duration}_bucket{{step="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'{duration}_sum{{step="{label}"}} {timing["total_seconds"]:.6f}')
+            lines.append(f'{duration}_count{{step="{label}"}} {timing["count"]}')
+        lines += [
+            f"# HELP {errors} Instrumented calls that raised an exception.",
+            f"# TYPE {errors} counter",
+        ]
+        lines += [f'{errors}{{step="{_label(name)}"}} {timing["errors"]}' for name, timing in steps.items()]
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """Write the metrics to ``path``: JSON for ``.json``, Prometheus text otherwise."""
+        text = self.to_json() if path.lower().endswith('.json') else self.to_prometheus()
+        # Written to a temporary file first so a scraper never reads half a file
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".metrics-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as handle:
+                handle.write(text)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+
+
+def _label(name):
+    return name.replace('\\', '\\\\').replace('"', '\\"')
+
+
+metrics = Metrics()
+
+
+# Function to time a block or, used as a decorator, every call of a function
+@contextmanager
+def timed(name):
+    started = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except Exception:
+        failed = True
+        raise
+    finally:
+        # Streamlit's st.rerun/st.stop are BaseExceptions: timed, not counted as errors
+        metrics.observe(name, time.perf_counter() - started, failed)
+
+
+# Function to export the metrics to the file named by AMS_METRICS_FILE, if set
+def export_configured():
+    path = os.environ.get(METRICS_FILE_ENV)
+    if path:
+        return metrics.export(path)
+    return None
@@ -0,0 +1,97 @@
+"""Move attendance history between the Excel workbook and the other backends.
+
+    python attendance_migrate.py import-excel --to partitioned
+    python attendance_migrate.py import-excel --to arrow --excel old_data.xlsx --force
+    python attendance_migrate.py export-excel --from partitioned --excel hr_report.xlsx
+    python attendance_migrate.py export --from sqlite --format parquet --out 2024.parquet --start 2024-01-01 --end 2024-12-31
+
+``import-excel`` is a one-shot migration of ``attendence_data.xlsx`` (old
+break-based workbooks included) into a columnar or SQLite store; it refuses
+to overwrite a store that already has records unless ``--force`` is given.
+``export-excel`` writes the colour-coded workbook HR works from; ``export``
+streams any date range to CSV, XLSX or Parquet a chunk at a time.
+"""
+import argparse
+import sys
+import time
+
+from attendance_export import EXPORT_FORMATS, export_records
+from attendance_journal import JournaledStore, journal_enabled
+from attendance_storage import BACKENDS, EXCEL_FILE, read_legacy_excel
+
+
+# Function to open a store without its automatic first-start Excel import
+def open_store(backend):
+    store = BACKENDS[backend]()
+    if hasattr(store, 'legacy_excel'):
+        store.legacy_excel = None
+    if journal_enabled():
+        store = JournaledStore(store).start()
+    return store
+
+
+def import_excel(args):
+    started = time.perf_counter()
+    df = read_legacy_excel(args.excel)
+    store = open_store(args.to)
+
+    existing = len(store.load())
+    if existing and not args.force:
+        print(f"The {args.to} store already holds {existing} records; use --force to replace them")
+        return 1
+
+    store.save(df, expected_version=None)
+    elapsed = time.perf_counter() - started
+    print(f"Imported {len(df)} records from {args.excel} into the {args.to} store in {elapsed:.2f}s")
+    return 0
+
+
+def export_excel(args):
+    started = time.perf_counter()
+    store = open_store(getattr(args, 'from'))
+    store.export_excel(args.excel)
+    elapsed = time.perf_counter() - started
+    print(f"Exported {len(store.load())} records to {args.excel} in {elapsed:.2f}s")
+    return 0
+
+
+def export_records_command(args):
+    started = time.perf_counter()
+    store = open_store(getattr(args, 'from'))
+    export_records(store, args.format, args.out, start_date=args.start, end_date=args.end,
+                   employee_ids=args.employee or None)
+    elapsed = time.perf_counter() - started
+    print(f"Exported {args.format.upper()} to {args.out} in {elapsed:.2f}s")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    importer = commands.add_parser("import-excel", help="migrate an attendance workbook into a store")
+    importer.add_argument("--to", choices=sorted(b for b in BACKENDS if b != "excel"), default="partitioned")
+    importer.add_argument("--excel", default=EXCEL_FILE)
+    importer.add_argument("--force", action="store_true", help="replace records already in the store")
+    importer.set_defaults(run=import_excel)
+
+    exporter = commands.add_parser("export-excel", help="write a store out as a formatted workbook")
+    exporter.add_argument("--from", choices=sorted(BACKENDS), default="partitioned")
+    exporter.add_argument("--excel", default="attendance_export.xlsx")
+    exporter.set_defaults(run=export_excel)
+
+    streamer = commands.add_parser("export", help="stream records to CSV, XLSX or Parquet with bounded memory")
+    streamer.add_argument("--from", choices=sorted(BACKENDS), default="partitioned")
+    streamer.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="csv")
+    streamer.add_argument("--out", required=True)
+    streamer.add_argument("--start", help="first date (YYYY-MM-DD)")
+    streamer.add_argument("--end", help="last date (YYYY-MM-DD)")
+    streamer.add_argument("--employee", action="append", help="employee ID (repeatable)")
+    streamer.set_defaults(run=export_records_command)
+
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,261 @@
+"""Opt-in profiling of page renders, kept on disk for the Admin Panel.
+
+``profiled(name)`` wraps a block or, as a decorator, a function the way
+``timed`` does, but only does anything while profiling is switched on for
+that name: either ``AMS_PROFILE`` names it when the process starts
+(``AMS_PROFILE=view_reports_page``, several names comma separated,
+``AMS_PROFILE=main`` for whole reruns, ``AMS_PROFILE=all`` for every
+instrumented step) or an admin switches it on in the Performance tab.
+Otherwise it costs one set lookup.
+
+pyinstrument is used when it is installed (a sampling profiler, cheap
+enough to leave running for a while), cProfile otherwise.  Each profile
+keeps:
+
+* ``.folded``: collapsed stacks (``frame;frame;frame weight``, weights in
+  microseconds) for ``flamegraph.pl``, speedscope or inferno;
+* ``.txt``: a plain-text summary of where the time went;
+* ``.pstats`` (cProfile, for snakeviz or ``python -m pstats``) or ``.html``
+  (pyinstrument's own viewer).
+
+cProfile records calls rather than stacks, so its collapsed stacks share
+each function's time out between its callers pro rata, as flameprof
+does.  Only one render is profiled at a time: a render that starts while
+another is being profiled, or inside one, runs unprofiled.  The last
+``AMS_PROFILE_KEEP`` profiles (20 by default) are kept in ``profiles/``.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+# Directory the profiles are written to
+PROFILE_DIR = "profiles"
+
+# Steps to profile from startup, and how many profiles to keep
+PROFILE_ENV = "AMS_PROFILE"
+PROFILE_KEEP_ENV = "AMS_PROFILE_KEEP"
+DEFAULT_KEEP = 20
+
+# Profile every instrumented step
+ALL_STEPS = "all"
+
+# pyinstrument sampling interval, in seconds
+SAMPLE_INTERVAL = 0.001
+
+# Collapsed-stack weights are whole microseconds; smaller shares are dropped
+MIN_WEIGHT = 1
+
+# Deepest call chain followed when turning cProfile output into stacks
+MAX_STACK_DEPTH = 100
+
+# Functions listed in the text summary
+SUMMARY_FUNCTIONS = 40
+
+
+# Function to pick the profiler: pyinstrument when installed, cProfile otherwise
+def available_engine():
+    try:
+        import pyinstrument  # noqa: F401
+    except ImportError:
+        return 'cprofile'
+    return 'pyinstrument'
+
+
+def _frame_label(filename, line, function):
+    if filename == '~':
+        # Built-in functions: cProfile reports them as "<built-in method ...>"
+        return function
+    return f"{function} ({os.path.basename(filename)}:{line})"
+
+
+# Function to turn cProfile statistics into collapsed stacks: each function's
+# own and callees' time is shared between its callers in proportion to the
+# time spent under each of them
+def cprofile_stacks(stats):
+    entries = stats.stats
+    callees = defaultdict(list)
+    for function, (_, _, _, _, callers) in entries.items():
+        for caller, edge in callers.items():
+            callees[caller].append((function, edge[3]))
+
+    stacks = defaultdict(int)
+
+    def walk(function, weight, path):
+        _, _, own, total, _ = entries[function]
+        if total <= 0 or len(path) > MAX_STACK_DEPTH:
+            return
+        share = weight / total
+        path = path + (_frame_label(*function),)
+        stacks[path] += own * share
+        for callee, cumulative in callees[function]:
+            # Recursion was already counted in the caller's own frame
+            if callee in entries and _frame_label(*callee) not in path and cumulative * share * 1e6 >= MIN_WEIGHT:
+                walk(callee, cumulative * share, path)
+
+    for function, (_, _, _, total, callers) in entries.items():
+        if not callers:
+            walk(function, total, ())
+    return _collapsed(stacks)
+
+
+# Function to turn a pyinstrument session into collapsed stacks
+def pyinstrument_stacks(session):
+    stacks = defaultdict(int)
+
+    def walk(frame, path):
+        path = path + (_frame_label(frame.file_path_short or '~', frame.line_no, frame.function),)
+        own = frame.time - sum(child.time for child in frame.children)
+        stacks[path] += own
+        for child in frame.children:
+            walk(child, path)
+
+    root = session.root_frame()
+    if root is not None:
+        walk(root, ())
+    return _collapsed(stacks)
+
+
+def _collapsed(stacks):
+    lines = []
+    for path, seconds in stacks.items():
+        weight = round(seconds * 1e6)
+        if weight >= MIN_WEIGHT:
+            lines.append(f"{';'.join(frame.replace(';', ':') for frame in path)} {weight}")
+    return "\n".join(sorted(lines)) + "\n"
+
+
+class Profiler:
+    """Profiles the steps it is switched on for and keeps the last profiles on disk."""
+
+    def __init__(self, directory=PROFILE_DIR, keep=None, steps=None):
+        self.directory = directory
+        self.keep = keep or int(os.environ.get(PROFILE_KEEP_ENV, DEFAULT_KEEP))
+        if steps is None:
+            steps = os.environ.get(PROFILE_ENV, "")
+        self.steps = {step.strip() for step in steps.split(",") if step.strip()}
+        self.engine = available_engine()
+        # One profile at a time: profilers hook the interpreter, not a thread
+        self._active = threading.Lock()
+        self._files_lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.steps)
+
+    def wants(self, name):
+        return name in self.steps or ALL_STEPS in self.steps
+
+    @contextmanager
+    def profile(self, name):
+        """Profile the block if profiling is on for ``name`` and no other profile is running."""
+        if not self.wants(name) or not self._active.acquire(blocking=False):
+            yield
+            return
+        try:
+            started = time.time()
+            runner = self._start()
+            try:
+                yield
+            finally:
+                self._stop(runner)
+                self._save(name, started, time.time() - started, runner)
+        finally:
+            self._active.release()
+
+    def _start(self):
+        if self.engine == 'pyinstrument':
+            from pyinstrument import Profiler as SamplingProfiler
+            runner = SamplingProfiler(interval=SAMPLE_INTERVAL)
+            runner.start()
+        else:
+            runner = cProfile.Profile()
+            runner.enable()
+        return runner
+
+    def _stop(self, runner):
+        if self.engine == 'pyinstrument':
+            runner.stop()
+        else:
+            runner.disable()
+
+    def _save(self, name, started, seconds, runner):
+        profile_id = f"{datetime.fromtimestamp(started).strftime('%Y%m%d-%H%M%S-%f')}-{name}"
+        base = os.path.join(self.directory, profile_id)
+        os.makedirs(self.directory, exist_ok=True)
+        files = [f"{profile_id}.folded", f"{profile_id}.txt"]
+        if self.engine == 'pyinstrument':
+            session = runner.last_session
+            folded = pyinstrument_stacks(session)
+            summary = runner.output_text()
+            with open(f"{base}.html", "w", encoding="utf-8") as handle:
+                handle.write(runner.output_html())
+            files.append(f"{profile_id}.html")
+        else:
+            stats = pstats.Stats(runner)
+            folded = cprofile_stacks(stats)
+            stats.dump_stats(f"{base}.pstats")
+            files.append(f"{profile_id}.pstats")
+            buffer = io.StringIO()
+            pstats.Stats(runner, stream=buffer).sort_stats('cumulative').print_stats(SUMMARY_FUNCTIONS)
+            summary = buffer.getvalue()
+        with open(f"{base}.folded", "w", encoding="utf-8") as handle:
+            handle.write(folded)
+        with open(f"{base}.txt", "w", encoding="utf-8") as handle:
+            handle.write(summary)
+
+        # The metadata is written last: a listed profile has all its files
+        info = {'id': profile_id, 'step': name, 'engine': self.engine,
+                'started': started, 'seconds': seconds, 'files': files}
+        with open(f"{base}.json", "w", encoding="utf-8") as handle:
+            json.dump(info, handle)
+        self._prune()
+        return info
+
+    def profiles(self):
+        """Return the kept profiles, newest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        found = []
+        for filename in sorted(os.listdir(self.directory), reverse=True):
+            if filename.endswith(".json"):
+                try:
+                    with open(os.path.join(self.directory, filename), encoding="utf-8") as handle:
+                        found.append(json.load(handle))
+                except (OSError, ValueError):
+                    continue
+        return found
+
+    def path(self, filename):
+        return os.path.join(self.directory, filename)
+
+    def read(self, filename):
+        """Return the contents of one of the kept profile files."""
+        with open(self.path(filename), 'rb') as handle:
+            return handle.read()
+
+    def _prune(self):
+        with self._files_lock:
+            for info in self.profiles()[self.keep:]:
+                for filename in info['files'] + [f"{info['id']}.json"]:
+                    try:
+                        os.remove(self.path(filename))
+                    except FileNotFoundError:
+                        pass
+
+
+profiler = Profiler()
+
+
+# Function to profile a block or, used as a decorator, every call of a function,
+# while profiling is switched on for ``name``
+@contextmanager
+def profiled(name):
+    with profiler.profile(name):
+        yield
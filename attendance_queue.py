@@ -0,0 +1,694 @@
+"""Write-behind punch queue for the morning rush.
+
+``QueuedStore`` wraps a real attendance store.  A punch (insert or update) is
+acknowledged as soon as it has been appended and fsynced to a small
+per-process journal; a background thread then merges queued punches into the
+wrapped store in batches, every ``interval_ms`` milliseconds or as soon as
+``max_batch`` punches are waiting.  A batch is one ``insert_many`` of its
+punch ins and one ``update_many`` of its punch outs and edits, under one
+hold of the store's write lock, however the two are interleaved.
+
+Queued punches are visible straight away: ``load``, ``query``,
+``iter_chunks``, ``count``, ``page`` and ``punch_index`` overlay them on what
+the wrapped store returns, so queries, exports and the records grids stay
+pushed down to it, and punches that are still queued carry provisional
+negative record ids.
+
+If a process dies with punches still queued, the next process to start finds
+its journal (the owner no longer holds the journal lock) and replays it into
+the store.  Replayed punch-ins are skipped when the store already has a
+record for that employee and date, so a crash between a flush and its
+journal marker does not duplicate punches.
+
+Punches are checked against the queue and the store's punch index without
+taking the store's write lock (``punch_lock`` is a no-op here), so a kiosk
+never waits for a flush.  Two processes may therefore both accept a punch
+in for the same employee; flushes write under the write lock and check
+again, so the later punch in is dead-lettered and punches made against it
+go to the record that was stored first.
+
+Updates are journaled with the real record id once the punch in they
+change has been flushed, and each flush marker lists the record ids its
+punch ins were given, so a replay maps updates queued before that flush
+too.
+
+A queued update the store refuses (its record no longer exists) is logged
+and appended to ``attendance_queue.dead_letter.jsonl`` instead of being
+retried, so it can never hold up the punches queued after it, nor the
+recovery of an orphaned journal at startup.
+
+Enable it with ``AMS_WRITE_BEHIND=1``; ``AMS_FLUSH_INTERVAL_MS`` and
+``AMS_FLUSH_BATCH`` tune the flush policy.
+"""
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+import pandas as pd
+
+from attendance_schema import (
+    RECORD_ID,
+    assign_fields,
+    concat_frames,
+    display_values,
+    filter_dates,
+    normalize,
+    normalize_employee_id,
+)
+from attendance_storage import (
+    EXPORT_CHUNK_ROWS,
+    PAGE_ROWS,
+    VERSION_ATTR,
+    AttendanceStore,
+    PunchIndex,
+    StorageError,
+    _check_sort_column,
+    _sort_records,
+    _try_lock,
+    _unlock,
+)
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_ENV = "AMS_WRITE_BEHIND"
+FLUSH_INTERVAL_ENV = "AMS_FLUSH_INTERVAL_MS"
+FLUSH_BATCH_ENV = "AMS_FLUSH_BATCH"
+
+DEFAULT_FLUSH_INTERVAL_MS = 200
+DEFAULT_FLUSH_BATCH = 100
+
+JOURNAL_PATTERN = "attendance_queue.*.journal"
+
+# Queued events the store refused, kept for an admin to look at
+DEAD_LETTER_FILE = "attendance_queue.dead_letter.jsonl"
+
+# How many recent provisional ids are remembered after they are flushed
+RESOLVED_ID_LIMIT = 10000
+
+
+class FlushPolicy:
+    """When the background flusher merges queued punches into the store."""
+
+    def __init__(self, interval_ms=DEFAULT_FLUSH_INTERVAL_MS, max_batch=DEFAULT_FLUSH_BATCH):
+        self.interval_ms = interval_ms
+        self.max_batch = max_batch
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            interval_ms=int(os.environ.get(FLUSH_INTERVAL_ENV, DEFAULT_FLUSH_INTERVAL_MS)),
+            max_batch=int(os.environ.get(FLUSH_BATCH_ENV, DEFAULT_FLUSH_BATCH))
+        )
+
+
+# Function to check whether write-behind punches are switched on
+def write_behind_enabled():
+    return os.environ.get(WRITE_BEHIND_ENV, "0").lower() in ("1", "true", "yes")
+
+
+def _json_default(value):
+    # numpy scalars and other odd values coming from frames
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+class PunchJournal:
+    """Append-only, fsynced JSON-lines log of queued punch events.
+
+    The owning process holds an advisory lock on ``<path>.lock`` for as long
+    as the journal is open, which is how recovery tells live journals from
+    orphaned ones.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._handle = None
+        self._lock_handle = None
+
+    def open(self):
+        self._lock_handle = open(self.path + ".lock", "a+b")
+        try:
+            _try_lock(self._lock_handle)
+        except OSError:
+            self._lock_handle.close()
+            self._lock_handle = None
+            raise
+        self._handle = open(self.path, "a", encoding="utf-8")
+
+    def append(self, event):
+        self._handle.write(json.dumps(event, default=_json_default) + "\n")
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+
+    def mark_flushed(self, seq, compact=False, resolved=None):
+        """Record that every event up to ``seq`` is in the store.
+
+        ``resolved`` maps the provisional ids of the punch ins just written
+        to their record ids, for queued updates that still name them.
+        """
+        if compact:
+            # Nothing is queued, so the journal can start over
+            self._handle.truncate(0)
+            self._handle.flush()
+            os.fsync(self._handle.fileno())
+            return
+        self.append({'op': 'flushed', 'seq': seq, 'resolved': sorted((resolved or {}).items())})
+
+    def close(self, remove=False):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        if remove and os.path.exists(self.path):
+            os.remove(self.path)
+        if self._lock_handle is not None:
+            _unlock(self._lock_handle)
+            self._lock_handle.close()
+            self._lock_handle = None
+            if remove and os.path.exists(self.path + ".lock"):
+                os.remove(self.path + ".lock")
+
+    @staticmethod
+    def read_pending(path):
+        """Return the events in a journal that were never marked flushed, and
+        the record ids the flushed punch ins were given."""
+        events = []
+        resolved = {}
+        flushed = 0
+        with open(path, encoding="utf-8") as handle:
+            for line in handle:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # A torn final line: the punch was never acknowledged
+                    break
+                if event.get('op') == 'flushed':
+                    flushed = max(flushed, event['seq'])
+                    resolved.update((int(k), v) for k, v in event.get('resolved', []))
+                else:
+                    events.append(event)
+        return [e for e in events if e['seq'] > flushed], resolved
+
+
+# Function to set aside a queued event the store refused, so the queue moves on
+def dead_letter(directory, event, error):
+    logger.warning("Dropping queued %s %s: %s", event['op'], event.get('seq'), error)
+    entry = {'event': event, 'error': str(error), 'time': time.time()}
+    with open(os.path.join(directory, DEAD_LETTER_FILE), "a", encoding="utf-8") as handle:
+        handle.write(json.dumps(entry, default=_json_default) + "\n")
+        handle.flush()
+        os.fsync(handle.fileno())
+
+
+# Function to apply queued events to a store: every punch in as one
+# ``insert_many``, then every update as one ``update_many`` with provisional
+# targets mapped through ``resolved``.  Returns how many events were
+# dead-lettered instead of written.  With ``skip_existing`` punch ins the
+# store already has are not written again; with ``dead_letter_existing`` as
+# well they are set aside as duplicates (a replay cannot tell its own earlier
+# write from another process's, so it only skips them)
+def _apply_events(store, events, resolved, directory, skip_existing=False, dead_letter_existing=False):
+    dropped = 0
+    # Punch ins an earlier, failed attempt already wrote are not written again
+    inserts = [e for e in events if e['op'] == 'insert' and -e['seq'] not in resolved]
+    if inserts and skip_existing:
+        index = store.punch_index()
+        fresh = []
+        for event in inserts:
+            record = event['record']
+            existing = index.open_record(record.get('Employee ID'), record.get('Date'))
+            if existing is None:
+                existing = index.completed_record(record.get('Employee ID'), record.get('Date'))
+            if existing is None:
+                fresh.append(event)
+                continue
+            # Later punches against this one go to the stored record
+            resolved[-event['seq']] = existing
+            if dead_letter_existing:
+                dead_letter(directory, event, f"employee {record.get('Employee ID')} already has "
+                                              f"record {existing} for {record.get('Date')}")
+                dropped += 1
+        inserts = fresh
+    if inserts:
+        for event, record_id in zip(inserts, store.insert_many([e['record'] for e in inserts])):
+            resolved[-event['seq']] = record_id
+
+    updates = []
+    for event in events:
+        if event['op'] != 'update':
+            continue
+        target = event['target']
+        target = resolved.get(target, target)
+        if target < 0:
+            dead_letter(directory, event, f"unknown queued punch {target}")
+            dropped += 1
+            continue
+        updates.append((event, target))
+    if not updates:
+        return dropped
+    try:
+        store.update_many([(target, event['fields']) for event, target in updates])
+    except StorageError:
+        # One at a time, to find the refused ones (updates are idempotent)
+        for event, target in updates:
+            try:
+                store.update(target, event['fields'])
+            except StorageError as e:
+                dead_letter(directory, event, e)
+                dropped += 1
+    return dropped
+
+
+# Function to replay journals left behind by processes that died
+def recover_orphaned_journals(store, directory):
+    recovered = 0
+    for path in glob.glob(os.path.join(directory, JOURNAL_PATTERN)):
+        journal = PunchJournal(path)
+        try:
+            journal.open()
+        except OSError:
+            # Still owned by a running process
+            continue
+        try:
+            events, resolved = PunchJournal.read_pending(path)
+            if events:
+                _apply_events(store, events, resolved, directory, skip_existing=True)
+            recovered += len(events)
+            journal.close(remove=True)
+            if events:
+                logger.warning("Recovered %d queued punches from %s", len(events), path)
+        except Exception:
+            journal.close()
+            raise
+    return recovered
+
+
+# Function to turn queued punch ins into a canonical frame indexed by provisional id
+def _queued_frame(inserts):
+    return normalize(pd.DataFrame(list(inserts.values()), index=pd.Index(list(inserts), name=RECORD_ID)))
+
+
+# Function to apply queued updates to the records of ``df`` they change,
+# leaving out fields ``df`` was read without
+def _with_updates(df, updates):
+    changed = [record_id for record_id in updates if record_id in df.index]
+    if not changed:
+        return df
+    df = df.copy()
+    for record_id in changed:
+        assign_fields(df, record_id, {c: v for c, v in updates[record_id].items() if c in df.columns})
+    return df
+
+
+class _OverlayIndex:
+    """Punch index view combining the store's index with queued punches."""
+
+    def __init__(self, base, pending, completed_ids):
+        self.base = base
+        self.pending = pending
+        self.completed_ids = completed_ids
+
+    def open_record(self, emp_id, date):
+        record_id = self.pending.open_record(emp_id, date)
+        if record_id is not None:
+            return record_id
+        record_id = self.base.open_record(emp_id, date)
+        if record_id is not None and record_id not in self.completed_ids:
+            return record_id
+        return None
+
+    def completed_record(self, emp_id, date):
+        record_id = self.pending.completed_record(emp_id, date)
+        if record_id is None:
+            record_id = self.base.completed_record(emp_id, date)
+        if record_id is None:
+            open_id = self.base.open_record(emp_id, date)
+            if open_id in self.completed_ids:
+                record_id = open_id
+        return record_id
+
+    def recorded_days(self, keys):
+        keys = list(keys)
+        return self.base.recorded_days(keys) | self.pending.recorded_days(keys)
+
+
+class QueuedStore(AttendanceStore):
+    """Attendance store that acknowledges punches before writing them."""
+
+    def __init__(self, store, policy=None, journal_dir=None):
+        self.store = store
+        self.name = store.name
+        self.path = store.path
+        self.policy = policy or FlushPolicy.from_env()
+        self.journal_dir = journal_dir or os.path.dirname(os.path.abspath(store.path))
+        self.journal = PunchJournal(os.path.join(
+            self.journal_dir, JOURNAL_PATTERN.replace("*", str(os.getpid()))
+        ))
+
+        self._lock = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._pending = []
+        self._pending_inserts = {}
+        self._pending_updates = {}
+        self._resolved = {}
+        self._seq = 0
+        self._thread = None
+        self._stopping = False
+
+        self._metrics = {
+            'submitted': 0,
+            'flushed': 0,
+            'batches': 0,
+            'errors': 0,
+            'dead_lettered': 0,
+            'max_depth': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0,
+        }
+
+    # Lifecycle
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        if not self.store.exists():
+            self.store.initialize()
+        recover_orphaned_journals(self.store, self.journal_dir)
+        self.journal.open()
+        self._thread = threading.Thread(target=self._run, name="punch-queue-flusher", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        with self._lock:
+            self._stopping = True
+            self._lock.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        try:
+            self.flush()
+        except Exception:
+            # The journal stays on disk and is replayed by the next process
+            logger.exception("Could not flush queued punches on shutdown")
+        self.journal.close(remove=not self._pending)
+
+    def _run(self):
+        interval = self.policy.interval_ms / 1000
+        while True:
+            with self._lock:
+                self._lock.wait_for(
+                    lambda: self._stopping or len(self._pending) >= self.policy.max_batch,
+                    timeout=interval
+                )
+                if self._stopping:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Flushing queued punches failed; will retry")
+
+    # Queueing
+
+    def _submit(self, event):
+        with self._lock:
+            self._seq += 1
+            event['seq'] = self._seq
+            if event['op'] == 'update':
+                # Journaled with the real id once there is one: after a crash
+                # the flush that gave it may be all that is left of the punch in
+                event['target'] = self._resolved.get(event['target'], event['target'])
+            self.journal.append(event)
+            self._pending.append(event)
+            self._overlay(event)
+            self._metrics['submitted'] += 1
+            self._metrics['max_depth'] = max(self._metrics['max_depth'], len(self._pending))
+            if len(self._pending) >= self.policy.max_batch:
+                self._lock.notify_all()
+            return event['seq']
+
+    def _overlay(self, event):
+        if event['op'] == 'insert':
+            self._pending_inserts[-event['seq']] = dict(event['record'])
+            return
+        target = self._resolved.get(event['target'], event['target'])
+        if target in self._pending_inserts:
+            self._pending_inserts[target].update(event['fields'])
+        else:
+            self._pending_updates.setdefault(target, {}).update(event['fields'])
+
+    def punch_lock(self):
+        # Punches are checked against the queue; duplicates across processes
+        # are settled when the queue flushes, so kiosks never wait on a flush
+        return nullcontext()
+
+    def insert_many(self, records):
+        return [-self._submit({'op': 'insert', 'record': dict(record)}) for record in records]
+
+    def update_many(self, updates):
+        for record_id, fields in updates:
+            if fields:
+                self._submit({'op': 'update', 'target': int(record_id), 'fields': dict(fields)})
+
+    def flush(self):
+        """Merge every queued punch into the store; returns how many were written."""
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._pending)
+            if not batch:
+                return 0
+
+            started = time.perf_counter()
+            try:
+                # Punch ins another process stored meanwhile are not written twice
+                with self.store.write_lock():
+                    dropped = _apply_events(self.store, batch, self._resolved, self.journal_dir,
+                                            skip_existing=True, dead_letter_existing=True)
+            except Exception:
+                with self._lock:
+                    self._metrics['errors'] += 1
+                raise
+            with self._lock:
+                self._metrics['dead_lettered'] += dropped
+                del self._pending[:len(batch)]
+                self._pending_inserts = {}
+                self._pending_updates = {}
+                for event in self._pending:
+                    self._overlay(event)
+                # Updates still queued may name punch ins this batch wrote
+                self.journal.mark_flushed(batch[-1]['seq'], compact=not self._pending, resolved={
+                    -e['seq']: self._resolved[-e['seq']] for e in batch
+                    if e['op'] == 'insert' and -e['seq'] in self._resolved
+                })
+            written = len(batch) - dropped
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                # Provisional ids only need resolving for a short while
+                if len(self._resolved) > 2 * RESOLVED_ID_LIMIT:
+                    oldest = self._seq - RESOLVED_ID_LIMIT
+                    self._resolved = {k: v for k, v in self._resolved.items() if -k > oldest}
+                self._metrics['flushed'] += written
+                self._metrics['batches'] += 1
+                self._metrics['last_flush_ms'] = elapsed_ms
+                self._metrics['max_flush_ms'] = max(self._metrics['max_flush_ms'], elapsed_ms)
+                self._metrics['total_flush_ms'] += elapsed_ms
+            return written
+
+    def metrics(self):
+        """Return queue depth, throughput counters and flush latency."""
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['depth'] = len(self._pending)
+        total = metrics.pop('total_flush_ms')
+        metrics['avg_flush_ms'] = total / metrics['batches'] if metrics['batches'] else 0.0
+        metrics['interval_ms'] = self.policy.interval_ms
+        metrics['max_batch'] = self.policy.max_batch
+        return metrics
+
+    # Reads see queued punches
+
+    def version(self):
+        with self._lock:
+            return self.store.version() + (self._seq, len(self._pending))
+
+    def exists(self):
+        return self.store.exists()
+
+    def initialize(self):
+        self.store.initialize()
+        return self.load()
+
+    def _queued(self):
+        # Copies of the queued punch ins and of the queued updates to stored records
+        with self._lock:
+            inserts = {k: dict(v) for k, v in self._pending_inserts.items()}
+            updates = {k: dict(v) for k, v in self._pending_updates.items()}
+        return inserts, updates
+
+    def _flushed_ids(self, inserts):
+        # Record ids already given to any of these queued punch ins
+        with self._lock:
+            return {self._resolved[k] for k in inserts if k in self._resolved}
+
+    def _queued_matching(self, inserts, start_date=None, end_date=None, employee_ids=None, is_late=None,
+                         stored_ids=()):
+        # The queued punch ins matching the filters, less those a flush has
+        # meanwhile put among the ``stored_ids`` just read from the store
+        with self._lock:
+            inserts = {k: v for k, v in inserts.items() if self._resolved.get(k) not in stored_ids}
+        if not inserts:
+            return None
+        df = filter_dates(_queued_frame(inserts), start_date, end_date)
+        if employee_ids:
+            df = df[df['Employee ID'].isin([normalize_employee_id(e) for e in employee_ids])]
+        if is_late is not None:
+            df = df[df['Is Late'] == is_late]
+        return df
+
+    def load(self, start_date=None, end_date=None):
+        df = self.store.load(start_date, end_date)
+        inserts, updates = self._queued()
+        if not inserts and not updates:
+            return df
+
+        version = df.attrs.get(VERSION_ATTR)
+        df = _with_updates(df, updates)
+        if inserts:
+            df = filter_dates(concat_frames([df, _queued_frame(inserts)]), start_date, end_date)
+        df.attrs[VERSION_ATTR] = version
+        return df
+
+    def query(self, start_date=None, end_date=None, employee_ids=None, columns=None):
+        # Pushed down to the store, with the queued punches laid over the result
+        inserts, updates = self._queued()
+        df = _with_updates(self.store.query(start_date, end_date, employee_ids, columns), updates)
+        queued = self._queued_matching(inserts, start_date, end_date, employee_ids, stored_ids=df.index)
+        if queued is None or queued.empty:
+            return df
+        attrs = dict(df.attrs)
+        df = concat_frames([df, queued if columns is None else queued[list(columns)]])
+        df.attrs = attrs
+        return df
+
+    def iter_chunks(self, start_date=None, end_date=None, employee_ids=None, chunk_size=EXPORT_CHUNK_ROWS):
+        # Streamed from the store; the queued punch ins follow the stored records
+        inserts, updates = self._queued()
+        seen = set()
+        for chunk in self.store.iter_chunks(start_date, end_date, employee_ids, chunk_size):
+            if inserts:
+                # Punch ins flushed while the export runs are only written once
+                seen.update(chunk.index[chunk.index.isin(list(self._flushed_ids(inserts)))].tolist())
+            yield _with_updates(chunk, updates)
+        queued = self._queued_matching(inserts, start_date, end_date, employee_ids, stored_ids=seen)
+        if queued is not None:
+            for start in range(0, len(queued), chunk_size):
+                yield queued.iloc[start:start + chunk_size]
+
+    def count(self, start_date=None, end_date=None, employee_ids=None, is_late=None):
+        inserts, _ = self._queued()
+        queued = self._queued_matching(inserts, start_date, end_date, employee_ids, is_late,
+                                       stored_ids=self._flushed_ids(inserts))
+        return self.store.count(start_date, end_date, employee_ids, is_late) + (0 if queued is None else len(queued))
+
+    def page(self, start_date=None, end_date=None, employee_ids=None, is_late=None,
+             sort_by='Date', descending=False, offset=0, limit=PAGE_ROWS):
+        """Sort and slice in the store, merging the queued punch ins into the page.
+
+        The store is asked for up to one more row per matching queued punch in
+        before the page, which is enough to place every queued punch that
+        falls on it; queued updates are applied to the page's rows.
+        """
+        _check_sort_column(sort_by)
+        inserts, updates = self._queued()
+        queued = self._queued_matching(inserts, start_date, end_date, employee_ids, is_late,
+                                       stored_ids=self._flushed_ids(inserts))
+        extra = 0 if queued is None else len(queued)
+        start = max(0, offset - extra)
+        stored, total = self.store.page(start_date, end_date, employee_ids, is_late, sort_by, descending,
+                                        start, offset - start + limit)
+        if not extra:
+            return _with_updates(stored, updates), total
+        if stored.empty and start > 0:
+            # The page lies past every stored and queued record
+            return stored, total + extra
+
+        # The stored rows read are a run of the full order starting at
+        # ``start``; the queued rows sorting before that run shift it along
+        if start > 0:
+            ranked = _sort_records(concat_frames([stored.iloc[:1], queued]), sort_by, descending)
+            before = ranked.index.get_loc(stored.index[0])
+            queued = ranked.iloc[before + 1:]
+            start += before
+        if start + len(stored) < total:
+            # Past the last stored row read, other stored rows may come first
+            ranked = _sort_records(concat_frames([stored.iloc[-1:], queued]), sort_by, descending)
+            queued = ranked.iloc[:ranked.index.get_loc(stored.index[-1])]
+        merged = _sort_records(concat_frames([stored, queued]), sort_by, descending)
+        rows = merged.iloc[offset - start:offset - start + limit]
+        return _with_updates(rows, updates), total + extra
+
+    def date_bounds(self):
+        return self.store.date_bounds()
+
+    def rollups(self):
+        # Reports see punches once they are flushed (within one interval)
+        return self.store.rollups()
+
+    def resolve_record_id(self, record_id):
+        with self._lock:
+            return self._resolved.get(record_id, record_id)
+
+    def get(self, record_id, date=None):
+        record_id = self.resolve_record_id(record_id)
+        with self._lock:
+            queued = self._pending_inserts.get(record_id)
+            queued = None if queued is None else dict(queued)
+            fields = dict(self._pending_updates.get(record_id, {}))
+        # Queued punches are answered from the queue, not from an overlaid frame
+        if queued is not None:
+            return display_values(queued)
+        record = self.store.get(record_id, date)
+        if record is None or not fields:
+            return record
+        record.update(fields)
+        return display_values(record)
+
+    def punch_index(self):
+        # Queued punches are taken before the store's index: a flush in between
+        # then leaves a punch in both views rather than in neither
+        with self._lock:
+            if not self._pending_inserts and not self._pending_updates:
+                pending = None
+            else:
+                pending = PunchIndex()
+                for record_id, record in self._pending_inserts.items():
+                    pending.add(record_id, record)
+                completed_ids = {
+                    record_id for record_id, fields in self._pending_updates.items()
+                    if fields.get('Status') == 'Completed'
+                }
+        base = self.store.punch_index()
+        if pending is None:
+            return base
+        return _OverlayIndex(base, pending, completed_ids)
+
+    # Whole-store operations write through after draining the queue
+
+    def save(self, df, expected_version=None):
+        self.flush()
+        self.store.save(df, expected_version)
+
+    def export_excel(self, *args, **kwargs):
+        self.flush()
+        return self.store.export_excel(*args, **kwargs)
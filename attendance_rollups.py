@@ -0,0 +1,260 @@
+"""Pre-aggregated attendance rollups for reports.
+
+Rollups hold, for every month, totals per employee per day and per
+employee per month (split by lateness so the punctuality filter still
+works), plus late counts per date.  Reports over any date range add up a
+few pre-aggregated rows instead of grouping raw punches:
+
+* months entirely inside the range come from the monthly totals;
+* the partial months at either end come from the daily totals.
+
+``Rollups`` keeps them in memory, built once from a frame and adjusted on
+every punch in, punch out and admin edit the same way stores keep the
+``PunchIndex`` current.  Backends can keep them closer to the data instead
+(SQLite in tables maintained by triggers, partitioned stores per month);
+they subclass ``RollupReports`` and only supply the rows.
+
+Report results are also memoised per set of report inputs (range,
+employees and punctuality filter) until the next write changes the totals,
+so rerunning a report, or several people viewing the same one, costs a
+dictionary lookup.
+"""
+import calendar
+
+import pandas as pd
+
+from attendance_schema import normalize_date, normalize_employee_id, to_canonical_value
+
+SUMMARY_COLUMNS = ['Employee ID', 'Employee Name', 'Work Hours', 'Late Count', 'Days Present', 'Punctuality Rate']
+
+# Report results remembered between writes
+REPORT_MEMO_ENTRIES = 64
+
+
+# Function to turn one record's values into its contribution to the rollups
+def _contribution(record):
+    date = record.get('Date')
+    if date is None or (not isinstance(date, str) and pd.isna(date)):
+        return None
+    date = normalize_date(date)
+    hours = to_canonical_value('Work Hours', record.get('Work Hours'))
+    late = to_canonical_value('Is Late', record.get('Is Late'))
+    name = record.get('Employee Name')
+    return (
+        date,
+        normalize_employee_id(record.get('Employee ID')),
+        '' if name is None or (not isinstance(name, str) and pd.isna(name)) else str(name),
+        bool(late),
+        0.0 if hours is None or hours != hours else float(hours),
+    )
+
+
+# Function to get the first and last dates (YYYY-MM-DD) of a YYYY-MM month
+def month_bounds(month):
+    year, number = int(month[:4]), int(month[5:7])
+    return f"{month}-01", f"{month}-{calendar.monthrange(year, number)[1]:02d}"
+
+
+# Function to list the months a report range touches, the ones it covers
+# entirely, and the range's first and last dates as YYYY-MM-DD
+def report_months(start_date, end_date):
+    first = normalize_date(start_date)
+    last = normalize_date(end_date)
+    year, month = int(first[:4]), int(first[5:7])
+    months, full = [], set()
+    while (year, month) <= (int(last[:4]), int(last[5:7])):
+        key = f"{year:04d}-{month:02d}"
+        months.append(key)
+        month_start, month_end = month_bounds(key)
+        if first <= month_start and month_end <= last:
+            full.add(key)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months, full, first, last
+
+
+# Function to total report rows (employee id, name, is late, hours, records) per employee
+def summary_frame(rows):
+    totals = {}
+    for emp_id, name, late, hours, count in rows:
+        entry = totals.setdefault((emp_id, name), [0.0, 0, 0])
+        entry[0] += hours
+        entry[1] += count if late else 0
+        entry[2] += count
+    rows = [
+        (emp_id, name, round(hours, 2), late, days, round((days - late) / days * 100, 1))
+        for (emp_id, name), (hours, late, days) in sorted(totals.items())
+    ]
+    return pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
+
+
+# Function to turn late arrivals per date into the report series
+def late_series(counts):
+    dates = sorted(counts)
+    index = pd.DatetimeIndex(pd.to_datetime(dates, format='%Y-%m-%d'), name='Date')
+    return pd.Series([counts[d] for d in dates], index=index, dtype='int64', name='Is Late')
+
+
+def _add_to(table, key, hours, count):
+    totals = table.setdefault(key, [0.0, 0])
+    totals[0] += hours
+    totals[1] += count
+    if totals[1] == 0:
+        del table[key]
+
+
+class RollupReports:
+    """Reports over rollups; subclasses supply the rows and a memo token.
+
+    ``_rows`` yields ``(employee id, name, is late, hours, records)`` for the
+    range, ``_late_counts`` returns late arrivals per date, and
+    ``_memo_token`` changes whenever either could give a different answer.
+    """
+
+    def __init__(self):
+        # (report, inputs) -> (token, result)
+        self._memo = {}
+
+    def _rows(self, start_date, end_date, employee_ids=None, is_late=None):
+        raise NotImplementedError
+
+    def _late_counts(self, start_date, end_date, employee_ids=None, is_late=None):
+        raise NotImplementedError
+
+    def _memo_token(self):
+        raise NotImplementedError
+
+    def _memoised(self, report, start_date, end_date, employee_ids, is_late, compute):
+        key = (
+            report, normalize_date(start_date), normalize_date(end_date),
+            None if not employee_ids else tuple(sorted({normalize_employee_id(e) for e in employee_ids})),
+            is_late
+        )
+        token = self._memo_token()
+        entry = self._memo.get(key)
+        if entry is not None and entry[0] == token:
+            result = entry[1]
+        else:
+            result = compute(start_date, end_date, employee_ids, is_late)
+            # Not kept if a write landed while it was being computed
+            if self._memo_token() == token:
+                if len(self._memo) >= REPORT_MEMO_ENTRIES:
+                    self._memo.clear()
+                self._memo[key] = (token, result)
+        # Callers get their own copy to change freely
+        return result.copy()
+
+    def employee_summary(self, start_date, end_date, employee_ids=None, is_late=None):
+        """Hours, late count, days present and punctuality per employee."""
+        return self._memoised('summary', start_date, end_date, employee_ids, is_late,
+                              lambda *args: summary_frame(self._rows(*args)))
+
+    def late_by_date(self, start_date, end_date, employee_ids=None, is_late=None):
+        """Late arrivals per date that has any records in the range."""
+        return self._memoised('late_by_date', start_date, end_date, employee_ids, is_late,
+                              lambda *args: late_series(self._late_counts(*args)))
+
+
+class Rollups(RollupReports):
+    """Daily and monthly per-employee totals, kept current on every write."""
+
+    def __init__(self):
+        super().__init__()
+        # record id -> (date, employee id, name, is late, hours)
+        self._records = {}
+        # month -> {(date, employee id, name, is late): [hours, records]}
+        self._daily = {}
+        # month -> {(employee id, name, is late): [hours, records]}
+        self._monthly = {}
+        # month -> {date: [late records, records]}
+        self._dates = {}
+        # Bumped on every change, invalidating memoised reports
+        self._generation = 0
+
+    @classmethod
+    def build(cls, df):
+        rollups = cls()
+        if df.empty:
+            return rollups
+        dates = df['Date'].dt.strftime('%Y-%m-%d')
+        contributions = zip(
+            dates.tolist(),
+            (normalize_employee_id(v) for v in df['Employee ID'].tolist()),
+            df['Employee Name'].astype(object).where(df['Employee Name'].notna(), '').astype(str).tolist(),
+            df['Is Late'].astype(bool).tolist(),
+            df['Work Hours'].astype('float64').fillna(0.0).tolist()
+        )
+        for record_id, contribution in zip(df.index.tolist(), contributions):
+            if isinstance(contribution[0], str):
+                rollups._apply(record_id, contribution, 1)
+        return rollups
+
+    def _apply(self, record_id, contribution, sign):
+        self._generation += 1
+        self._memo.clear()
+        date, emp_id, name, late, hours = contribution
+        month = date[:7]
+        _add_to(self._daily.setdefault(month, {}), (date, emp_id, name, late), sign * hours, sign)
+        _add_to(self._monthly.setdefault(month, {}), (emp_id, name, late), sign * hours, sign)
+        day = self._dates.setdefault(month, {}).setdefault(date, [0, 0])
+        day[0] += sign * int(late)
+        day[1] += sign
+        if day[1] == 0:
+            del self._dates[month][date]
+        if sign > 0:
+            self._records[record_id] = contribution
+        else:
+            self._records.pop(record_id, None)
+
+    def add(self, record_id, record):
+        contribution = _contribution(record)
+        if contribution is not None:
+            self._apply(record_id, contribution, 1)
+
+    def update(self, record_id, fields):
+        old = self._records.get(record_id)
+        if old is None:
+            return
+        record = dict(zip(('Date', 'Employee ID', 'Employee Name', 'Is Late', 'Work Hours'), old))
+        record.update(fields)
+        self._apply(record_id, old, -1)
+        self.add(record_id, record)
+
+    def _memo_token(self):
+        return self._generation
+
+    def _rows(self, start_date, end_date, employee_ids=None, is_late=None):
+        months, full, first, last = report_months(start_date, end_date)
+        employees = None if not employee_ids else {normalize_employee_id(e) for e in employee_ids}
+        for month in months:
+            if month in full:
+                rows = self._monthly.get(month, {}).items()
+            else:
+                rows = (
+                    (key[1:], totals) for key, totals in self._daily.get(month, {}).items()
+                    if first <= key[0] <= last
+                )
+            for (emp_id, name, late), (hours, count) in rows:
+                if (employees is None or emp_id in employees) and (is_late is None or late == is_late):
+                    yield emp_id, name, late, hours, count
+
+    def _late_counts(self, start_date, end_date, employee_ids=None, is_late=None):
+        months, _, first, last = report_months(start_date, end_date)
+        counts = {}
+        if not employee_ids and is_late is None:
+            for month in months:
+                for date, (late, _) in self._dates.get(month, {}).items():
+                    if first <= date <= last:
+                        counts[date] = late
+        else:
+            employees = None if not employee_ids else {normalize_employee_id(e) for e in employee_ids}
+            for month in months:
+                for (date, emp_id, _, late), (_, count) in self._daily.get(month, {}).items():
+                    if not first <= date <= last:
+                        continue
+                    if (employees is not None and emp_id not in employees) or (is_late is not None and late != is_late):
+                        continue
+                    counts[date] = counts.get(date, 0) + (count if late else 0)
+        return counts
+
+    def __len__(self):
+        return len(self._records)
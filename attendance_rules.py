@@ -0,0 +1,66 @@
+"""Vectorised attendance rules: lateness and work hours.
+
+Every function works on whole columns of seconds since midnight (the
+canonical punch time representation), so bulk recomputation, migrations and
+reports avoid per-row ``strptime`` calls.  The scalar helpers wrap the same
+arithmetic for single punches.
+"""
+import numpy as np
+import pandas as pd
+
+from attendance_schema import (
+    LATE_CUTOFF,
+    SECONDS_PER_DAY,
+    STATUS_COMPLETED,
+    parse_time_series,
+    time_to_seconds,
+)
+
+LATE_CUTOFF_SECONDS = time_to_seconds(LATE_CUTOFF)
+
+
+# Function to flag punch-in times after the cutoff (missing times are not late)
+def compute_is_late(punch_in, cutoff=LATE_CUTOFF_SECONDS):
+    seconds = parse_time_series(pd.Series(punch_in))
+    return (seconds > cutoff).fillna(False).astype(bool)
+
+
+# Function to round seconds to hundredths of an hour, halves up, the same way
+# for a single punch and for a whole column
+def _hundredths_of_hours(seconds):
+    return np.floor((seconds * 100 + 1800) / 3600) / 100
+
+
+# Function to compute hours worked, wrapping punch outs past midnight to the next day
+def compute_work_hours(punch_in, punch_out):
+    start = parse_time_series(pd.Series(punch_in)).astype('float64')
+    end = parse_time_series(pd.Series(punch_out, index=start.index)).astype('float64')
+    # A punch out earlier than the punch in belongs to the next day
+    elapsed = np.mod(end - start, SECONDS_PER_DAY)
+    return _hundredths_of_hours(elapsed)
+
+
+# Function to recompute Work Hours and Is Late for every record in a canonical frame
+def recompute(df, cutoff=LATE_CUTOFF_SECONDS):
+    df = df.copy()
+    df['Is Late'] = compute_is_late(df['Punch In Time'], cutoff).to_numpy()
+    hours = compute_work_hours(df['Punch In Time'], df['Punch Out Time']).to_numpy()
+    completed = df['Punch Out Time'].notna().to_numpy()
+    df['Work Hours'] = pd.Series(np.where(completed, hours, np.nan), index=df.index).astype(df['Work Hours'].dtype)
+    df.loc[completed, 'Status'] = STATUS_COMPLETED
+    return df
+
+
+# Function to check whether a single punch-in time is late
+def is_late_time(punch_in, cutoff=LATE_CUTOFF_SECONDS):
+    seconds = time_to_seconds(punch_in)
+    return seconds is not None and seconds > cutoff
+
+
+# Function to calculate hours worked for a single punch
+def calculate_hours(punch_in, punch_out):
+    start = time_to_seconds(punch_in)
+    end = time_to_seconds(punch_out)
+    if start is None or end is None:
+        return None
+    return float(_hundredths_of_hours((end - start) % SECONDS_PER_DAY))
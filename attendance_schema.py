@@ -0,0 +1,294 @@
+"""Canonical, typed schema for attendance frames.
+
+Stores normalise records once when they are read, so every consumer gets the
+same compact dtypes:
+
+* ``Employee ID`` / ``Employee Name`` - string categories
+* ``Date`` - ``datetime64[ns]`` (midnight)
+* ``Punch In Time`` / ``Punch Out Time`` - nullable ``Int32`` seconds since midnight
+* ``Work Hours`` - ``float32``
+* ``Status`` - category of ``STATUS_VALUES``
+* ``Is Late`` - ``bool``
+
+``to_display`` turns a canonical frame back into the strings shown in the UI
+and written to Excel/CSV exports.
+"""
+from datetime import time as dt_time
+
+import pandas as pd
+
+# Column order used everywhere a frame is shown or exported
+COLUMNS = [
+    'Employee ID',
+    'Employee Name',
+    'Date',
+    'Punch In Time',
+    'Punch Out Time',
+    'Work Hours',
+    'Status',
+    'Is Late'
+]
+
+# Name of the index holding the storage record id
+RECORD_ID = 'Record ID'
+
+# Frame attribute set on frames that only hold part of the date range
+DATE_RANGE_ATTR = 'date_range'
+
+STATUS_IN_PROGRESS = 'In Progress'
+STATUS_COMPLETED = 'Completed'
+STATUS_VALUES = [STATUS_IN_PROGRESS, STATUS_COMPLETED]
+
+TIME_COLUMNS = ['Punch In Time', 'Punch Out Time']
+
+DATE_FORMAT = '%Y-%m-%d'
+TIME_FORMAT = '%H:%M:%S'
+
+LATE_CUTOFF = "10:15:00"
+
+SECONDS_PER_DAY = 24 * 3600
+
+
+# Function to normalise an employee ID so 1, 1.0, "1" and " 1 " all match
+def normalize_employee_id(value):
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        if value != value:
+            return ""
+        if value.is_integer():
+            value = int(value)
+    return str(value).strip()
+
+
+# Function to normalise a date value to the YYYY-MM-DD form used in records
+def normalize_date(value):
+    if hasattr(value, 'strftime'):
+        return value.strftime(DATE_FORMAT)
+    return str(value).strip()[:10]
+
+
+# Function to convert a single time value to seconds since midnight
+def time_to_seconds(value):
+    if value is None:
+        return None
+    if isinstance(value, dt_time):
+        return value.hour * 3600 + value.minute * 60 + value.second
+    if isinstance(value, str):
+        parts = value.strip().split(':')
+        if len(parts) < 2:
+            raise ValueError(f"Invalid time: {value!r}")
+        seconds = float(parts[2]) if len(parts) > 2 else 0
+        return int(parts[0]) * 3600 + int(parts[1]) * 60 + int(seconds)
+    if pd.isna(value):
+        return None
+    return int(value)
+
+
+# Function to format seconds since midnight as HH:MM:SS
+def format_time(value):
+    if value is None or pd.isna(value):
+        return None
+    if isinstance(value, str):
+        return value
+    value = int(value) % SECONDS_PER_DAY
+    return f"{value // 3600:02d}:{value % 3600 // 60:02d}:{value % 60:02d}"
+
+
+# Function to parse a whole column of times into seconds since midnight
+def parse_time_series(series):
+    if pd.api.types.is_numeric_dtype(series):
+        return series.round().astype('Int32')
+
+    # Strings and datetime.time objects both render as HH:MM[:SS[.ffffff]]
+    text = series.astype('string')
+    parts = text.str.extract(r'^\s*(\d{1,2}):(\d{2})(?::(\d{2}))?')
+    hours = pd.to_numeric(parts[0], errors='coerce')
+    minutes = pd.to_numeric(parts[1], errors='coerce')
+    seconds = pd.to_numeric(parts[2], errors='coerce').fillna(0)
+    seconds_since_midnight = hours * 3600 + minutes * 60 + seconds
+
+    # Times that were already stored as seconds (e.g. "36000")
+    numeric = pd.to_numeric(text.where(parts[0].isna()), errors='coerce')
+    seconds_since_midnight = seconds_since_midnight.fillna(numeric)
+    return seconds_since_midnight.round().astype('Int32')
+
+
+# Function to format a column of seconds since midnight as HH:MM:SS strings
+def format_time_series(series):
+    seconds = series.astype('Int64') % SECONDS_PER_DAY
+    text = (
+        (seconds // 3600).astype('string').str.zfill(2) + ':'
+        + (seconds % 3600 // 60).astype('string').str.zfill(2) + ':'
+        + (seconds % 60).astype('string').str.zfill(2)
+    )
+    return text.astype(object).where(seconds.notna(), None)
+
+
+# Function to parse a column of dates into datetime64 values
+def parse_date_series(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.normalize()
+    text = series.astype('string').str.strip().str.slice(0, 10)
+    return pd.to_datetime(text, format=DATE_FORMAT, errors='coerce')
+
+
+# Function to parse a column of lateness flags into real booleans
+def parse_bool_series(series):
+    if pd.api.types.is_bool_dtype(series):
+        return series.astype(bool)
+    if pd.api.types.is_numeric_dtype(series):
+        return series.fillna(0).astype(bool)
+    text = series.astype('string').str.strip().str.lower()
+    return text.isin(['true', '1', '1.0', 'yes']).astype(bool)
+
+
+# Function to parse a column of employee IDs into a string category
+def parse_employee_id_series(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series
+    ids = pd.Series(
+        [normalize_employee_id(v) for v in series.tolist()],
+        index=series.index,
+        dtype=object
+    )
+    return ids.astype('category')
+
+
+# Function to convert any attendance frame into the canonical typed schema
+def normalize(df):
+    df = df.copy()
+    for col in COLUMNS:
+        if col not in df.columns:
+            df[col] = None
+
+    df['Employee ID'] = parse_employee_id_series(df['Employee ID'])
+    df['Employee Name'] = df['Employee Name'].astype(object).where(df['Employee Name'].notna(), None).astype('category')
+    df['Date'] = parse_date_series(df['Date'])
+    for col in TIME_COLUMNS:
+        df[col] = parse_time_series(df[col])
+    df['Work Hours'] = pd.to_numeric(df['Work Hours'], errors='coerce').astype('float32')
+    df['Status'] = pd.Categorical(df['Status'].astype(object).where(df['Status'].notna(), None), categories=STATUS_VALUES)
+    df['Is Late'] = parse_bool_series(df['Is Late'])
+
+    df = df[COLUMNS]
+    df.index.name = RECORD_ID
+    return df
+
+
+# Function to convert a canonical frame into the strings shown to users
+def to_display(df):
+    df = df.copy()
+    if not pd.api.types.is_datetime64_any_dtype(df['Date']):
+        df['Date'] = parse_date_series(df['Date'])
+    df['Employee ID'] = df['Employee ID'].astype(object)
+    df['Employee Name'] = df['Employee Name'].astype(object)
+    df['Date'] = df['Date'].dt.strftime(DATE_FORMAT)
+    for col in TIME_COLUMNS:
+        df[col] = format_time_series(parse_time_series(df[col]))
+    df['Work Hours'] = pd.to_numeric(df['Work Hours'], errors='coerce').astype('float64').round(2)
+    df['Status'] = df['Status'].astype(object)
+    return df
+
+
+# Function to convert one record of a canonical frame into a dict of display values
+def display_record(df, record_id):
+    row = df.loc[record_id]
+    return {
+        'Employee ID': normalize_employee_id(row['Employee ID']),
+        'Employee Name': None if pd.isna(row['Employee Name']) else row['Employee Name'],
+        'Date': None if pd.isna(row['Date']) else normalize_date(row['Date']),
+        'Punch In Time': format_time(row['Punch In Time']),
+        'Punch Out Time': format_time(row['Punch Out Time']),
+        'Work Hours': None if pd.isna(row['Work Hours']) else round(float(row['Work Hours']), 2),
+        'Status': None if pd.isna(row['Status']) else row['Status'],
+        'Is Late': bool(row['Is Late'] == True),
+    }
+
+
+# Function to turn one record's values (as stored or as typed) into the
+# display values ``display_record`` returns, without building a frame
+def display_values(record):
+    values = {column: to_canonical_value(column, record.get(column)) for column in COLUMNS}
+    return {
+        'Employee ID': values['Employee ID'],
+        'Employee Name': values['Employee Name'],
+        'Date': None if values['Date'] is None else normalize_date(values['Date']),
+        'Punch In Time': format_time(values['Punch In Time']),
+        'Punch Out Time': format_time(values['Punch Out Time']),
+        'Work Hours': None if values['Work Hours'] is None else round(values['Work Hours'], 2),
+        'Status': values['Status'],
+        'Is Late': bool(values['Is Late']),
+    }
+
+
+# Function to convert one field value into its canonical representation
+def to_canonical_value(column, value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if column in TIME_COLUMNS:
+        return time_to_seconds(value)
+    if column == 'Date':
+        return pd.Timestamp(normalize_date(value))
+    if column == 'Employee ID':
+        return normalize_employee_id(value)
+    if column == 'Is Late':
+        if isinstance(value, str):
+            return value.strip().lower() in ('true', '1', '1.0', 'yes')
+        return bool(value)
+    if column == 'Work Hours':
+        return float(value)
+    return value
+
+
+# Function to set fields of one record in a canonical frame, in place
+def assign_fields(df, record_id, fields):
+    for column, value in fields.items():
+        value = to_canonical_value(column, value)
+        if isinstance(df[column].dtype, pd.CategoricalDtype) and value is not None \
+                and value not in df[column].cat.categories:
+            df[column] = df[column].cat.add_categories([value])
+        df.at[record_id, column] = value
+    return df
+
+
+# Function to concatenate canonical frames without losing category dtypes
+def concat_frames(frames):
+    frames = [f for f in frames if not f.empty] or frames[:1]
+    if len(frames) == 1:
+        return frames[0]
+    frames = [f.copy() for f in frames]
+    for col in COLUMNS:
+        # Projected frames may leave columns out
+        if col not in frames[0].columns or not isinstance(frames[0][col].dtype, pd.CategoricalDtype):
+            continue
+        categories = pd.Index([])
+        for frame in frames:
+            categories = categories.union(frame[col].cat.categories, sort=False)
+        if col == 'Status':
+            categories = pd.Index(STATUS_VALUES)
+        for frame in frames:
+            frame[col] = frame[col].cat.set_categories(categories)
+    df = pd.concat(frames)
+    df.index.name = RECORD_ID
+    return df
+
+
+# Function to keep only the records dated between two dates (inclusive)
+def filter_dates(df, start_date=None, end_date=None):
+    if start_date is None and end_date is None:
+        return df
+    mask = df['Date'].notna()
+    if start_date is not None:
+        mask &= df['Date'] >= pd.Timestamp(normalize_date(start_date))
+    if end_date is not None:
+        mask &= df['Date'] <= pd.Timestamp(normalize_date(end_date))
+    df = df[mask]
+    # Marks the frame as partial so it is never saved over the whole store
+    df.attrs[DATE_RANGE_ATTR] = (start_date, end_date)
+    return df
+
+
+# Function to create an empty attendance frame in the canonical schema
+def empty_frame():
+    return normalize(pd.DataFrame(columns=COLUMNS))
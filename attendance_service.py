@@ -0,0 +1,230 @@
+"""Punch in, punch out and punch status, independent of any user interface.
+
+``PunchService`` holds the punch rules the kiosk pages used to implement
+inline: only registered employees may punch (once the registry has anyone
+in it), one punch in per employee and day, lateness against the cutoff and
+work hours at punch out.  The Streamlit pages and the HTTP punch API
+(``attendance_api.py``) both call it, so a badge reader and a kiosk can
+never disagree about an employee's state.
+
+Every check is a lookup in the registry index and the store's punch index,
+and every punch is a single-record write, so a punch costs the same however
+long the history is.  The check and the write happen under the store's
+punch lock: the cross-process write lock, so kiosks and API workers in
+other processes cannot both punch the same employee in, except with
+write-behind punches, which are checked against the queue and settled when
+it flushes.  Refused punches raise a ``PunchError`` subclass that carries
+the record standing in the way, if any.
+
+The rules themselves (``punch_in_record``, ``punch_out_fields`` and
+``edit_fields``) are plain functions of their arguments, and the service
+takes its store, registry and clock as arguments, so all of it can be
+exercised and benchmarked without Streamlit (see
+``benchmarks/bench_punch_service.py``).
+"""
+import threading
+from datetime import datetime
+
+from attendance_employees import employee_registry
+from attendance_metrics import timed
+from attendance_rules import calculate_hours, is_late_time
+from attendance_schema import (
+    DATE_FORMAT,
+    RECORD_ID,
+    SECONDS_PER_DAY,
+    STATUS_COMPLETED,
+    STATUS_IN_PROGRESS,
+    TIME_FORMAT,
+    format_time,
+    normalize_employee_id,
+    time_to_seconds,
+)
+from attendance_storage import StorageError, get_store
+
+# States reported by PunchService.status
+NOT_PUNCHED_IN = 'not_punched_in'
+PUNCHED_IN = 'punched_in'
+COMPLETED = 'completed'
+
+
+class PunchError(Exception):
+    """A punch that the attendance rules refuse."""
+
+    def __init__(self, message, record=None):
+        super().__init__(message)
+        self.record = record
+
+
+class UnknownEmployeeError(PunchError):
+    pass
+
+
+class AlreadyPunchedInError(PunchError):
+    pass
+
+
+class AlreadyCompletedError(PunchError):
+    pass
+
+
+class NotPunchedInError(PunchError):
+    pass
+
+
+class InvalidPunchError(PunchError):
+    pass
+
+
+# Function to check a punch time typed in by hand (HH:MM or HH:MM:SS)
+def parse_punch_time(value, label="Punch time"):
+    try:
+        seconds = time_to_seconds(value.strip() if isinstance(value, str) else value)
+    except ValueError:
+        seconds = None
+    if seconds is None or not 0 <= seconds < SECONDS_PER_DAY:
+        raise InvalidPunchError(f"{label} {value!r} is not a valid time (use HH:MM:SS)")
+    return seconds
+
+
+# Function to build the record of a punch in at ``now`` (HH:MM:SS) on ``today``
+def punch_in_record(emp_id, emp_name, today, now):
+    return {
+        'Employee ID': normalize_employee_id(emp_id),
+        'Employee Name': emp_name,
+        'Date': today,
+        'Punch In Time': now,
+        'Punch Out Time': None,
+        'Work Hours': None,
+        'Status': STATUS_IN_PROGRESS,
+        'Is Late': is_late_time(now)
+    }
+
+
+# Function to work out the fields a punch out at ``now`` sets on an open punch
+def punch_out_fields(punch_in, now):
+    return {
+        'Punch Out Time': now,
+        'Work Hours': calculate_hours(punch_in, now),
+        'Status': STATUS_COMPLETED
+    }
+
+
+# Function to work out the fields an admin correction of the punch times sets;
+# without a punch out time the stored one is kept
+def edit_fields(punch_in, punch_out=None):
+    # Stored as HH:MM:SS whatever was typed ("9:5" becomes "09:05:00")
+    punch_in = format_time(parse_punch_time(punch_in, "Punch in time"))
+    fields = {'Punch In Time': punch_in, 'Is Late': is_late_time(punch_in)}
+    if punch_out:
+        punch_out = format_time(parse_punch_time(punch_out, "Punch out time"))
+        fields.update(punch_out_fields(punch_in, punch_out))
+    return fields
+
+
+class PunchService:
+    """The punch rules, on top of an attendance store and the employee registry."""
+
+    def __init__(self, store=None, registry=employee_registry, clock=datetime.now):
+        self._store = store
+        self.registry = registry
+        self.clock = clock
+        # Check-then-write must not interleave for the same employee; the
+        # store's punch lock does the same across processes
+        self._lock = threading.Lock()
+
+    @property
+    def store(self):
+        # Resolved on first use so the configured backend is picked up late
+        if self._store is None:
+            self._store = get_store()
+        return self._store
+
+    def _today_and_now(self):
+        now = self.clock()
+        return now.strftime(DATE_FORMAT), now.strftime(TIME_FORMAT)
+
+    def is_registered(self, emp_id):
+        """Return whether the employee may punch (anyone may while the registry is empty)."""
+        return len(self.registry) == 0 or emp_id in self.registry
+
+    def _check_registered(self, emp_id):
+        if not normalize_employee_id(emp_id):
+            raise UnknownEmployeeError("An employee ID is required")
+        if not self.is_registered(emp_id):
+            raise UnknownEmployeeError(f"Employee ID {emp_id} is not registered in the system")
+
+    def _record(self, record_id, date=None):
+        record = self.store.get(record_id, date)
+        if record is None:
+            # A queued punch gets its real id once it has been written
+            record_id = self.store.resolve_record_id(record_id)
+            record = self.store.get(record_id, date)
+        if record is None:
+            raise StorageError(f"Attendance record {record_id} does not exist")
+        return {RECORD_ID: int(record_id), **record}
+
+    def _today(self, emp_id, today):
+        index = self.store.punch_index()
+        return index.open_record(emp_id, today), index.completed_record(emp_id, today)
+
+    @timed("service.status")
+    def status(self, emp_id):
+        """Return today's state for an employee and the record behind it."""
+        today, _ = self._today_and_now()
+        open_id, completed_id = self._today(emp_id, today)
+        if open_id is not None:
+            return {'state': PUNCHED_IN, 'record': self._record(open_id, today)}
+        if completed_id is not None:
+            return {'state': COMPLETED, 'record': self._record(completed_id, today)}
+        return {'state': NOT_PUNCHED_IN, 'record': None}
+
+    @timed("service.punch_in")
+    def punch_in(self, emp_id):
+        """Record a punch in now and return the new record."""
+        self._check_registered(emp_id)
+        with self._lock, self.store.punch_lock():
+            today, now = self._today_and_now()
+            open_id, completed_id = self._today(emp_id, today)
+            if open_id is not None:
+                raise AlreadyPunchedInError(f"Employee ID {emp_id} is already punched in for today",
+                                            self._record(open_id, today))
+            if completed_id is not None:
+                raise AlreadyCompletedError(f"Employee ID {emp_id} has already completed attendance for today",
+                                            self._record(completed_id, today))
+
+            record = punch_in_record(emp_id, self.registry.name(emp_id, default="Unknown"), today, now)
+            record_id = self.store.insert(record)
+        return {RECORD_ID: int(record_id), **record}
+
+    @timed("service.punch_out")
+    def punch_out(self, emp_id):
+        """Record a punch out now for today's open punch and return the completed record."""
+        self._check_registered(emp_id)
+        with self._lock, self.store.punch_lock():
+            today, now = self._today_and_now()
+            open_id, completed_id = self._today(emp_id, today)
+            if open_id is None:
+                if completed_id is not None:
+                    raise AlreadyCompletedError(f"Employee ID {emp_id} has already completed attendance for today",
+                                                self._record(completed_id, today))
+                raise NotPunchedInError(f"Employee ID {emp_id} has not punched in for today")
+
+            record = self._record(open_id, today)
+            fields = punch_out_fields(record['Punch In Time'], now)
+            self.store.update(open_id, fields)
+        record.update(fields)
+        return record
+
+    @timed("service.edit")
+    def edit(self, record_id, punch_in, punch_out=None):
+        """Correct the punch times of a record, re-deriving lateness and hours, and return it."""
+        with self._lock:
+            if not punch_out:
+                # Hours of a completed record follow its new punch in time
+                punch_out = self._record(record_id)['Punch Out Time']
+            fields = edit_fields(punch_in, punch_out)
+            self.store.update(record_id, fields)
+        return self._record(record_id)
+
+
+punch_service = PunchService()
@@ -0,0 +1,1869 @@
+"""Storage backends for attendance records.
+
+The Streamlit app talks to attendance data only through an ``AttendanceStore``.
+``SQLiteStore`` is the system of record: a punch in is a single-row insert and
+a punch out is a single-row update.  ``ExcelStore`` keeps the old behaviour of
+rewriting ``attendence_data.xlsx`` and is used for exports and as a legacy
+backend.  It is excluded from the constant cost per punch that the other
+backends give: an .xlsx file cannot be appended to or patched in place, so
+every punch still reads and rewrites the whole workbook.
+
+``PartitionedStore`` keeps one Parquet file per month (``ArrowStore`` one Arrow
+IPC file), so loads for a date range and single punches only touch the months
+involved, and ``query`` pushes date/employee filters and column projection
+down to the files.
+
+The backend is picked with the ``AMS_STORAGE_BACKEND`` environment variable
+(``sqlite``, ``excel``, ``partitioned`` or ``arrow``).  ``get_store`` wraps it in a write-ahead journal
+(``attendance_journal.py``) and optionally a write-behind punch queue
+(``attendance_queue.py``).
+
+Several kiosks may run the app against the same files.  Whole-file writes are
+serialised with an advisory lock file, written to a temporary file and moved
+into place atomically, and ``save`` refuses to overwrite data that changed
+since the frame was loaded (``ConflictError``); ``transaction`` retries such
+read-modify-write cycles.
+"""
+import logging
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import PatternFill
+
+from attendance_metrics import timed
+from attendance_schema import (
+    COLUMNS,
+    DATE_RANGE_ATTR,
+    RECORD_ID,
+    TIME_COLUMNS,
+    assign_fields,
+    concat_frames,
+    display_record,
+    empty_frame,
+    filter_dates,
+    format_time,
+    normalize,
+    normalize_date,
+    normalize_employee_id,
+    to_display,
+)
+from attendance_rollups import RollupReports, Rollups, month_bounds, report_months
+from attendance_rules import compute_is_late
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+logger = logging.getLogger(__name__)
+
+# Define file paths for the attendance stores
+EXCEL_FILE = "attendence_data.xlsx"
+SQLITE_FILE = "attendence_data.db"
+PARTITION_DIR = "attendance"
+ARROW_DIR = "attendance_arrow"
+
+# Frame attribute recording the store version a frame was loaded at
+VERSION_ATTR = 'store_version'
+
+LOCK_TIMEOUT = 30.0
+
+# Rows per chunk when streaming records out for exports
+EXPORT_CHUNK_ROWS = 5000
+
+# Rows per page in the records grids
+PAGE_ROWS = 50
+
+
+class StorageError(Exception):
+    """Raised when the attendance store cannot be read or written."""
+
+
+class ConflictError(StorageError):
+    """Raised when a save would overwrite changes made since the data was loaded."""
+
+
+def _try_lock(handle):
+    if os.name == 'nt':
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+    else:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+def _unlock(handle):
+    if os.name == 'nt':
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+# Lock files each thread holds, so file_lock can be taken again inside itself
+_held_locks = threading.local()
+
+
+@contextmanager
+def file_lock(path, timeout=LOCK_TIMEOUT):
+    """Hold an exclusive advisory lock on ``<path>.lock`` across processes.
+
+    The lock is re-entrant within a thread, so code holding it can call code
+    that takes it again; other threads and processes wait for it.
+    """
+    held = _held_locks.__dict__.setdefault('paths', set())
+    key = os.path.abspath(path)
+    if key in held:
+        yield
+        return
+    deadline = time.monotonic() + timeout
+    with open(path + ".lock", "a+b") as handle:
+        while True:
+            try:
+                _try_lock(handle)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise StorageError(f"Timed out waiting for the lock on {path}")
+                time.sleep(0.005 + random.random() * 0.01)
+        held.add(key)
+        try:
+            yield
+        finally:
+            held.discard(key)
+            _unlock(handle)
+
+
+def _replace(source, target, attempts=20):
+    # Windows refuses to replace a file another process has open for reading
+    for attempt in range(attempts):
+        try:
+            os.replace(source, target)
+            return
+        except PermissionError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(0.05)
+
+
+@contextmanager
+def atomic_write(path):
+    """Yield a temporary path next to ``path``; on success it replaces ``path``.
+
+    Readers therefore see either the old file or the new one, never a
+    half-written workbook.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    base, ext = os.path.splitext(os.path.basename(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=base + ".", suffix=".tmp" + ext, dir=directory)
+    os.close(fd)
+    try:
+        yield tmp_path
+        with open(tmp_path, "rb+") as handle:
+            os.fsync(handle.fileno())
+        _replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# Function to move an unreadable store file (and SQLite side files) aside instead of deleting it
+def quarantine(path, error=None):
+    corrupt_path = f"{path}.corrupt-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            _replace(path + suffix, corrupt_path + suffix)
+    logger.warning("Moved unreadable attendance store to %s: %s", corrupt_path, error)
+    return corrupt_path
+
+
+# Function to read an attendance workbook, migrating the old break-based schema
+def read_legacy_excel(path):
+    existing_df = pd.read_excel(path)
+
+    if 'Break 1 Start' not in existing_df.columns:
+        return existing_df
+
+    # We're migrating from the old format with breaks to the new format
+    new_df = pd.DataFrame(columns=COLUMNS)
+    for col in new_df.columns:
+        if col in existing_df.columns:
+            new_df[col] = existing_df[col]
+
+    # Calculate Is Late for existing records
+    if 'Punch In Time' in existing_df.columns:
+        new_df['Is Late'] = compute_is_late(existing_df['Punch In Time']).to_numpy()
+
+    return new_df
+
+
+class FrameCache:
+    """Process-wide cache of parsed attendance frames.
+
+    Entries are keyed on the store path and checked against ``store.version()``
+    (file mtime/size plus an in-process write counter), so every Streamlit
+    session in the process shares one parsed copy until the data changes.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, store, partition=None):
+        """Return a copy of the store's records, or of one partition of them."""
+        if partition is None:
+            key, version = store.path, store.version()
+        else:
+            key, version = (store.path, partition), store.partition_version(partition)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self.hits += 1
+                return self._copy(entry[1], version)
+            self.misses += 1
+
+        with timed(f"storage.read.{store.name}"):
+            df = store._read() if partition is None else store._read_partition(partition)
+        with self._lock:
+            self._entries[key] = (version, df)
+        return self._copy(df, version)
+
+    def put(self, store, partition, version, df):
+        """Cache a partition the store has just written, saving a re-read."""
+        with self._lock:
+            self._entries[(store.path, partition)] = (version, df.copy())
+
+    @staticmethod
+    def _copy(df, version):
+        # Hand out a copy so callers can edit it freely, stamped with the
+        # version it was read at for optimistic saves
+        df = df.copy()
+        df.attrs[VERSION_ATTR] = version
+        return df
+
+    def invalidate(self, store=None, partition=None):
+        with self._lock:
+            if store is None:
+                self._entries.clear()
+            elif partition is not None:
+                self._entries.pop((store.path, partition), None)
+            else:
+                for key in list(self._entries):
+                    if key == store.path or (isinstance(key, tuple) and key[0] == store.path):
+                        del self._entries[key]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': len(self._entries)
+        }
+
+
+frame_cache = FrameCache()
+
+
+class PunchIndex:
+    """Lookup of (employee id, date) to the open and completed punch records.
+
+    Built once from a loaded frame and kept current by the store on every
+    insert and update, so duplicate-punch and status checks never scan the
+    history.
+    """
+
+    def __init__(self):
+        self._open = {}
+        self._completed = {}
+        # record id -> (key, is_completed) so updates can move records
+        self._records = {}
+
+    @classmethod
+    def build(cls, df):
+        index = cls()
+        if df.empty:
+            return index
+        keys = zip(
+            (normalize_employee_id(v) for v in df['Employee ID'].tolist()),
+            (normalize_date(v) for v in df['Date'].tolist())
+        )
+        completed = (df['Status'] == 'Completed').tolist()
+        for record_id, key, is_completed in zip(df.index.tolist(), keys, completed):
+            index._add(record_id, key, is_completed)
+        return index
+
+    def _add(self, record_id, key, is_completed):
+        # A rebuild racing a write may already hold the record
+        if record_id in self._records:
+            self._remove(record_id)
+        self._records[record_id] = (key, is_completed)
+        target = self._completed if is_completed else self._open
+        target.setdefault(key, []).append(record_id)
+
+    def _remove(self, record_id):
+        key, is_completed = self._records.pop(record_id)
+        target = self._completed if is_completed else self._open
+        ids = target[key]
+        ids.remove(record_id)
+        if not ids:
+            del target[key]
+
+    @staticmethod
+    def _first(target, emp_id, date):
+        ids = target.get((normalize_employee_id(emp_id), normalize_date(date)))
+        # Return the earliest record, matching the old first-match behaviour
+        return min(ids) if ids else None
+
+    def add(self, record_id, record):
+        key = (normalize_employee_id(record.get('Employee ID')), normalize_date(record.get('Date')))
+        self._add(record_id, key, record.get('Status') == 'Completed')
+
+    def update(self, record_id, fields):
+        if record_id not in self._records:
+            return
+        key, is_completed = self._records[record_id]
+        if 'Employee ID' in fields:
+            key = (normalize_employee_id(fields['Employee ID']), key[1])
+        if 'Date' in fields:
+            key = (key[0], normalize_date(fields['Date']))
+        if 'Status' in fields:
+            is_completed = fields['Status'] == 'Completed'
+        self._remove(record_id)
+        self._add(record_id, key, is_completed)
+
+    def open_record(self, emp_id, date):
+        """Return the id of the in-progress record for this employee and date."""
+        return self._first(self._open, emp_id, date)
+
+    def completed_record(self, emp_id, date):
+        """Return the id of the completed record for this employee and date."""
+        return self._first(self._completed, emp_id, date)
+
+    def recorded_days(self, keys):
+        """Return the (employee id, date) keys, normalised, that have any record."""
+        keys = {(normalize_employee_id(emp_id), normalize_date(date)) for emp_id, date in keys}
+        return {key for key in keys if key in self._open or key in self._completed}
+
+    def __len__(self):
+        return len(self._records)
+
+
+# Function to reject a sort column that is not an attendance column
+def _check_sort_column(column):
+    if column not in COLUMNS:
+        raise StorageError(f"Cannot sort attendance records by {column!r}")
+
+
+# Function to order records as pages are ordered: by ``sort_by`` with missing
+# values last (text by its value, as SQLite and Arrow sort it), then by id
+def _sort_records(df, sort_by, descending=False):
+    return df.sort_index().sort_values(
+        sort_by, ascending=not descending, kind='stable', na_position='last',
+        key=lambda values: values.astype(object) if isinstance(values.dtype, pd.CategoricalDtype) else values
+    )
+
+
+# Function to get a cheap signature of a file that changes when it is written
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class AttendanceStore:
+    """Interface shared by all attendance backends.
+
+    Frames returned by ``load`` are indexed by ``Record ID``; that id is what
+    ``update`` expects.  ``punch_index`` and ``rollups`` are kept current on
+    every insert and update made through the store.  ``load`` is served from ``frame_cache``; backends
+    implement ``_read``, ``_save``, ``_insert_many`` and ``_update_many`` and
+    call ``_changed`` after every write.
+    """
+
+    name = None
+    path = None
+
+    # Whether every write is committed atomically by the backend itself (its
+    # own write-ahead log), so a journal checkpoint needs no snapshot
+    transactional = False
+
+    # Count of writes made by this process, part of the cache version
+    _writes = 0
+
+    # Punch index and the store version it reflects
+    _index = None
+    _index_version = None
+
+    # Report rollups and the store version they reflect
+    _rollups = None
+    _rollups_version = None
+
+    # Keeps rebuilds of the index and rollups from interleaving with the
+    # incremental updates of a write made by another thread
+    _derived_lock = threading.RLock()
+
+    def version(self):
+        """Return a token that changes whenever the stored data changes."""
+        return (self._writes, _file_signature(self.path))
+
+    def _changed(self):
+        self._writes += 1
+        frame_cache.invalidate(self)
+
+    def initialize(self):
+        """Create the store if needed and return its current contents."""
+        raise NotImplementedError
+
+    def exists(self):
+        raise NotImplementedError
+
+    def load(self, start_date=None, end_date=None):
+        """Return the records, optionally only those dated between two dates."""
+        if not self.exists():
+            self.initialize()
+        return filter_dates(frame_cache.get(self), start_date, end_date)
+
+    def _read(self):
+        raise NotImplementedError
+
+    def query(self, start_date=None, end_date=None, employee_ids=None, columns=None):
+        """Return the records matching the filters, with only ``columns``.
+
+        Backends that can push the date and employee filters (and the column
+        projection) down to storage override this; the default filters the
+        cached frame.
+        """
+        df = self.load(start_date, end_date)
+        if employee_ids:
+            df = df[df['Employee ID'].isin([normalize_employee_id(e) for e in employee_ids])]
+        if columns is not None:
+            df = df[list(columns)]
+        df.attrs[DATE_RANGE_ATTR] = (start_date, end_date)
+        return df
+
+    def iter_chunks(self, start_date=None, end_date=None, employee_ids=None, chunk_size=EXPORT_CHUNK_ROWS):
+        """Yield the matching records as frames of at most ``chunk_size`` rows.
+
+        Exports use this so memory stays bounded whatever the range; backends
+        that can stream from storage override it, the default slices the
+        cached frame.
+        """
+        df = self.query(start_date, end_date, employee_ids)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+
+    def _matching(self, start_date=None, end_date=None, employee_ids=None, is_late=None):
+        df = self.query(start_date, end_date, employee_ids)
+        if is_late is not None:
+            df = df[df['Is Late'] == is_late]
+        return df
+
+    def count(self, start_date=None, end_date=None, employee_ids=None, is_late=None):
+        """Return how many records match the filters."""
+        return len(self._matching(start_date, end_date, employee_ids, is_late))
+
+    def get(self, record_id, date=None):
+        """Return one record as a dict of display values, or None.
+
+        ``date`` is the record's date if known, so only that day is read;
+        backends that can look a record up by id override this.
+        """
+        df = self.load(date, date) if date is not None else self.load()
+        if record_id not in df.index:
+            return None
+        return display_record(df, record_id)
+
+    def page(self, start_date=None, end_date=None, employee_ids=None, is_late=None,
+             sort_by='Date', descending=False, offset=0, limit=PAGE_ROWS):
+        """Return one sorted page of the matching records and how many match.
+
+        Rows are ordered by ``sort_by`` (missing values last) and then by
+        record id, so pages never overlap.  Backends that can sort and slice
+        in storage override this; the default sorts the cached frame.
+        """
+        _check_sort_column(sort_by)
+        df = _sort_records(self._matching(start_date, end_date, employee_ids, is_late), sort_by, descending)
+        return df.iloc[offset:offset + limit], len(df)
+
+    def date_bounds(self):
+        """Return the first and last attendance dates, or ``(None, None)``."""
+        dates = self.load()['Date'].dropna()
+        if dates.empty:
+            return None, None
+        return dates.min(), dates.max()
+
+    def write_lock(self):
+        """Return the lock serialising whole-store writes across processes."""
+        return file_lock(self.path)
+
+    def punch_lock(self):
+        """Return the lock a punch holds around its status check and its write.
+
+        It is the write lock, so kiosks in other processes cannot both punch
+        an employee in; stores that settle duplicates later return another.
+        """
+        return self.write_lock()
+
+    def save(self, df, expected_version=None):
+        """Replace every record in the store with ``df``.
+
+        ``expected_version`` defaults to the version ``df`` was loaded at; if
+        the store changed since then ``ConflictError`` is raised instead of
+        silently dropping the other writer's records.
+        """
+        if expected_version is None and df is not None:
+            expected_version = df.attrs.get(VERSION_ATTR)
+        if df is not None and df.attrs.get(DATE_RANGE_ATTR):
+            raise StorageError("Cannot save a date-filtered frame over the whole store")
+        if df is None or df.empty:
+            df = empty_frame()
+
+        with self.write_lock():
+            if expected_version is not None and self.version() != expected_version:
+                raise ConflictError("Attendance data changed since it was loaded")
+            self._save(df)
+            self._changed()
+
+    def transaction(self, mutate, retries=20):
+        """Save ``mutate(frame)`` over the latest data, retrying on conflicts."""
+        for attempt in range(retries + 1):
+            df = self.load()
+            version = df.attrs.get(VERSION_ATTR)
+            try:
+                self.save(mutate(df), expected_version=version)
+                return
+            except ConflictError:
+                if attempt == retries:
+                    raise
+                # Jittered backoff so competing kiosks stop colliding
+                time.sleep(random.uniform(0, 0.01 * 2 ** min(attempt, 6)))
+
+    def _save(self, df):
+        raise NotImplementedError
+
+    def punch_index(self):
+        """Return the punch index, rebuilding it only if the data changed."""
+        with self._derived_lock:
+            version = self.version()
+            if self._index is None or self._index_version != version:
+                self._index = PunchIndex.build(self.load())
+                # The version read before loading: a write landing meanwhile forces a rebuild
+                self._index_version = version
+            return self._index
+
+    def _index_is_current(self):
+        return self._index is not None and self._index_version == self.version()
+
+    def rollups(self):
+        """Return the report rollups, rebuilding them only if the data changed."""
+        with self._derived_lock:
+            version = self.version()
+            if self._rollups is None or self._rollups_version != version:
+                self._rollups = Rollups.build(self.load())
+                self._rollups_version = version
+            return self._rollups
+
+    def _rollups_are_current(self):
+        return self._rollups is not None and self._rollups_version == self.version()
+
+    def resolve_record_id(self, record_id):
+        """Return the current id of a record (ids only change in queued stores)."""
+        return record_id
+
+    def insert(self, record):
+        """Append a single record and return its record id."""
+        return self.insert_many([record])[0]
+
+    def update(self, record_id, fields):
+        """Update the given fields of a single record."""
+        if fields:
+            self.update_many([(record_id, fields)])
+
+    def insert_many(self, records):
+        """Append several records in one write and return their record ids."""
+        if not records:
+            return []
+        with self._derived_lock:
+            index_current = self._index_is_current()
+            rollups_current = self._rollups_are_current()
+            record_ids = self._insert_many(records)
+            if index_current:
+                for record_id, record in zip(record_ids, records):
+                    self._index.add(record_id, record)
+                self._index_version = self.version()
+            if rollups_current:
+                for record_id, record in zip(record_ids, records):
+                    self._rollups.add(record_id, record)
+                self._rollups_version = self.version()
+        return record_ids
+
+    def update_many(self, updates):
+        """Apply several ``(record_id, fields)`` updates in one write."""
+        updates = [(record_id, fields) for record_id, fields in updates if fields]
+        if not updates:
+            return
+        with self._derived_lock:
+            index_current = self._index_is_current()
+            rollups_current = self._rollups_are_current()
+            self._update_many(updates)
+            if index_current:
+                for record_id, fields in updates:
+                    self._index.update(record_id, fields)
+                self._index_version = self.version()
+            if rollups_current:
+                for record_id, fields in updates:
+                    self._rollups.update(record_id, fields)
+                self._rollups_version = self.version()
+
+    def _insert_many(self, records):
+        raise NotImplementedError
+
+    def _update_many(self, updates):
+        raise NotImplementedError
+
+    def export_excel(self, path=EXCEL_FILE):
+        """Write every record to an Excel workbook at ``path``."""
+        with atomic_write(path) as tmp_path:
+            write_excel(self.load(), tmp_path)
+        return path
+
+
+# Shared fills for Excel row colouring: red for late, green for on time
+LATE_FILL = PatternFill(start_color="FFCCCC", end_color="FFCCCC", fill_type="solid")
+ON_TIME_FILL = PatternFill(start_color="CCFFCC", end_color="CCFFCC", fill_type="solid")
+
+# Column H holds Is Late in workbooks written by this app
+_DEFAULT_LATE_COLUMN = COLUMNS.index('Is Late') + 1
+
+
+def _header_columns(sheet):
+    return {cell.value: cell.column for cell in sheet[1] if cell.value is not None}
+
+
+# Function to colour only the given worksheet rows from their Is Late cell
+def format_excel_rows(sheet, rows, late_column=None):
+    late_column = late_column or _header_columns(sheet).get('Is Late', _DEFAULT_LATE_COLUMN)
+    max_column = sheet.max_column
+    for row_idx in rows:
+        is_late_value = sheet.cell(row=row_idx, column=late_column).value
+        if is_late_value == True:
+            fill = LATE_FILL
+        elif is_late_value == False:
+            fill = ON_TIME_FILL
+        else:
+            continue
+        for col_idx in range(1, max_column + 1):
+            sheet.cell(row=row_idx, column=col_idx).fill = fill
+
+
+# Function to colour every row of a workbook (used after full rewrites)
+@timed("excel.format_workbook")
+def format_excel_workbook(path):
+    wb = load_workbook(path)
+    sheet = wb.active
+    format_excel_rows(sheet, range(2, sheet.max_row + 1))
+    wb.save(path)
+
+
+# Function to write a frame as a coloured workbook in one streaming pass
+def write_excel(df, path):
+    return write_excel_chunks([df], path)
+
+
+# Function to write frames arriving chunk by chunk as one coloured workbook
+@timed("excel.write")
+def write_excel_chunks(chunks, path):
+    # Write-only mode streams rows to disk instead of building the whole sheet
+    wb = Workbook(write_only=True)
+    sheet = wb.create_sheet("Sheet1")
+    sheet.append(COLUMNS)
+    for df in chunks:
+        display = to_display(normalize(df))
+        late_flags = display['Is Late'].tolist()
+        rows = display[COLUMNS].astype(object).where(display[COLUMNS].notna(), None).values.tolist()
+        for values, is_late in zip(rows, late_flags):
+            fill = LATE_FILL if is_late else ON_TIME_FILL
+            cells = []
+            for value in values:
+                cell = WriteOnlyCell(sheet, value=value)
+                cell.fill = fill
+                cells.append(cell)
+            sheet.append(cells)
+    wb.save(path)
+    return path
+
+
+# Function to convert a record value to what is written in an Excel cell
+def _excel_value(column, value):
+    value = _to_sql_value(column, value)
+    if column == 'Is Late' and value is not None:
+        return bool(value)
+    return value
+
+
+class ExcelStore(AttendanceStore):
+    """Legacy backend that keeps the whole history in one workbook.
+
+    Only the touched row is formatted, but openpyxl still loads and saves
+    the whole workbook, so a punch costs O(rows).  Use SQLite or the
+    partitioned backends where punch cost must not grow with the history.
+    """
+
+    name = "excel"
+
+    def __init__(self, path=EXCEL_FILE):
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def initialize(self):
+        df = empty_frame()
+
+        with self.write_lock():
+            if self.exists():
+                try:
+                    df = read_legacy_excel(self.path)
+                except Exception as e:
+                    # If there's an error reading the file it might be corrupted;
+                    # keep it aside for recovery rather than deleting it
+                    quarantine(self.path, e)
+
+            with atomic_write(self.path) as tmp_path:
+                write_excel(df, tmp_path)
+            self._changed()
+
+        if not self.exists():
+            raise StorageError("Failed to create Excel file")
+
+        return self.load()
+
+    def _read(self):
+        return normalize(pd.read_excel(self.path))
+
+    def _save(self, df):
+        # One styled write instead of to_excel followed by a repaint
+        with atomic_write(self.path) as tmp_path:
+            write_excel(df, tmp_path)
+
+        if not (self.exists() and os.path.getsize(self.path) > 0):
+            raise StorageError("Excel file was not created or is empty")
+
+    # Rows are edited in place and only the touched row is recoloured, so
+    # formatting cost per punch does not grow with the sheet
+    def _insert_many(self, records):
+        if not self.exists():
+            self.initialize()
+        with self.write_lock():
+            return self._insert_many_locked(records)
+
+    def _insert_many_locked(self, records):
+        wb = load_workbook(self.path)
+        sheet = wb.active
+        header = _header_columns(sheet)
+        late_column = header.get('Is Late')
+
+        record_ids = []
+        for record in records:
+            row = [None] * sheet.max_column
+            for column, value in record.items():
+                if column in header:
+                    row[header[column] - 1] = _excel_value(column, value)
+            sheet.append(row)
+
+            row_idx = sheet.max_row
+            format_excel_rows(sheet, [row_idx], late_column)
+            # Record ids are zero-based data rows below the header
+            record_ids.append(row_idx - 2)
+
+        with atomic_write(self.path) as tmp_path:
+            wb.save(tmp_path)
+        self._changed()
+        return record_ids
+
+    def _update_many(self, updates):
+        with self.write_lock():
+            self._update_many_locked(updates)
+
+    def _update_many_locked(self, updates):
+        wb = load_workbook(self.path)
+        sheet = wb.active
+        header = _header_columns(sheet)
+        late_column = header.get('Is Late')
+
+        for record_id, fields in updates:
+            row_idx = int(record_id) + 2
+            if row_idx > sheet.max_row:
+                raise StorageError(f"Attendance record {record_id} does not exist")
+            for column, value in fields.items():
+                if column in header:
+                    sheet.cell(row=row_idx, column=header[column]).value = _excel_value(column, value)
+            format_excel_rows(sheet, [row_idx], late_column)
+
+        with atomic_write(self.path) as tmp_path:
+            wb.save(tmp_path)
+        self._changed()
+
+    def export_excel(self, path=EXCEL_FILE):
+        if os.path.abspath(path) == os.path.abspath(self.path):
+            return path
+        return super().export_excel(path)
+
+
+# Mapping between frame columns and SQLite columns
+_SQL_COLUMNS = {
+    'Employee ID': 'employee_id',
+    'Employee Name': 'employee_name',
+    'Date': 'date',
+    'Punch In Time': 'punch_in_time',
+    'Punch Out Time': 'punch_out_time',
+    'Work Hours': 'work_hours',
+    'Status': 'status',
+    'Is Late': 'is_late'
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS attendance (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    employee_id TEXT NOT NULL,
+    employee_name TEXT,
+    date TEXT NOT NULL,
+    punch_in_time TEXT,
+    punch_out_time TEXT,
+    work_hours REAL,
+    status TEXT,
+    is_late INTEGER
+);
+CREATE INDEX IF NOT EXISTS attendance_date_employee ON attendance (date, employee_id);
+"""
+
+
+# Function to get the record id each row keeps on a full save, or None where
+# the index holds no usable id (missing, not a positive integer, repeated)
+def _record_ids(index):
+    if isinstance(index, pd.RangeIndex) and index.start == 0:
+        # Row positions (a workbook import, a generated frame), not record ids
+        return [None] * len(index)
+    ids = pd.to_numeric(pd.Series(index), errors='coerce')
+    usable = ids.notna() & (ids > 0) & (ids == ids.round()) & ~ids.duplicated()
+    return [int(i) if keep else None for i, keep in zip(ids, usable)]
+
+
+# Rollup tables kept by triggers in the same transaction as every write, so
+# reports never group raw punches and every process sees the same totals
+_ROLLUP_TABLES = [
+    """CREATE TABLE IF NOT EXISTS attendance_daily (
+        date TEXT NOT NULL,
+        employee_id TEXT NOT NULL,
+        employee_name TEXT NOT NULL,
+        is_late INTEGER NOT NULL,
+        hours REAL NOT NULL,
+        records INTEGER NOT NULL,
+        PRIMARY KEY (date, employee_id, employee_name, is_late)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS attendance_monthly (
+        month TEXT NOT NULL,
+        employee_id TEXT NOT NULL,
+        employee_name TEXT NOT NULL,
+        is_late INTEGER NOT NULL,
+        hours REAL NOT NULL,
+        records INTEGER NOT NULL,
+        PRIMARY KEY (month, employee_id, employee_name, is_late)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS attendance_dates (
+        date TEXT PRIMARY KEY,
+        late INTEGER NOT NULL,
+        records INTEGER NOT NULL
+    ) WITHOUT ROWID""",
+]
+
+_ROLLUP_TRIGGERS = ['attendance_rollup_insert', 'attendance_rollup_delete', 'attendance_rollup_update']
+
+
+# Function to build the trigger statements adding (or removing) one row's share of the rollups
+def _rollup_statements(row, add):
+    name = f"COALESCE({row}.employee_name, '')"
+    late = f"(COALESCE({row}.is_late, 0) != 0)"
+    hours = f"COALESCE({row}.work_hours, 0)"
+    if add:
+        return f"""
+        INSERT INTO attendance_daily VALUES ({row}.date, {row}.employee_id, {name}, {late}, {hours}, 1)
+            ON CONFLICT (date, employee_id, employee_name, is_late)
+            DO UPDATE SET hours = hours + excluded.hours, records = records + 1;
+        INSERT INTO attendance_monthly VALUES (substr({row}.date, 1, 7), {row}.employee_id, {name}, {late}, {hours}, 1)
+            ON CONFLICT (month, employee_id, employee_name, is_late)
+            DO UPDATE SET hours = hours + excluded.hours, records = records + 1;
+        INSERT INTO attendance_dates VALUES ({row}.date, {late}, 1)
+            ON CONFLICT (date) DO UPDATE SET late = late + excluded.late, records = records + 1;"""
+    daily = f"date = {row}.date AND employee_id = {row}.employee_id AND employee_name = {name} AND is_late = {late}"
+    monthly = f"month = substr({row}.date, 1, 7) AND employee_id = {row}.employee_id " \
+              f"AND employee_name = {name} AND is_late = {late}"
+    return f"""
+        UPDATE attendance_daily SET hours = hours - {hours}, records = records - 1 WHERE {daily};
+        DELETE FROM attendance_daily WHERE {daily} AND records = 0;
+        UPDATE attendance_monthly SET hours = hours - {hours}, records = records - 1 WHERE {monthly};
+        DELETE FROM attendance_monthly WHERE {monthly} AND records = 0;
+        UPDATE attendance_dates SET late = late - {late}, records = records - 1 WHERE date = {row}.date;
+        DELETE FROM attendance_dates WHERE date = {row}.date AND records = 0;"""
+
+
+_ROLLUP_TRIGGER_SQL = [
+    f"CREATE TRIGGER attendance_rollup_insert AFTER INSERT ON attendance BEGIN"
+    f"{_rollup_statements('NEW', add=True)}\nEND",
+    f"CREATE TRIGGER attendance_rollup_delete AFTER DELETE ON attendance BEGIN"
+    f"{_rollup_statements('OLD', add=False)}\nEND",
+    f"CREATE TRIGGER attendance_rollup_update "
+    f"AFTER UPDATE OF date, employee_id, employee_name, is_late, work_hours ON attendance BEGIN"
+    f"{_rollup_statements('OLD', add=False)}{_rollup_statements('NEW', add=True)}\nEND",
+]
+
+_ROLLUP_BACKFILL = [
+    """INSERT INTO attendance_daily
+       SELECT date, employee_id, COALESCE(employee_name, ''), COALESCE(is_late, 0) != 0,
+              SUM(COALESCE(work_hours, 0)), COUNT(*)
+       FROM attendance GROUP BY 1, 2, 3, 4""",
+    """INSERT INTO attendance_monthly
+       SELECT substr(date, 1, 7), employee_id, COALESCE(employee_name, ''), COALESCE(is_late, 0) != 0,
+              SUM(COALESCE(work_hours, 0)), COUNT(*)
+       FROM attendance GROUP BY 1, 2, 3, 4""",
+    """INSERT INTO attendance_dates
+       SELECT date, SUM(COALESCE(is_late, 0) != 0), COUNT(*) FROM attendance GROUP BY 1""",
+]
+
+
+# Function to drop the rollup triggers, ahead of a bulk rewrite
+def _drop_rollup_triggers(conn):
+    for trigger in _ROLLUP_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+
+
+# Function to rebuild the rollup tables from the records in one pass and
+# (re)create the triggers that keep them current; run inside a write transaction
+def _build_rollups(conn):
+    for sql in _ROLLUP_TABLES:
+        conn.execute(sql)
+    _drop_rollup_triggers(conn)
+    for table in ('attendance_daily', 'attendance_monthly', 'attendance_dates'):
+        conn.execute(f"DELETE FROM {table}")
+    for sql in _ROLLUP_BACKFILL + _ROLLUP_TRIGGER_SQL:
+        conn.execute(sql)
+
+
+def _to_sql_value(column, value):
+    if value is None:
+        return None
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    if column == 'Is Late':
+        if isinstance(value, str):
+            return int(value.strip().lower() == 'true')
+        return int(bool(value))
+    if column == 'Work Hours':
+        return float(value)
+    if column in TIME_COLUMNS:
+        return format_time(value)
+    if column == 'Date':
+        return normalize_date(value)
+    if column == 'Employee ID':
+        return normalize_employee_id(value)
+    return str(value)
+
+
+class _SQLitePunchIndex:
+    """Punch lookups answered by SQLite's (date, employee_id) index.
+
+    Every lookup is one indexed query, so it sees writes from other
+    processes straight away and never loads or indexes the history.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def _first(self, emp_id, date, completed):
+        if not self.store.exists():
+            return None
+        sql = "SELECT MIN(id) FROM attendance WHERE date = ? AND employee_id = ? AND status {} 'Completed'".format(
+            "IS" if completed else "IS NOT"
+        )
+        with self.store._connect() as conn:
+            row = conn.execute(sql, (normalize_date(date), normalize_employee_id(emp_id))).fetchone()
+        return row[0]
+
+    def open_record(self, emp_id, date):
+        return self._first(emp_id, date, completed=False)
+
+    def completed_record(self, emp_id, date):
+        return self._first(emp_id, date, completed=True)
+
+    def recorded_days(self, keys):
+        keys = {(normalize_employee_id(emp_id), normalize_date(date)) for emp_id, date in keys}
+        if not keys or not self.store.exists():
+            return set()
+        dates = [date for _, date in keys]
+        # One range scan of the date index rather than a query per key
+        with self.store._connect() as conn:
+            rows = conn.execute("SELECT DISTINCT employee_id, date FROM attendance WHERE date BETWEEN ? AND ?",
+                                (min(dates), max(dates))).fetchall()
+        return keys & set(rows)
+
+
+class _SQLiteRollups(RollupReports):
+    """Report rollups read from the tables SQLite's triggers keep current."""
+
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+
+    def _memo_token(self):
+        return self.store.version()
+
+    def _filters(self, employee_ids, is_late):
+        where, params = "", []
+        if employee_ids:
+            ids = [normalize_employee_id(e) for e in employee_ids]
+            where += " AND employee_id IN ({})".format(", ".join("?" for _ in ids))
+            params.extend(ids)
+        if is_late is not None:
+            where += " AND is_late = ?"
+            params.append(int(bool(is_late)))
+        return where, params
+
+    def _rows(self, start_date, end_date, employee_ids=None, is_late=None):
+        months, full, first, last = report_months(start_date, end_date)
+        where, params = self._filters(employee_ids, is_late)
+        columns = "employee_id, employee_name, is_late, hours, records"
+        queries = []
+        if full:
+            queries.append((
+                "SELECT {} FROM attendance_monthly WHERE month IN ({}){}".format(
+                    columns, ", ".join("?" for _ in full), where),
+                sorted(full) + params
+            ))
+        # Only the partial months at either end are read day by day
+        for month in months:
+            if month not in full:
+                month_start, month_end = month_bounds(month)
+                queries.append((
+                    f"SELECT {columns} FROM attendance_daily WHERE date BETWEEN ? AND ?{where}",
+                    [max(first, month_start), min(last, month_end)] + params
+                ))
+        with self.store._connect() as conn:
+            rows = [row for sql, query_params in queries for row in conn.execute(sql, query_params)]
+        for emp_id, name, late, hours, count in rows:
+            yield emp_id, name, bool(late), hours, count
+
+    def _late_counts(self, start_date, end_date, employee_ids=None, is_late=None):
+        first, last = normalize_date(start_date), normalize_date(end_date)
+        if not employee_ids and is_late is None:
+            sql, params = "SELECT date, late FROM attendance_dates WHERE date BETWEEN ? AND ?", [first, last]
+        else:
+            where, params = self._filters(employee_ids, is_late)
+            sql = ("SELECT date, SUM(CASE WHEN is_late THEN records ELSE 0 END) FROM attendance_daily "
+                   f"WHERE date BETWEEN ? AND ?{where} GROUP BY date")
+            params = [first, last] + params
+        with self.store._connect() as conn:
+            return dict(conn.execute(sql, params).fetchall())
+
+
+class SQLiteStore(AttendanceStore):
+    """Append-only-friendly backend: punches are single-row statements."""
+
+    name = "sqlite"
+    transactional = True
+
+    def __init__(self, path=SQLITE_FILE, legacy_excel=EXCEL_FILE):
+        self.path = path
+        self.legacy_excel = legacy_excel
+        self._punch_index = _SQLitePunchIndex(self)
+        self._rollup_reports = _SQLiteRollups(self)
+        self._rollups_ready = False
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # Commit on success, roll back on error
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def version(self):
+        # Writes land in the -wal file until SQLite checkpoints them
+        return super().version() + (_file_signature(self.path + "-wal"),)
+
+    def initialize(self):
+        is_new = not self.exists()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+        self._ensure_rollups()
+        self._changed()
+
+        # Import the old workbook once so existing history is kept
+        if is_new and self.legacy_excel and os.path.exists(self.legacy_excel):
+            legacy_df = read_legacy_excel(self.legacy_excel)
+            if not legacy_df.empty:
+                self._insert_frame(legacy_df)
+
+        return self.load()
+
+    def load(self, start_date=None, end_date=None):
+        if start_date is None and end_date is None:
+            return super().load()
+        # A date range is read through the date index, not out of the whole history
+        version = self.version()
+        df = self.query(start_date, end_date)
+        df.attrs[VERSION_ATTR] = version
+        return df
+
+    def _read(self):
+        sql_columns = ", ".join(_SQL_COLUMNS.values())
+        with self._connect() as conn:
+            df = pd.read_sql_query(f"SELECT id, {sql_columns} FROM attendance ORDER BY id", conn, index_col='id')
+        df = df.rename(columns={v: k for k, v in _SQL_COLUMNS.items()})
+        return normalize(df)
+
+    def _where(self, start_date=None, end_date=None, employee_ids=None, is_late=None):
+        where, params = [], []
+        # Dates are stored as YYYY-MM-DD text, so they compare in order
+        if start_date is not None:
+            where.append("date >= ?")
+            params.append(normalize_date(start_date))
+        if end_date is not None:
+            where.append("date <= ?")
+            params.append(normalize_date(end_date))
+        if employee_ids:
+            ids = [normalize_employee_id(e) for e in employee_ids]
+            where.append("employee_id IN ({})".format(", ".join("?" for _ in ids)))
+            params.extend(ids)
+        if is_late is not None:
+            where.append("is_late = ?")
+            params.append(int(bool(is_late)))
+        return (" WHERE " + " AND ".join(where) if where else ""), params
+
+    def _select(self, start_date=None, end_date=None, employee_ids=None, columns=None):
+        where, params = self._where(start_date, end_date, employee_ids)
+        selected = [c for c in COLUMNS if columns is None or c in columns]
+        sql = "SELECT id, {} FROM attendance".format(", ".join(_SQL_COLUMNS[c] for c in selected))
+        return sql + where + " ORDER BY id", params
+
+    @staticmethod
+    def _from_sql(df, columns=None):
+        df = normalize(df.rename(columns={v: k for k, v in _SQL_COLUMNS.items()}))
+        if columns is not None:
+            df = df[list(columns)]
+        return df
+
+    def query(self, start_date=None, end_date=None, employee_ids=None, columns=None):
+        if not self.exists():
+            self.initialize()
+        sql, params = self._select(start_date, end_date, employee_ids, columns)
+        with self._connect() as conn:
+            df = pd.read_sql_query(sql, conn, params=params, index_col='id')
+        df = self._from_sql(df, columns)
+        df.attrs[DATE_RANGE_ATTR] = (start_date, end_date)
+        return df
+
+    def iter_chunks(self, start_date=None, end_date=None, employee_ids=None, chunk_size=EXPORT_CHUNK_ROWS):
+        if not self.exists():
+            self.initialize()
+        sql, params = self._select(start_date, end_date, employee_ids)
+        # The cursor hands rows over chunk by chunk
+        with self._connect() as conn:
+            for chunk in pd.read_sql_query(sql, conn, params=params, index_col='id', chunksize=chunk_size):
+                yield self._from_sql(chunk)
+
+    def get(self, record_id, date=None):
+        if not self.exists():
+            return None
+        sql_columns = ", ".join(_SQL_COLUMNS.values())
+        # A primary key lookup; the values are stored as they are displayed
+        with self._connect() as conn:
+            row = conn.execute(f"SELECT {sql_columns} FROM attendance WHERE id = ?", (int(record_id),)).fetchone()
+        if row is None:
+            return None
+        record = dict(zip(_SQL_COLUMNS, row))
+        record['Is Late'] = bool(record['Is Late'])
+        return record
+
+    def count(self, start_date=None, end_date=None, employee_ids=None, is_late=None):
+        if not self.exists():
+            self.initialize()
+        where, params = self._where(start_date, end_date, employee_ids, is_late)
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM attendance" + where, params).fetchone()[0]
+
+    def date_bounds(self):
+        if not self.exists():
+            return None, None
+        # Both ends of the date index; no rows are read
+        with self._connect() as conn:
+            first, last = conn.execute("SELECT MIN(date), MAX(date) FROM attendance").fetchone()
+        if first is None:
+            return None, None
+        return pd.Timestamp(first), pd.Timestamp(last)
+
+    def punch_index(self):
+        # Indexed queries instead of an in-memory index of the whole history
+        return self._punch_index
+
+    def _ensure_rollups(self):
+        # Stores created before the rollup tables get them, filled from the
+        # records, the first time this process needs them
+        if self._rollups_ready:
+            return
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            installed = conn.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name IN ({})".format(
+                    ", ".join("?" for _ in _ROLLUP_TRIGGERS)),
+                _ROLLUP_TRIGGERS
+            ).fetchone()[0]
+            if installed != len(_ROLLUP_TRIGGERS):
+                _build_rollups(conn)
+        self._rollups_ready = True
+
+    def rollups(self):
+        # Kept in SQLite tables in the same transaction as every write
+        if not self.exists():
+            self.initialize()
+        self._ensure_rollups()
+        return self._rollup_reports
+
+    def page(self, start_date=None, end_date=None, employee_ids=None, is_late=None,
+             sort_by='Date', descending=False, offset=0, limit=PAGE_ROWS):
+        """Sort, filter and slice in SQL; only the page's rows are read."""
+        _check_sort_column(sort_by)
+        if not self.exists():
+            self.initialize()
+        where, params = self._where(start_date, end_date, employee_ids, is_late)
+        column = _SQL_COLUMNS[sort_by]
+        sql = "SELECT id, {} FROM attendance{} ORDER BY {} IS NULL, {} {}, id LIMIT ? OFFSET ?".format(
+            ", ".join(_SQL_COLUMNS[c] for c in COLUMNS), where,
+            column, column, "DESC" if descending else "ASC"
+        )
+        with self._connect() as conn:
+            total = conn.execute("SELECT COUNT(*) FROM attendance" + where, params).fetchone()[0]
+            df = pd.read_sql_query(sql, conn, params=params + [int(limit), int(offset)], index_col='id')
+        return self._from_sql(df), total
+
+    def _insert_frame(self, df, conn=None, keep_ids=False):
+        columns = [c for c in COLUMNS if c in df.columns]
+        sql_columns = [_SQL_COLUMNS[c] for c in columns]
+        rows = [
+            tuple(_to_sql_value(c, v) for c, v in zip(columns, values))
+            for values in df[columns].itertuples(index=False, name=None)
+        ]
+        if keep_ids:
+            # Records keep their ids; rows without a usable one get a new id
+            # above them, so they go in last
+            sql_columns = ['id'] + sql_columns
+            rows = sorted(
+                ((record_id,) + row for record_id, row in zip(_record_ids(df.index), rows)),
+                key=lambda row: row[0] is None
+            )
+        sql = "INSERT INTO attendance ({}) VALUES ({})".format(
+            ", ".join(sql_columns),
+            ", ".join("?" for _ in sql_columns)
+        )
+        if conn is not None:
+            conn.executemany(sql, rows)
+            return
+        with self._connect() as conn:
+            conn.executemany(sql, rows)
+        self._changed()
+
+    def _save(self, df):
+        if not self.exists():
+            self.initialize()
+        # One SQLite transaction; ids held elsewhere (queued punches, admin
+        # selections, the journal) stay valid.  The rollups are rebuilt in one
+        # pass rather than row by row through the triggers
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            _drop_rollup_triggers(conn)
+            conn.execute("DELETE FROM attendance")
+            if not df.empty:
+                self._insert_frame(df, conn, keep_ids=True)
+            _build_rollups(conn)
+        self._rollups_ready = True
+
+    def _insert_many(self, records):
+        if not self.exists():
+            self.initialize()
+        record_ids = []
+        # One transaction (and one fsync) for the whole batch
+        with self._connect() as conn:
+            for record in records:
+                columns = [c for c in COLUMNS if c in record]
+                sql = "INSERT INTO attendance ({}) VALUES ({})".format(
+                    ", ".join(_SQL_COLUMNS[c] for c in columns),
+                    ", ".join("?" for _ in columns)
+                )
+                cursor = conn.execute(sql, [_to_sql_value(c, record[c]) for c in columns])
+                record_ids.append(cursor.lastrowid)
+        self._changed()
+        return record_ids
+
+    def _update_many(self, updates):
+        with self._connect() as conn:
+            for record_id, fields in updates:
+                columns = list(fields)
+                sql = "UPDATE attendance SET {} WHERE id = ?".format(
+                    ", ".join(f"{_SQL_COLUMNS[c]} = ?" for c in columns)
+                )
+                cursor = conn.execute(sql, [_to_sql_value(c, fields[c]) for c in columns] + [int(record_id)])
+                if cursor.rowcount == 0:
+                    raise StorageError(f"Attendance record {record_id} does not exist")
+        self._changed()
+
+
+# Partition holding records without a usable date
+UNDATED_PARTITION = "undated"
+
+# Record ids of partitioned stores are YYYYMM followed by a six-digit row number
+PARTITION_ID_BASE = 10 ** 6
+
+
+# Function to get the YYYY-MM partition a date belongs to
+def partition_for_date(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return UNDATED_PARTITION
+    text = normalize_date(value)
+    if len(text) < 7 or not text[:4].isdigit() or not text[5:7].isdigit():
+        return UNDATED_PARTITION
+    return text[:7]
+
+
+# Function to get the partition a partitioned-store record id lives in
+def partition_for_id(record_id):
+    month = int(record_id) // PARTITION_ID_BASE
+    if month == 0:
+        return UNDATED_PARTITION
+    return f"{month // 100:04d}-{month % 100:02d}"
+
+
+class _PartitionedPunchIndex:
+    """Punch index built one month at a time, on the first lookup for it.
+
+    Punch pages only ever ask about today, so they only index the current
+    month's partition however long the history grows.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._months = {}
+
+    def _index(self, date):
+        month = partition_for_date(date)
+        version = self.store.partition_version(month)
+        entry = self._months.get(month)
+        if entry is None or entry[0] != version:
+            entry = (version, PunchIndex.build(self.store.load_partition(month)))
+            self._months[month] = entry
+        return entry[1]
+
+    def open_record(self, emp_id, date):
+        return self._index(date).open_record(emp_id, date)
+
+    def completed_record(self, emp_id, date):
+        return self._index(date).completed_record(emp_id, date)
+
+    def recorded_days(self, keys):
+        by_month = {}
+        for emp_id, date in keys:
+            by_month.setdefault(partition_for_date(date), []).append((emp_id, date))
+        recorded = set()
+        for month_keys in by_month.values():
+            recorded |= self._index(month_keys[0][1]).recorded_days(month_keys)
+        return recorded
+
+
+class _PartitionedRollups(RollupReports):
+    """Report rollups kept per month, rebuilt only for the months that changed.
+
+    Each month's ``Rollups`` is keyed on its partition's version, so a punch
+    today leaves every earlier month's totals as they are, in this process
+    and in any other one sharing the directory.
+    """
+
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+        self._months = {}
+
+    def _memo_token(self):
+        return self.store.version()
+
+    def _month(self, month):
+        version = self.store.partition_version(month)
+        entry = self._months.get(month)
+        if entry is None or entry[0] != version:
+            entry = (version, Rollups.build(self.store.load_partition(month)))
+            self._months[month] = entry
+        return entry[1]
+
+    def _spans(self, start_date, end_date):
+        # The range clipped to each stored month it touches
+        months, _, first, last = report_months(start_date, end_date)
+        stored = set(self.store.partitions())
+        for month in months:
+            if month in stored:
+                month_start, month_end = month_bounds(month)
+                yield self._month(month), max(first, month_start), min(last, month_end)
+
+    def _rows(self, start_date, end_date, employee_ids=None, is_late=None):
+        for rollups, first, last in self._spans(start_date, end_date):
+            yield from rollups._rows(first, last, employee_ids, is_late)
+
+    def _late_counts(self, start_date, end_date, employee_ids=None, is_late=None):
+        counts = {}
+        for rollups, first, last in self._spans(start_date, end_date):
+            counts.update(rollups._late_counts(first, last, employee_ids, is_late))
+        return counts
+
+
+class PartitionedStore(AttendanceStore):
+    """Backend that keeps one Parquet file per month under ``attendance/``.
+
+    Loads for a date range read only the months in that range, and a punch
+    rewrites only its own month, so the cost of today's views does not grow
+    with the history.  Each partition is cached separately.
+    """
+
+    name = "partitioned"
+    extension = ".parquet"
+    arrow_format = "parquet"
+
+    def __init__(self, path=PARTITION_DIR, legacy_excel=EXCEL_FILE):
+        self.path = path
+        self.legacy_excel = legacy_excel
+        self._partition_writes = {}
+        self._month_index = _PartitionedPunchIndex(self)
+        self._month_rollups = _PartitionedRollups(self)
+
+    def _partition_path(self, partition):
+        return os.path.join(self.path, partition + self.extension)
+
+    def partitions(self):
+        """Return the stored partition names, oldest month first."""
+        if not self.exists():
+            return []
+        names = []
+        for entry in os.listdir(self.path):
+            name, ext = os.path.splitext(entry)
+            # Skips temporary files left by atomic writes
+            if ext == self.extension and (name == UNDATED_PARTITION or partition_for_date(name + "-01") == name):
+                names.append(name)
+        return sorted(names)
+
+    def _partitions_between(self, start_date=None, end_date=None):
+        if start_date is None and end_date is None:
+            return self.partitions()
+        first = partition_for_date(start_date) if start_date is not None else None
+        last = partition_for_date(end_date) if end_date is not None else None
+        return [
+            p for p in self.partitions()
+            if p != UNDATED_PARTITION and (first is None or p >= first) and (last is None or p <= last)
+        ]
+
+    def partition_version(self, partition):
+        return (self._partition_writes.get(partition, 0), _file_signature(self._partition_path(partition)))
+
+    def version(self):
+        return (self._writes,) + tuple((p, self.partition_version(p)) for p in self.partitions())
+
+    def _changed(self, partitions=None):
+        self._writes += 1
+        for partition in partitions or []:
+            self._partition_writes[partition] = self._partition_writes.get(partition, 0) + 1
+        if partitions is None:
+            frame_cache.invalidate(self)
+
+    def exists(self):
+        return os.path.isdir(self.path)
+
+    def initialize(self):
+        is_new = not self.exists()
+        os.makedirs(self.path, exist_ok=True)
+
+        # Import the old workbook once so existing history is kept
+        if is_new and self.legacy_excel and os.path.exists(self.legacy_excel):
+            legacy_df = read_legacy_excel(self.legacy_excel)
+            if not legacy_df.empty:
+                with self.write_lock():
+                    self._save(legacy_df)
+                    self._changed()
+
+        return self.load()
+
+    def write_lock(self):
+        return file_lock(self.path)
+
+    def _read_file(self, path):
+        return pd.read_parquet(path)
+
+    def _write_file(self, df, path):
+        df.to_parquet(path, index=True)
+
+    def _read_partition(self, partition):
+        path = self._partition_path(partition)
+        if not os.path.exists(path):
+            return empty_frame()
+        try:
+            df = self._read_file(path)
+        except ImportError as e:
+            raise StorageError(f"The {self.name} backend needs pyarrow (pip install pyarrow)") from e
+        if RECORD_ID in df.columns:
+            df = df.set_index(RECORD_ID)
+        return normalize(df)
+
+    def _write_partition(self, partition, df):
+        path = self._partition_path(partition)
+        if df.empty:
+            if os.path.exists(path):
+                os.remove(path)
+        else:
+            df = df.copy()
+            df.attrs = {}
+            with atomic_write(path) as tmp_path:
+                self._write_file(df, tmp_path)
+        self._changed([partition])
+        frame_cache.put(self, partition, self.partition_version(partition), df)
+
+    def load_partition(self, partition):
+        """Return the records of one partition."""
+        return frame_cache.get(self, partition)
+
+    def load(self, start_date=None, end_date=None):
+        if not self.exists():
+            self.initialize()
+        # Taken before reading so a concurrent write makes a later save conflict
+        version = self.version()
+        frames = [self.load_partition(p) for p in self._partitions_between(start_date, end_date)]
+        df = concat_frames(frames) if frames else empty_frame()
+        df = filter_dates(df, start_date, end_date)
+        df.attrs[VERSION_ATTR] = version
+        return df
+
+    def _read(self):
+        return self.load()
+
+    def _dataset(self, paths):
+        try:
+            import pyarrow as pa
+            import pyarrow.dataset as ds
+            from pyarrow import fs
+        except ImportError as e:
+            raise StorageError(f"The {self.name} backend needs pyarrow (pip install pyarrow)") from e
+        paths = [os.path.abspath(p) for p in paths]
+        # Memory-map the files rather than copying them into memory
+        filesystem = fs.LocalFileSystem(use_mmap=True)
+        schema = ds.dataset(paths[:1], format=self.arrow_format, filesystem=filesystem).schema
+        # Each file picks its own dictionary index width; widen them so the
+        # months can be scanned together
+        schema = pa.schema(
+            [
+                pa.field(f.name, pa.dictionary(pa.int32(), f.type.value_type))
+                if pa.types.is_dictionary(f.type) else f
+                for f in schema
+            ],
+            metadata=schema.metadata
+        )
+        return ds.dataset(paths, format=self.arrow_format, filesystem=filesystem, schema=schema)
+
+    def _scan(self, start_date=None, end_date=None, employee_ids=None, columns=None, is_late=None):
+        # Returns the dataset, projected columns and filter for a pushed-down read
+        if not self.exists():
+            self.initialize()
+        paths = [
+            self._partition_path(p) for p in self._partitions_between(start_date, end_date)
+            if os.path.exists(self._partition_path(p))
+        ]
+        if not paths:
+            return None, None, None
+
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        dataset = self._dataset(paths)
+        date_type = dataset.schema.field('Date').type
+        filters = []
+        if start_date is not None:
+            filters.append(ds.field('Date') >= pa.scalar(pd.Timestamp(normalize_date(start_date)), type=date_type))
+        if end_date is not None:
+            filters.append(ds.field('Date') <= pa.scalar(pd.Timestamp(normalize_date(end_date)), type=date_type))
+        if employee_ids:
+            filters.append(ds.field('Employee ID').isin([normalize_employee_id(e) for e in employee_ids]))
+        if is_late is not None:
+            filters.append(ds.field('Is Late') == bool(is_late))
+        predicate = None
+        for expression in filters:
+            predicate = expression if predicate is None else predicate & expression
+
+        read_columns = None
+        if columns is not None:
+            read_columns = [RECORD_ID] + [c for c in columns if c != RECORD_ID]
+        return dataset, read_columns, predicate
+
+    @staticmethod
+    def _from_arrow(data, columns=None):
+        df = data.to_pandas()
+        if RECORD_ID in df.columns:
+            df = df.set_index(RECORD_ID)
+        df = normalize(df)
+        if columns is not None:
+            df = df[list(columns)]
+        return df
+
+    def query(self, start_date=None, end_date=None, employee_ids=None, columns=None):
+        """Read matching records straight from the partition files.
+
+        Only the months in the date range are opened, only ``columns`` are
+        read, and the date and employee filters are pushed down to the Arrow
+        scanner instead of being applied to a loaded frame.
+        """
+        dataset, read_columns, predicate = self._scan(start_date, end_date, employee_ids, columns)
+        if dataset is None:
+            df = empty_frame()
+            if columns is not None:
+                df = df[list(columns)]
+        else:
+            df = self._from_arrow(dataset.to_table(columns=read_columns, filter=predicate), columns)
+        df.attrs[DATE_RANGE_ATTR] = (start_date, end_date)
+        return df
+
+    def iter_chunks(self, start_date=None, end_date=None, employee_ids=None, chunk_size=EXPORT_CHUNK_ROWS):
+        dataset, _, predicate = self._scan(start_date, end_date, employee_ids)
+        if dataset is None:
+            return
+        # A single thread keeps the batches in file (and so date) order
+        for batch in dataset.to_batches(filter=predicate, batch_size=chunk_size, use_threads=False):
+            if batch.num_rows:
+                yield self._from_arrow(batch)
+
+    def count(self, start_date=None, end_date=None, employee_ids=None, is_late=None):
+        dataset, _, predicate = self._scan(start_date, end_date, employee_ids, is_late=is_late)
+        if dataset is None:
+            return 0
+        return dataset.count_rows(filter=predicate)
+
+    def page(self, start_date=None, end_date=None, employee_ids=None, is_late=None,
+             sort_by='Date', descending=False, offset=0, limit=PAGE_ROWS):
+        """Sort the matching record ids on the sort column, then read only the page's rows."""
+        _check_sort_column(sort_by)
+        dataset, _, predicate = self._scan(start_date, end_date, employee_ids, is_late=is_late)
+        if dataset is None:
+            return empty_frame(), 0
+
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+
+        keys = dataset.to_table(columns=[RECORD_ID, sort_by], filter=predicate)
+        values = keys[sort_by]
+        if pa.types.is_dictionary(values.type):
+            values = values.cast(values.type.value_type)
+        order = pc.sort_indices(
+            pa.table({'missing': pc.is_null(values), 'value': values, 'id': keys[RECORD_ID]}),
+            sort_keys=[('missing', 'ascending'), ('value', 'descending' if descending else 'ascending'),
+                       ('id', 'ascending')]
+        )
+        page_ids = keys[RECORD_ID].take(order[offset:offset + limit]).to_pylist()
+        if not page_ids:
+            return empty_frame(), keys.num_rows
+
+        # The ids name their months, so only those files are opened
+        paths = sorted({self._partition_path(partition_for_id(i)) for i in page_ids})
+        rows = self._dataset(paths).to_table(filter=ds.field(RECORD_ID).isin(page_ids))
+        return self._from_arrow(rows).loc[page_ids], keys.num_rows
+
+    def date_bounds(self):
+        dated = [p for p in self.partitions() if p != UNDATED_PARTITION]
+        if not dated:
+            return None, None
+        first = self.load_partition(dated[0])['Date'].dropna()
+        last = self.load_partition(dated[-1])['Date'].dropna()
+        return first.min(), last.max()
+
+    def punch_index(self):
+        return self._month_index
+
+    def rollups(self):
+        if not self.exists():
+            self.initialize()
+        return self._month_rollups
+
+    def get(self, record_id, date=None):
+        # Record ids encode their month, so only that partition is read
+        df = self.load_partition(partition_for_id(record_id))
+        if record_id not in df.index:
+            return None
+        return display_record(df, record_id)
+
+    def _index_is_current(self):
+        # The month indexes check their own partition versions
+        return False
+
+    @staticmethod
+    def _next_id(partition, df):
+        if not df.empty:
+            return int(df.index.max()) + 1
+        if partition == UNDATED_PARTITION:
+            return 0
+        return int(partition.replace("-", "")) * PARTITION_ID_BASE
+
+    def _split(self, df):
+        # Group a frame by month, giving records new ids where theirs don't match
+        months = df['Date'].dt.strftime('%Y-%m').fillna(UNDATED_PARTITION)
+        parts = {}
+        for partition, part in df.groupby(months.to_numpy(), sort=True):
+            ids = pd.Series(part.index, index=part.index)
+            keep = ids.map(lambda i: partition_for_id(i) == partition) & ~ids.duplicated()
+            next_id = max(self._next_id(partition, part[keep.to_numpy()]), self._next_id(partition, empty_frame()))
+            new_ids = part.index.to_numpy().copy()
+            moved = ~keep.to_numpy()
+            new_ids[moved] = range(next_id, next_id + int(moved.sum()))
+            part = part.set_axis(pd.Index(new_ids, name=RECORD_ID))
+            parts[partition] = part
+        return parts
+
+    def _save(self, df):
+        os.makedirs(self.path, exist_ok=True)
+        parts = self._split(normalize(df)) if not df.empty else {}
+        for partition in self.partitions():
+            if partition not in parts:
+                self._write_partition(partition, empty_frame())
+        for partition, part in parts.items():
+            self._write_partition(partition, part)
+
+    def _insert_many(self, records):
+        if not self.exists():
+            self.initialize()
+        by_partition = {}
+        for position, record in enumerate(records):
+            by_partition.setdefault(partition_for_date(record.get('Date')), []).append(position)
+
+        record_ids = [None] * len(records)
+        with self.write_lock():
+            for partition, positions in by_partition.items():
+                df = self.load_partition(partition)
+                start = self._next_id(partition, df)
+                ids = list(range(start, start + len(positions)))
+                inserted = normalize(pd.DataFrame(
+                    [records[p] for p in positions], index=pd.Index(ids, name=RECORD_ID)
+                ))
+                self._write_partition(partition, concat_frames([df, inserted]))
+                for position, record_id in zip(positions, ids):
+                    record_ids[position] = record_id
+        return record_ids
+
+    def _update_many(self, updates):
+        by_partition = {}
+        for record_id, fields in updates:
+            by_partition.setdefault(partition_for_id(record_id), []).append((int(record_id), fields))
+
+        with self.write_lock():
+            for partition, items in by_partition.items():
+                df = self.load_partition(partition)
+                for record_id, fields in items:
+                    if record_id not in df.index:
+                        raise StorageError(f"Attendance record {record_id} does not exist")
+                    if 'Date' in fields and partition_for_date(fields['Date']) != partition:
+                        raise StorageError("Moving a record to another month needs a full save")
+                    assign_fields(df, record_id, fields)
+                self._write_partition(partition, df)
+
+
+class ArrowStore(PartitionedStore):
+    """Partitioned backend writing Arrow IPC (Feather v2) files.
+
+    Partitions are memory-mapped when read, so loading a month costs little
+    more than the columns actually touched.
+    """
+
+    name = "arrow"
+    extension = ".arrow"
+    arrow_format = "ipc"
+
+    def __init__(self, path=ARROW_DIR, legacy_excel=EXCEL_FILE):
+        super().__init__(path, legacy_excel)
+
+    def _read_file(self, path):
+        from pyarrow import feather
+        return feather.read_table(path, memory_map=True).to_pandas()
+
+    def _write_file(self, df, path):
+        # Feather keeps no index, so the record id is stored as a column
+        df.reset_index().to_feather(path)
+
+
+BACKENDS = {
+    ExcelStore.name: ExcelStore,
+    SQLiteStore.name: SQLiteStore,
+    PartitionedStore.name: PartitionedStore,
+    ArrowStore.name: ArrowStore,
+}
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+# Function to get the configured attendance store (one instance per process)
+def get_store(backend=None):
+    backend = backend or os.environ.get("AMS_STORAGE_BACKEND", SQLiteStore.name)
+    if backend not in BACKENDS:
+        raise StorageError(f"Unknown storage backend: {backend}")
+    with _stores_lock:
+        if backend not in _stores:
+            store = BACKENDS[backend]()
+            # Imported here because these modules build on this one
+            from attendance_journal import JournaledStore, journal_enabled
+            from attendance_queue import QueuedStore, write_behind_enabled
+            if journal_enabled():
+                store = JournaledStore(store).start()
+            if write_behind_enabled():
+                store = QueuedStore(store).start()
+            _stores[backend] = store
+        return _stores[backend]
+
+
+# Function to list a store and the stores it wraps, outermost first
+def store_layers(store):
+    while store is not None:
+        yield store
+        store = getattr(store, 'store', None)
+
+
+# Function to flush queued punches and stop the background threads of the
+# stores this process opened; for servers that exit without running atexit
+def close_stores():
+    with _stores_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        # Outermost first, so queued punches are flushed through the journal
+        for layer in store_layers(store):
+            if hasattr(layer, 'stop'):
+                layer.stop()
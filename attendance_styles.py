@@ -0,0 +1,104 @@
+"""Row colours for the attendance grids.
+
+Every grid colours a record the same way: completed punches light blue,
+late punch ins light red and the rest light green.  ``row_styles`` picks
+each row's CSS with one vectorised ``np.select`` on ``Status`` and
+``Is Late`` and ``style_records`` broadcasts it across the row, instead of
+a Python callback building the same string for every cell.
+
+Styled frames are cached by the caller's key and the store version they
+were read at, so reruns showing unchanged data skip the styling entirely.
+The cache holds the display frame and its CSS rather than the ``Styler``:
+Streamlit recomputes a ``Styler`` while rendering it, so each session gets
+its own, which only has to hand back the cached CSS.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from attendance_metrics import timed
+from attendance_schema import to_display
+
+COMPLETED_STYLE = 'background-color: #E0F7FA; color: black'  # Light blue for completed
+LATE_STYLE = 'background-color: #FFCCCC; color: black'  # Light red for late
+ON_TIME_STYLE = 'background-color: #CCFFCC; color: #000080'  # Light green for on-time
+
+# Styled frames kept across reruns and sessions
+STYLE_CACHE_ENTRIES = 64
+
+
+# Function to pick the CSS for every row at once
+def row_styles(df):
+    completed = (df['Status'] == 'Completed').to_numpy(dtype=bool, na_value=False)
+    late = (df['Is Late'] == True).to_numpy(dtype=bool, na_value=False)
+    return np.select([completed, late], [COMPLETED_STYLE, LATE_STYLE], default=ON_TIME_STYLE)
+
+
+# Function to build the display frame and the matching frame of cell CSS
+@timed("styles.build")
+def _styled_frames(df):
+    display = to_display(df)
+    css = row_styles(df)
+    styles = pd.DataFrame(
+        np.repeat(css[:, np.newaxis], display.shape[1], axis=1),
+        index=display.index,
+        columns=display.columns
+    )
+    return display, styles
+
+
+class StyleCache:
+    """Least recently used cache of styled frames, checked against the store version."""
+
+    def __init__(self, max_entries=STYLE_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version, build):
+        """Return the frames cached for ``key`` at ``version``, calling ``build`` on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        frames = build()
+        with self._lock:
+            self._entries[key] = (version, frames)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return frames
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': len(self._entries)
+        }
+
+
+style_cache = StyleCache()
+
+
+# Function to colour attendance records for display; with a key and the store
+# version the records were read at, the styling is reused until the data changes
+def style_records(df, key=None, version=None):
+    if key is None or version is None:
+        display, styles = _styled_frames(df)
+    else:
+        display, styles = style_cache.get(key, version, lambda: _styled_frames(df))
+    return display.style.apply(lambda _: styles, axis=None)
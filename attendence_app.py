@@ -2,10 +2,33 @@ import streamlit as st
 import pandas as pd
 import os
 import time
-import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
-from openpyxl import load_workbook
-from openpyxl.styles import PatternFill
+from attendance_charts import chart_cache_stats, punctuality_chart
+from attendance_employees import EMPLOYEE_COLUMNS, employee_registry
+from attendance_import import import_employees, import_punches
+from attendance_metrics import export_configured, metrics, timed
+from attendance_profiling import ALL_STEPS, profiled, profiler
+from attendance_queue import DEAD_LETTER_FILE
+from attendance_export import EXPORT_FORMATS, export_to_tempfile
+from attendance_rules import is_late_time, recompute
+from attendance_schema import COLUMNS, format_time, normalize_date
+from attendance_service import (
+    COMPLETED,
+    NOT_PUNCHED_IN,
+    PUNCHED_IN,
+    AlreadyCompletedError,
+    PunchError,
+    punch_service,
+)
+from attendance_storage import (
+    EXCEL_FILE,
+    empty_frame,
+    format_excel_workbook,
+    frame_cache,
+    get_store,
+    store_layers,
+)
+from attendance_styles import style_cache, style_records
 
 # Set page title and configuration
 st.set_page_config(
@@ -33,238 +56,134 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# Define file path for Excel file
-EXCEL_FILE = "attendence_data.xlsx"
-
-# Initialize the Excel file if it doesn't exist
+# Attendance records live behind a pluggable store (see attendance_storage.py);
+# the Excel workbook is kept as an export for HR
+# Initialize the attendance store if it doesn't exist
 def initialize_excel():
     try:
-        # Create a new DataFrame with the required columns
-        df = pd.DataFrame(columns=[
-            'Employee ID', 
-            'Employee Name', 
-            'Date', 
-            'Punch In Time', 
-            'Punch Out Time', 
-            'Work Hours',
-            'Status',
-            'Is Late'  # Field to track lateness
-        ])
-        
-        # Make sure the file doesn't exist before creating a new one
-        if os.path.exists(EXCEL_FILE):
-            try:
-                # Try to load existing data first
-                existing_df = pd.read_excel(EXCEL_FILE)
-                
-                # Check if we need to update the schema from old format to new format
-                if 'Break 1 Start' in existing_df.columns:
-                    # We're migrating from the old format with breaks to the new format
-                    # Create a new dataframe with the new schema
-                    new_df = pd.DataFrame(columns=[
-                        'Employee ID', 
-                        'Employee Name', 
-                        'Date', 
-                        'Punch In Time', 
-                        'Punch Out Time', 
-                        'Work Hours',
-                        'Status',
-                        'Is Late'
-                    ])
-                    
-                    # Copy over the existing data that matches the new schema
-                    for col in new_df.columns:
-                        if col in existing_df.columns:
-                            new_df[col] = existing_df[col]
-                    
-                    # Calculate Is Late for existing records
-                    if 'Punch In Time' in existing_df.columns:
-                        def check_if_late(row):
-                            if pd.notna(row['Punch In Time']):
-                                try:
-                                    punch_in_time = datetime.strptime(row['Punch In Time'], '%H:%M:%S').time()
-                                    cutoff_time = datetime.strptime("10:15:00", '%H:%M:%S').time()
-                                    return punch_in_time > cutoff_time
-                                except:
-                                    return False
-                            return False
-                        
-                        new_df['Is Late'] = existing_df.apply(check_if_late, axis=1)
-                    
-                    # Save the updated schema
-                    df = new_df
-                else:
-                    # Use existing data if it has the correct schema
-                    df = existing_df
-            except Exception as e:
-                # If there's an error reading the file, it might be corrupted
-                # Delete it and create a new one
-                st.warning(f"Recreating Excel file due to error: {e}")
-                os.remove(EXCEL_FILE)
-        
-        # Save the DataFrame to Excel
-        df.to_excel(EXCEL_FILE, index=False)
-        
-        # Verify file was created
-        if not os.path.exists(EXCEL_FILE):
-            st.error("Failed to create Excel file")
-        
-        return df
+        return get_store().initialize()
     except Exception as e:
-        st.error(f"Error initializing Excel file: {e}")
+        st.error(f"Error initializing attendance store: {e}")
         # Create a minimal dataframe to return
-        return pd.DataFrame(columns=[
-            'Employee ID', 
-            'Employee Name', 
-            'Date', 
-            'Punch In Time', 
-            'Punch Out Time', 
-            'Work Hours',
-            'Status',
-            'Is Late'
-        ])
+        return empty_frame()
 
-# Function to load employee data
-def load_data():
+# Function to load attendance data, optionally only the records between two dates
+@timed("load_data")
+def load_data(start_date=None, end_date=None):
     try:
-        if os.path.exists(EXCEL_FILE):
-            df = pd.read_excel(EXCEL_FILE)
-            return df
-        else:
-            return initialize_excel()
+        store = get_store()
+        if not store.exists():
+            initialize_excel()
+        return store.load(start_date, end_date)
     except Exception as e:
         st.error(f"Error loading data: {e}")
         return initialize_excel()
 
-# Function to save data
+# Function to save data (replaces every record, used for bulk changes)
+@timed("save_data")
 def save_data(df):
     try:
         # Make sure the dataframe is not empty
         if df is None or df.empty:
-            df = pd.DataFrame(columns=[
-                'Employee ID', 
-                'Employee Name', 
-                'Date', 
-                'Punch In Time', 
-                'Punch Out Time', 
-                'Work Hours',
-                'Status',
-                'Is Late'
-            ])
+            df = empty_frame()
         
-        # Save to Excel
-        df.to_excel(EXCEL_FILE, index=False)
-        
-        # Verify file was created and has content
-        if os.path.exists(EXCEL_FILE) and os.path.getsize(EXCEL_FILE) > 0:
-            return True
-        else:
-            st.error("Excel file was not created or is empty")
-            return False
+        get_store().save(df)
+        return True
     except Exception as e:
         st.error(f"Error saving data: {e}")
         return False
 
-# Function to check if employee has already punched in today
-def check_existing_punch_in(emp_id, today, emp_name=None):
-    df = load_data()
-    
-    # Convert employee ID to string to ensure comparison works correctly
-    emp_id = str(emp_id).strip()
-    
-    # Filter data for today and this employee ID
-    today_records = df[df['Date'] == today]
-    
-    # Convert all Employee ID values to strings for consistent comparison
-    today_records = today_records[today_records['Employee ID'].astype(str).str.strip() == emp_id]
+# Page sizes offered by the records grids
+PAGE_SIZES = [25, 50, 100, 250]
+
+# Function to show one page of attendance records; filtering, sorting and paging
+# happen in the store, so only the visible rows are read and styled
+def show_records_grid(key, start_date=None, end_date=None, employee_ids=None, is_late=None):
+    page_key = f"{key}_page"
     
-    # If name is provided, further filter by name
-    if emp_name is not None and len(today_records) > 0:
-        # Try exact match first
-        name_match = today_records[today_records['Employee Name'].str.lower() == emp_name.lower()]
-        
-        # If no exact match, return all records for this employee ID
-        if len(name_match) > 0:
-            today_records = name_match
-    
-    # Log information (only visible in development)
-    if not today_records.empty:
-        # Check if there's any record without punch out time
-        incomplete_records = today_records[today_records['Punch Out Time'].isna()]
-        if not incomplete_records.empty:
-            return True, incomplete_records.index[0]
-    else:
-        # No records found for this employee on this date
-        pass
+    # A new sort order or page size starts again from the first page
+    def first_page():
+        st.session_state[page_key] = 1
     
-    return False, None
-
-# Function to calculate hours worked
-def calculate_hours(punch_in, punch_out):
-    if pd.isna(punch_out) or pd.isna(punch_in):
-        return None
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        sort_by = st.selectbox("Sort by", options=COLUMNS, index=COLUMNS.index('Date'),
+                               key=f"{key}_sort_by", on_change=first_page)
+    with col2:
+        order = st.radio("Order", options=["Descending", "Ascending"], horizontal=True,
+                         key=f"{key}_order", on_change=first_page)
+    with col3:
+        page_size = st.selectbox("Rows per page", options=PAGE_SIZES, index=1,
+                                 key=f"{key}_page_size", on_change=first_page)
     
-    # Convert to datetime objects if they are strings
-    def convert_to_time(time_value):
-        if pd.isna(time_value):
-            return None
-        if isinstance(time_value, str):
-            return datetime.strptime(time_value, '%H:%M:%S').time()
-        return time_value
+    page_number = st.session_state.get(page_key, 1)
     
-    punch_in = convert_to_time(punch_in)
-    punch_out = convert_to_time(punch_out)
+    def fetch(number):
+        with timed("storage.page"):
+            return get_store().page(start_date, end_date, employee_ids, is_late,
+                                    sort_by=sort_by, descending=order == "Descending",
+                                    offset=(number - 1) * page_size, limit=page_size)
     
-    # Calculate the total work time
-    in_dt = datetime.combine(datetime.today().date(), punch_in)
-    out_dt = datetime.combine(datetime.today().date(), punch_out)
+    try:
+        # Read before the page so the styling is never cached under a newer version
+        version = get_store().version()
+        page_df, total = fetch(page_number)
+        pages = max(1, -(-total // page_size))
+        if page_number > pages:
+            # Fewer pages since the filters changed: show the last one
+            page_number = pages
+            st.session_state[page_key] = page_number
+            page_df, total = fetch(page_number)
+    except Exception as e:
+        st.error(f"Error loading data: {e}")
+        return empty_frame(), 0
     
-    # If punch out is before punch in, assume it's the next day
-    if out_dt < in_dt:
-        out_dt = datetime.combine(datetime.today().date() + pd.Timedelta(days=1), punch_out)
+    if total == 0:
+        st.info("No records found for the selected criteria.")
+        return page_df, total
     
-    total_time = out_dt - in_dt
-    work_hours = total_time.total_seconds() / 3600
+    # Colours are reused on reruns until the data or the page changes
+    view = (key, start_date, end_date, tuple(employee_ids or ()), is_late, sort_by, order, page_number, page_size)
+    with timed("render.records_grid"):
+        st.dataframe(
+            style_records(page_df, key=view, version=version),
+            use_container_width=True
+        )
     
-    return round(work_hours, 2)
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        st.number_input("Page", min_value=1, max_value=pages, step=1, key=page_key)
+    with col2:
+        first_row = (page_number - 1) * page_size + 1
+        st.caption(f"Page {page_number} of {pages} · rows {first_row}–{first_row + len(page_df) - 1} of {total}")
+    return page_df, total
+
+# Seconds between checks for new punches while auto-refresh is on
+REFRESH_SECONDS = 5
+
+# Function to run part of a page as a fragment that reruns on its own every
+# few seconds while auto-refresh is on, without rerunning the rest of the page
+def run_live(render, interval=None):
+    if st.session_state.get("auto_refresh", True):
+        interval = interval or st.session_state.get("refresh_interval", REFRESH_SECONDS)
+        st.fragment(run_every=interval)(render)()
+    else:
+        render()
 
-# Function to apply colors to Excel cells based on lateness
+# Function to apply colors to every row of the exported Excel workbook
+@timed("apply_excel_formatting")
 def apply_excel_formatting():
     try:
         if os.path.exists(EXCEL_FILE):
-            # Load the workbook
-            wb = load_workbook(EXCEL_FILE)
-            sheet = wb.active
-            
-            # Get late column index (column H, index 7)
-            late_col_idx = 7
-            
-            # Start from row 2 (skip headers)
-            for row_idx in range(2, sheet.max_row + 1):
-                is_late_cell = sheet.cell(row=row_idx, column=late_col_idx + 1)
-                
-                # Check if the Is Late field is True
-                if is_late_cell.value == True:
-                    # Apply red background to the entire row
-                    for col_idx in range(1, sheet.max_column + 1):
-                        sheet.cell(row=row_idx, column=col_idx).fill = PatternFill(
-                            start_color="FFCCCC", end_color="FFCCCC", fill_type="solid"
-                        )
-                elif is_late_cell.value == False:
-                    # Apply green background to the entire row
-                    for col_idx in range(1, sheet.max_column + 1):
-                        sheet.cell(row=row_idx, column=col_idx).fill = PatternFill(
-                            start_color="CCFFCC", end_color="CCFFCC", fill_type="solid"
-                        )
-            
-            # Save the workbook
-            wb.save(EXCEL_FILE)
+            format_excel_workbook(EXCEL_FILE)
             return True
     except Exception as e:
         st.error(f"Error applying Excel formatting: {e}")
     return False
 
 # Main application
+@timed("main")
+@profiled("main")
 def main():
     # Display company logo at the top
     col1, col2 = st.columns([1, 3])
@@ -277,33 +196,22 @@ def main():
     col2.title("Vistotech Global Services")
     col2.markdown("**Attendance Management System**")
     
-    # Initialize Excel file if it doesn't exist
-    if not os.path.exists(EXCEL_FILE):
+    # Initialize the attendance store if it doesn't exist
+    if not get_store().exists():
         initialize_excel()
     
-    # Auto-refresh feature for real-time updates
-    auto_refresh = st.sidebar.checkbox("Enable Auto-Refresh", value=True)
-    refresh_interval = st.sidebar.slider("Refresh Interval (seconds)", 
-                                       min_value=10, 
+    # Auto-refresh feature for real-time updates: the dashboard checks the
+    # store version on a timer and redraws only itself, and only re-reads
+    # the records once a punch has changed them
+    auto_refresh = st.sidebar.checkbox("Enable Auto-Refresh", value=True, key="auto_refresh")
+    refresh_interval = st.sidebar.slider("Check for new punches every (seconds)", 
+                                       min_value=2, 
                                        max_value=300, 
-                                       value=60)
+                                       value=REFRESH_SECONDS,
+                                       key="refresh_interval")
     
     if auto_refresh:
-        # Add auto-refresh functionality using HTML/JavaScript
-        st.markdown(
-            f"""
-            <script>
-                setTimeout(function() {{
-                    window.location.reload();
-                }}, {refresh_interval * 1000});
-            </script>
-            """,
-            unsafe_allow_html=True
-        )
-        st.sidebar.info(f"Page will auto-refresh every {refresh_interval} seconds")
-        
-        # Show current timestamp
-        st.sidebar.write(f"Last refresh: {datetime.now().strftime('%H:%M:%S')}")
+        st.sidebar.info(f"The dashboard updates within {refresh_interval} seconds of a punch")
     
     # Sidebar for navigation with separate punch in/out options
     st.sidebar.header("Vistotech Navigation")
@@ -331,13 +239,16 @@ def show_clock_and_date():
     today = datetime.now().strftime('%Y-%m-%d')
     current_time = datetime.now().strftime('%H:%M:%S')
     
-    # First display: System time in Python
-    st.markdown(f"""
-        <h3 style="margin: 0; color: #0066cc;"> System Time :- {datetime.now().strftime('%H:%M')} </h3>
-        <div style="font-size: 1.3rem; font-weight: bold;"></div>
-        <div style="font-size: 1.3rem; font-weight: bold; margin-top: 5px;">{datetime.now().strftime('%A , %Y-%m-%d')}</div>
-    </div>
-    """, unsafe_allow_html=True)
+    # First display: System time in Python, kept current by its own fragment
+    def system_time():
+        st.markdown(f"""
+            <h3 style="margin: 0; color: #0066cc;"> System Time :- {datetime.now().strftime('%H:%M')} </h3>
+            <div style="font-size: 1.3rem; font-weight: bold;"></div>
+            <div style="font-size: 1.3rem; font-weight: bold; margin-top: 5px;">{datetime.now().strftime('%A , %Y-%m-%d')}</div>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    run_live(system_time, interval=30)
     
     # Second display: Live JavaScript clock that updates in real-time
     st.markdown("""
@@ -381,149 +292,177 @@ def show_clock_and_date():
     # Note: We pass the current time from the server for operations that need it
     return today, current_time
 
+# Function to get today's dashboard figures, re-reading the records only when
+# the store version has changed since this session last looked
+def dashboard_view(today):
+    # Read before the records so a punch landing in between is picked up next time
+    version = get_store().version()
+    view = st.session_state.get("dashboard_view")
+    if view is not None and view['date'] == today and view['version'] == version:
+        return view
+    
+    # Get fresh data, reading only today's partition
+    today_data = load_data(today, today).sort_values('Employee ID')
+    on_time_count = len(today_data[today_data['Is Late'] == False])
+    late_count = len(today_data[today_data['Is Late'] == True])
+    view = {
+        'date': today,
+        'version': version,
+        'data': today_data,
+        'employees': len(today_data['Employee ID'].unique()),
+        'in_progress': len(today_data[today_data['Status'] == 'In Progress']),
+        'completed': len(today_data[today_data['Status'] == 'Completed']),
+        'on_time': on_time_count,
+        'late': late_count,
+        'chart': punctuality_chart(on_time_count, late_count) if on_time_count or late_count else None,
+        'updated': datetime.now().strftime('%H:%M:%S')
+    }
+    st.session_state["dashboard_view"] = view
+    return view
+
 # Helper function to display today's attendance dashboard
 def show_attendance_dashboard():
-    today = datetime.now().strftime('%Y-%m-%d')
-    
     # Create a section with real-time attendance data
     st.subheader("Today's Attendance Dashboard (Real-Time)")
     
-    # Create containers for auto-updating content
-    attendance_container = st.container()
-    
-    with attendance_container:
-        # Get fresh data every time
-        df_latest = load_data()
-        today_data = df_latest[df_latest['Date'] == today]
+    # Only this section reruns when checking for new punches
+    run_live(render_attendance_dashboard)
+
+# Function to draw today's attendance figures from the latest dashboard view
+@timed("render_attendance_dashboard")
+@profiled("render_attendance_dashboard")
+def render_attendance_dashboard():
+    today = datetime.now().strftime('%Y-%m-%d')
+    view = dashboard_view(today)
+    today_data = view['data']
+    
+    if not today_data.empty:
+        # Display attendance statistics
+        stat_col1, stat_col2, stat_col3, stat_col4 = st.columns(4)
+        with stat_col1:
+            st.metric("Total Employees", view['employees'])
+        with stat_col2:
+            st.metric("Currently Punched In", view['in_progress'])
+        with stat_col3:
+            st.metric("Completed Today", view['completed'])
+        with stat_col4:
+            st.metric("Late Arrivals", view['late'])
         
-        if not today_data.empty:
-            # Sort by Employee ID
-            today_data = today_data.sort_values('Employee ID')
-            
-            # Display attendance statistics
-            stat_col1, stat_col2, stat_col3, stat_col4 = st.columns(4)
-            with stat_col1:
-                st.metric("Total Employees", len(today_data['Employee ID'].unique()))
-            with stat_col2:
-                st.metric("Currently Punched In", len(today_data[today_data['Status'] == 'In Progress']))
-            with stat_col3:
-                st.metric("Completed Today", len(today_data[today_data['Status'] == 'Completed']))
-            with stat_col4:
-                if 'Is Late' in today_data.columns:
-                    st.metric("Late Arrivals", len(today_data[today_data['Is Late'] == True]))
-                else:
-                    st.metric("Late Arrivals", "N/A")
-            
-            # Make it visually appealing with styled dataframe - red for late, green for on-time
-            def style_dataframe(row):
-                styles = []
-                for _ in row:
-                    if row['Status'] == 'Completed':
-                        styles.append('background-color: #E0F7FA; color: black')  # Light blue for completed
-                    elif 'Is Late' in row and row['Is Late']:
-                        styles.append('background-color: #FFCCCC; color: black')  # Light red for late
-                    else:
-                        styles.append('background-color: #CCFFCC; color: black')  # Light green for on-time
-                return styles
-            
+        # Make it visually appealing with styled dataframe - red for late, green for on-time;
+        # the colours are reused until today's records change
+        with timed("render.dashboard_grid"):
             st.dataframe(
-                today_data.style.apply(style_dataframe, axis=1),
+                style_records(today_data, key=('dashboard', today), version=view['version']),
                 use_container_width=True
             )
+        
+        # Show lateness statistics
+        if view['chart'] is not None:
+            st.subheader("Attendance Statistics")
             
-            # Show lateness statistics if we have that data
-            if 'Is Late' in today_data.columns and not today_data.empty:
-                st.subheader("Attendance Statistics")
-                
-                # Create pie chart data
-                on_time_count = len(today_data[today_data['Is Late'] == False])
-                late_count = len(today_data[today_data['Is Late'] == True])
+            # Create columns for side-by-side display
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                # Display metrics
+                st.metric("On-Time Arrivals", view['on_time'])
+                st.metric("Late Arrivals", view['late'])
                 
-                if on_time_count > 0 or late_count > 0:
-                    # Create columns for side-by-side display
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        # Display metrics
-                        st.metric("On-Time Arrivals", on_time_count)
-                        st.metric("Late Arrivals", late_count)
-                        
-                        # Calculate punctuality rate
-                        punctuality_rate = on_time_count / (on_time_count + late_count) * 100 if (on_time_count + late_count) > 0 else 0
-                        st.metric("Punctuality Rate", f"{punctuality_rate:.1f}%")
-                    
-                    with col2:
-                        # Create a simple pie chart using matplotlib
-                        if on_time_count > 0 or late_count > 0:
-                            fig, ax = plt.subplots(figsize=(4, 4))
-                            ax.pie([on_time_count, late_count], 
-                                  labels=['On Time', 'Late'], 
-                                  autopct='%1.1f%%',
-                                  colors=['#CCFFCC', '#FFCCCC'],
-                                  startangle=90)
-                            ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
-                            plt.title('Punctuality Statistics')
-                            st.pyplot(fig)
-        else:
-            st.info("No attendance records for today yet.")
+                # Calculate punctuality rate
+                punctuality_rate = view['on_time'] / (view['on_time'] + view['late']) * 100
+                st.metric("Punctuality Rate", f"{punctuality_rate:.1f}%")
             
+            with col2:
+                # The pie chart is only drawn for counts not seen before
+                st.image(view['chart'], use_container_width=True)
+    else:
+        st.info("No attendance records for today yet.")
+    
     # Add automatic refresh message
-    st.caption("Data refreshes automatically with page refresh")
+    if st.session_state.get("auto_refresh", True):
+        st.caption(f"Updates automatically when a punch is recorded · last change seen at {view['updated']}")
+    else:
+        st.caption("Auto-refresh is off: reload the page to see new punches")
+
+# Function to show the registered employee IDs after an unknown ID was entered
+def show_unregistered_employee(emp_id):
+    st.error(f"❌ Employee ID {emp_id} is not registered in the system. Please contact your administrator.")
+    
+    # Show registered employees in an expander for admin reference
+    with st.expander("Available Employee IDs"):
+        st.info("The following employee IDs are registered in the system:")
+        for idx, row in employee_registry.load().iterrows():
+            st.write(f"- ID: {row['Employee ID']} | Name: {row['Employee Name']}")
+        st.caption("If you need to register a new employee, please use the Admin Panel.")
+
+# Function to check whether an employee ID may punch (one lookup in the registry index)
+def check_registered_employee(emp_id):
+    try:
+        is_valid_employee = punch_service.is_registered(emp_id)
+    except Exception:
+        # Without a readable registry any ID may punch, as before it existed
+        return True
+    if not is_valid_employee:
+        show_unregistered_employee(emp_id)
+    return is_valid_employee
+
+# Function to get an employee's punch status for today, or None if it can't be read
+def get_punch_status(emp_id):
+    try:
+        return punch_service.status(emp_id)
+    except Exception as e:
+        st.error(f"Error loading data: {e}")
+        return None
+
+# Function to show the current punch status for an employee
+def show_punch_status(emp_id):
+    # Show status in a separate section
+    st.markdown("---")
+    st.subheader(f"Current Status for Employee ID {emp_id}")
+    
+    status = get_punch_status(emp_id)
+    if status is None:
+        return
+    record = status['record']
+    
+    if status['state'] == PUNCHED_IN:
+        # Check if the employee was late
+        if record['Is Late']:
+            st.warning(f"📌 Status: Employee ID {emp_id} is currently PUNCHED IN (LATE at {record['Punch In Time']})")
+        else:
+            st.success(f"📌 Status: Employee ID {emp_id} is currently PUNCHED IN (ON TIME at {record['Punch In Time']})")
+    elif status['state'] == COMPLETED:
+        if record['Is Late']:
+            st.info(f"📌 Status: Employee ID {emp_id} has COMPLETED attendance for today (LATE)")
+        else:
+            st.info(f"📌 Status: Employee ID {emp_id} has COMPLETED attendance for today (ON TIME)")
+        
+        st.success(f"Punch In: {record['Punch In Time']} | Punch Out: {record['Punch Out Time']} | Work Hours: {record['Work Hours']} hrs")
+    else:
+        st.warning(f"📌 Status: Employee ID {emp_id} is NOT punched in")
 
 # Punch In page
+@timed("punch_in_page")
+@profiled("punch_in_page")
 def punch_in_page():
     st.header("Vistotech Morning Punch In")
     
-    # Get fresh current time directly from system
-    current_time = datetime.now().strftime('%H:%M:%S')
-    today = datetime.now().strftime('%Y-%m-%d')
-    
     # Show clock interface
     show_clock_and_date()
     
-    # Load registered employees data
-    try:
-        employees_df = load_employee_data()
-        has_employee_registry = not employees_df.empty
-    except:
-        has_employee_registry = False
-        employees_df = pd.DataFrame()
-    
     # Input fields for employee information
     emp_id = st.text_input("Employee ID")
     
     if emp_id:
         # Check if this is a registered employee ID if we have employee data
-        is_valid_employee = True
-        if has_employee_registry:
-            # Convert both to strings for comparison
-            emp_id_str = str(emp_id).strip()
-            registered_ids = employees_df['Employee ID'].astype(str).str.strip().tolist()
-            
-            if emp_id_str not in registered_ids:
-                st.error(f"❌ Employee ID {emp_id} is not registered in the system. Please contact your administrator.")
-                is_valid_employee = False
-                
-                # Show registered employees in an expander for admin reference
-                with st.expander("Available Employee IDs"):
-                    st.info("The following employee IDs are registered in the system:")
-                    for idx, row in employees_df.iterrows():
-                        st.write(f"- ID: {row['Employee ID']} | Name: {row['Employee Name']}")
-                    st.caption("If you need to register a new employee, please use the Admin Panel.")
-        
-        if is_valid_employee:
-            # Check if employee is already punched in - no name passed
-            already_punched_in, index = check_existing_punch_in(emp_id, today) if emp_id else (False, None)
+        if check_registered_employee(emp_id):
+            status = get_punch_status(emp_id)
             
-            # Load current record data
-            df = load_data()
-            
-            if already_punched_in:
+            if status is not None and status['state'] == PUNCHED_IN:
                 st.warning(f"⚠️ Employee ID {emp_id} is already punched in for today. Please use the Punch Out option to complete your attendance.")
                 
                 # Show when they punched in
-                current_record = df.iloc[index]
-                st.info(f"You punched in at {current_record['Punch In Time']}")
+                st.info(f"You punched in at {status['record']['Punch In Time']}")
                 
                 # Show a message directing them to the punch out option
                 st.info("To punch out, please select the 'Punch Out' option from the sidebar menu.")
@@ -533,102 +472,35 @@ def punch_in_page():
                 
                 # Show punch in button with proper key to prevent button conflicts
                 if st.button("📥 PUNCH IN", use_container_width=True, type="primary", key="main_punch_in"):
-                    # Check for completed records for today
-                    completed_today = df[(df['Employee ID'].astype(str).str.strip() == str(emp_id).strip()) & 
-                                    (df['Date'] == today) & 
-                                    (df['Status'] == 'Completed')]
+                    # Store the punch in success in session state
+                    if 'punch_in_success' not in st.session_state:
+                        st.session_state.punch_in_success = False
                     
-                    if not completed_today.empty:
-                        st.error(f"You have already completed your attendance for today at {completed_today.iloc[0]['Punch Out Time']}.")
+                    try:
+                        # The service checks for earlier punches today and marks late arrivals
+                        record = punch_service.punch_in(emp_id)
+                    except AlreadyCompletedError as e:
+                        st.error(f"You have already completed your attendance for today at {e.record['Punch Out Time']}.")
+                    except PunchError as e:
+                        st.error(f"❌ {e}")
+                    except Exception as e:
+                        st.error(f"Error saving punch in record: {e}")
+                        st.info("Please try again.")
                     else:
-                        # Store the punch in success in session state
-                        if 'punch_in_success' not in st.session_state:
-                            st.session_state.punch_in_success = False
+                        punch_time = record['Punch In Time']
+                        st.session_state.punch_in_success = True
                         
-                        try:
-                            # Check if punch in time is after 10:15 AM
-                            is_late = False
-                            current_time_obj = datetime.strptime(current_time, '%H:%M:%S').time()
-                            cutoff_time = datetime.strptime("10:15:00", '%H:%M:%S').time()
-                            
-                            if current_time_obj > cutoff_time:
-                                is_late = True
-                                st.warning(f"⚠️ You are late! The cutoff time is 10:15 AM. You punched in at {current_time}.")
-                            
-                            # Get employee name from registry
-                            emp_name = "Unknown"
-                            if has_employee_registry:
-                                emp_name = employees_df[employees_df['Employee ID'].astype(str).str.strip() == emp_id_str]['Employee Name'].iloc[0] if emp_id_str in registered_ids else "Unknown"
-                            
-                            # Create a new record
-                            new_row = {
-                                'Employee ID': emp_id,
-                                'Employee Name': emp_name,
-                                'Date': today,
-                                'Punch In Time': current_time,
-                                'Punch Out Time': None,
-                                'Work Hours': None,
-                                'Status': 'In Progress',
-                                'Is Late': is_late
-                            }
-                            
-                            # Add the new row
-                            df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-                            
-                            # Save data to Excel
-                            if save_data(df):
-                                # Apply color formatting
-                                apply_excel_formatting()
-                                
-                                st.session_state.punch_in_success = True
-                                
-                                if is_late:
-                                    st.warning(f"⚠️ Late Punch In recorded at {current_time}. Your entry has been marked as LATE.")
-                                else:
-                                    st.success(f"✅ On-time Punch In recorded at {current_time}.")
-                                    
-                                st.success(f"Employee ID: {emp_id} successfully punched in!")
-                                st.balloons()
-                                
-                        except Exception as e:
-                            st.error(f"Error saving punch in record: {e}")
-                            st.info("Please try again.")
+                        if record['Is Late']:
+                            st.warning(f"⚠️ You are late! The cutoff time is 10:15 AM. You punched in at {punch_time}.")
+                            st.warning(f"⚠️ Late Punch In recorded at {punch_time}. Your entry has been marked as LATE.")
+                        else:
+                            st.success(f"✅ On-time Punch In recorded at {punch_time}.")
                         
-        # Show status in a separate section
-        st.markdown("---")
+                        st.success(f"Employee ID: {emp_id} successfully punched in!")
+                        st.balloons()
         
         # Show the current status for this employee
-        st.subheader(f"Current Status for Employee ID {emp_id}")
-        
-        # Check current status again to ensure we have the latest data
-        already_punched_in, index = check_existing_punch_in(emp_id, today)
-        
-        if already_punched_in:
-            current_record = df.iloc[index]
-            # Check if the employee was late
-            if 'Is Late' in current_record and current_record['Is Late']:
-                st.warning(f"📌 Status: Employee ID {emp_id} is currently PUNCHED IN (LATE at {current_record['Punch In Time']})")
-            else:
-                st.success(f"📌 Status: Employee ID {emp_id} is currently PUNCHED IN (ON TIME at {current_record['Punch In Time']})")
-        else:
-            completed_today = df[(df['Employee ID'] == emp_id) & 
-                              (df['Date'] == today) & 
-                              (df['Status'] == 'Completed')]
-            
-            if not completed_today.empty:
-                punch_in = completed_today.iloc[0]['Punch In Time']
-                punch_out = completed_today.iloc[0]['Punch Out Time'] 
-                work_hours = completed_today.iloc[0]['Work Hours']
-                is_late = completed_today.iloc[0]['Is Late'] if 'Is Late' in completed_today.iloc[0] else False
-                
-                if is_late:
-                    st.info(f"📌 Status: Employee ID {emp_id} has COMPLETED attendance for today (LATE)")
-                else:
-                    st.info(f"📌 Status: Employee ID {emp_id} has COMPLETED attendance for today (ON TIME)")
-                
-                st.success(f"Punch In: {punch_in} | Punch Out: {punch_out} | Work Hours: {work_hours} hrs")
-            else:
-                st.warning(f"📌 Status: Employee ID {emp_id} is NOT punched in")
+        show_punch_status(emp_id)
     else:
         st.info("Please enter your Employee ID to punch in.")
     
@@ -636,97 +508,42 @@ def punch_in_page():
     show_attendance_dashboard()
 
 # Punch Out page
+@timed("punch_out_page")
+@profiled("punch_out_page")
 def punch_out_page():
     st.header("Vistotech Evening Punch Out")
     
-    # Get fresh current time directly from system
-    current_time = datetime.now().strftime('%H:%M:%S')
-    today = datetime.now().strftime('%Y-%m-%d')
-    
     # Show clock interface
     show_clock_and_date()
     
-    # Load registered employees data
-    try:
-        employees_df = load_employee_data()
-        has_employee_registry = not employees_df.empty
-    except:
-        has_employee_registry = False
-        employees_df = pd.DataFrame()
-        
     # Input fields for employee information
     emp_id = st.text_input("Employee ID")
     
     if emp_id:
         # Check if this is a registered employee ID if we have employee data
-        is_valid_employee = True
-        if has_employee_registry:
-            # Convert both to strings for comparison
-            emp_id_str = str(emp_id).strip()
-            registered_ids = employees_df['Employee ID'].astype(str).str.strip().tolist()
-            
-            if emp_id_str not in registered_ids:
-                st.error(f"❌ Employee ID {emp_id} is not registered in the system. Please contact your administrator.")
-                is_valid_employee = False
-                
-                # Show registered employees in an expander for admin reference
-                with st.expander("Available Employee IDs"):
-                    st.info("The following employee IDs are registered in the system:")
-                    for idx, row in employees_df.iterrows():
-                        st.write(f"- ID: {row['Employee ID']} | Name: {row['Employee Name']}")
-                    st.caption("If you need to register a new employee, please use the Admin Panel.")
-        
-        if is_valid_employee:
-            # Load data first
-            df = load_data()
-            
-            # Convert the emp_id to string to ensure consistent comparison
-            emp_id_str = str(emp_id).strip()
-            
-            # Get all records for this employee ID today
-            today_records = df[df['Date'] == today]
-            today_records = today_records[today_records['Employee ID'].astype(str).str.strip() == emp_id_str]
+        if check_registered_employee(emp_id):
+            status = get_punch_status(emp_id)
             
             # Check if there are any records for this employee ID
-            if today_records.empty:
+            if status is None or status['state'] == NOT_PUNCHED_IN:
                 st.error(f"No attendance records found for Employee ID: {emp_id} today. Please punch in first.")
                 return
-                
-            # First try checking for in-progress records
-            in_progress_records = today_records[today_records['Status'] == 'In Progress']
-            already_punched_in = not in_progress_records.empty
             
-            if already_punched_in:
-                # If we found in-progress records, get the first one
-                index = in_progress_records.index[0]
-                st.success(f"Found punch-in record for Employee ID: {emp_id}!")
-            else:
-                # If not found, show available records for this ID and ask for confirmation
+            if status['state'] == COMPLETED:
+                record = status['record']
                 st.warning(f"No in-progress record found for Employee ID {emp_id}.")
-                
-                # Check if they've completed records for today
-                completed_records = today_records[today_records['Status'] == 'Completed']
-                if not completed_records.empty:
-                    st.info("You have already completed your attendance for today:")
-                    for _, record in completed_records.iterrows():
-                        st.success(f"Punch In: {record['Punch In Time']} | Punch Out: {record['Punch Out Time']} | Work Hours: {record['Work Hours']} hrs")
-                    return
-                else:
-                    st.error("No valid records found. Please punch in first using the 'Punch In' option.")
-                    return
-        
-        # If we found a record to punch out
-        if is_valid_employee and already_punched_in:
-            current_record = df.iloc[index]
+                st.info("You have already completed your attendance for today:")
+                st.success(f"Punch In: {record['Punch In Time']} | Punch Out: {record['Punch Out Time']} | Work Hours: {record['Work Hours']} hrs")
+                return
+            
+            st.success(f"Found punch-in record for Employee ID: {emp_id}!")
             
             # When already punched in, show punch out option
             st.write("### Record End of Day Punch Out")
             
             # Show when they punched in
-            punch_in_time = current_record['Punch In Time']
-            is_late = current_record['Is Late'] if 'Is Late' in current_record else False
-            
-            if is_late:
+            punch_in_time = status['record']['Punch In Time']
+            if status['record']['Is Late']:
                 st.warning(f"You punched in LATE at {punch_in_time}")
             else:
                 st.success(f"You punched in ON TIME at {punch_in_time}")
@@ -737,81 +554,25 @@ def punch_out_page():
             
             # Show punch out button
             if st.button("📤 PUNCH OUT", use_container_width=True, type="primary"):
-                if current_record is None:
-                    st.error("Error accessing your punch record. Please try again.")
+                try:
+                    # The service completes today's open punch and calculates the work hours
+                    record = punch_service.punch_out(emp_id)
+                except PunchError as e:
+                    st.error(f"❌ {e}")
+                except Exception as e:
+                    st.error(f"Error saving data: {e}")
                 else:
-                    # Update punch out time
-                    # Calculate work hours
-                    work_hours = calculate_hours(current_record['Punch In Time'], current_time)
-                    
-                    df.at[index, 'Punch Out Time'] = current_time
-                    df.at[index, 'Work Hours'] = work_hours
-                    df.at[index, 'Status'] = 'Completed'
-                    
-                    if save_data(df):
-                        st.session_state.punch_out_success = True
-                        st.success(f"✅ Punch Out recorded at {current_time} for Employee ID {emp_id}")
-                        st.success(f"Total work hours for today: {work_hours} hrs")
-                        st.balloons()
+                    st.session_state.punch_out_success = True
+                    st.success(f"✅ Punch Out recorded at {record['Punch Out Time']} for Employee ID {emp_id}")
+                    st.success(f"Total work hours for today: {record['Work Hours']} hrs")
+                    st.balloons()
             
             # Display success message if previously punched out
             if st.session_state.punch_out_success:
                 st.success("You have successfully punched out for today!")
-                
-        elif is_valid_employee:
-            # Check if they've already completed attendance for today
-            completed_today = df[(df['Employee ID'].astype(str).str.strip() == str(emp_id).strip()) & 
-                             (df['Date'] == today) & 
-                             (df['Status'] == 'Completed')]
-            
-            if not completed_today.empty:
-                # They've already punched out
-                punch_in = completed_today.iloc[0]['Punch In Time']
-                punch_out = completed_today.iloc[0]['Punch Out Time']
-                work_hours = completed_today.iloc[0]['Work Hours']
-                
-                st.info("You have already completed your attendance for today:")
-                st.success(f"Punch In: {punch_in} | Punch Out: {punch_out} | Work Hours: {work_hours} hrs")
-            else:
-                # They haven't punched in yet
-                st.warning(f"⚠️ Employee ID {emp_id} has not punched in for today.")
-                st.info("Please use the 'Punch In' option from the sidebar menu to record your entry first.")
-        
-        # Show status in a separate section
-        st.markdown("---")
         
         # Show the current status for this employee
-        st.subheader(f"Current Status for Employee ID {emp_id}")
-        
-        # Check current status again to ensure we have the latest data
-        already_punched_in, index = check_existing_punch_in(emp_id, today)
-        
-        if already_punched_in:
-            current_record = df.iloc[index]
-            # Check if the employee was late
-            if 'Is Late' in current_record and current_record['Is Late']:
-                st.warning(f"📌 Status: Employee ID {emp_id} is currently PUNCHED IN (LATE at {current_record['Punch In Time']})")
-            else:
-                st.success(f"📌 Status: Employee ID {emp_id} is currently PUNCHED IN (ON TIME at {current_record['Punch In Time']})")
-        else:
-            completed_today = df[(df['Employee ID'] == emp_id) & 
-                              (df['Date'] == today) & 
-                              (df['Status'] == 'Completed')]
-            
-            if not completed_today.empty:
-                punch_in = completed_today.iloc[0]['Punch In Time']
-                punch_out = completed_today.iloc[0]['Punch Out Time'] 
-                work_hours = completed_today.iloc[0]['Work Hours']
-                is_late = completed_today.iloc[0]['Is Late'] if 'Is Late' in completed_today.iloc[0] else False
-                
-                if is_late:
-                    st.info(f"📌 Status: Employee ID {emp_id} has COMPLETED attendance for today (LATE)")
-                else:
-                    st.info(f"📌 Status: Employee ID {emp_id} has COMPLETED attendance for today (ON TIME)")
-                
-                st.success(f"Punch In: {punch_in} | Punch Out: {punch_out} | Work Hours: {work_hours} hrs")
-            else:
-                st.warning(f"📌 Status: Employee ID {emp_id} is NOT punched in")
+        show_punch_status(emp_id)
     else:
         st.info("Please enter your Employee ID to punch out.")
     
@@ -819,13 +580,19 @@ def punch_out_page():
     show_attendance_dashboard()
 
 # View Reports page
+@timed("view_reports_page")
+@profiled("view_reports_page")
 def view_reports_page():
     st.header("Vistotech Attendance Reports")
     
-    # Load the data
-    df = load_data()
+    # Only the first and last dates are needed to set up the date pickers
+    try:
+        first_date, last_date = get_store().date_bounds()
+    except Exception as e:
+        st.error(f"Error loading data: {e}")
+        return
     
-    if df.empty:
+    if first_date is None:
         st.info("No attendance data available.")
         return
     
@@ -833,112 +600,89 @@ def view_reports_page():
     col1, col2 = st.columns(2)
     with col1:
         start_date = st.date_input("Start Date", 
-                                 min_value=pd.to_datetime(df['Date']).dt.date.min() if not df.empty else datetime.now().date())
+                                 min_value=first_date.date())
     with col2:
         end_date = st.date_input("End Date", 
-                               max_value=pd.to_datetime(df['Date']).dt.date.max() if not df.empty else datetime.now().date())
+                               max_value=last_date.date())
     
     # Convert to string for filtering
     start_date_str = start_date.strftime('%Y-%m-%d')
     end_date_str = end_date.strftime('%Y-%m-%d')
     
-    # Filter data by date range
-    filtered_df = df[(df['Date'] >= start_date_str) & (df['Date'] <= end_date_str)]
+    # Employee filter, offering the employees seen in the selected range
+    # (only the Employee ID column of those months is read)
+    try:
+        range_employees = get_store().query(start_date_str, end_date_str, columns=['Employee ID'])['Employee ID']
+    except Exception as e:
+        st.error(f"Error loading data: {e}")
+        return
     
-    # Employee filter
-    if not df['Employee ID'].empty:
+    employee_filter = []
+    if not range_employees.empty:
         employee_filter = st.multiselect("Filter by Employee", 
-                                      options=sorted(df['Employee ID'].unique()), 
+                                      options=sorted(range_employees.unique()), 
                                       default=[])
-        
-        if employee_filter:
-            filtered_df = filtered_df[filtered_df['Employee ID'].isin(employee_filter)]
     
     # Add lateness filter
-    if 'Is Late' in filtered_df.columns:
-        lateness_filter = st.multiselect("Filter by Punctuality",
-                                       options=["On Time", "Late"],
-                                       default=[])
-        
-        if lateness_filter:
-            if "On Time" in lateness_filter and "Late" in lateness_filter:
-                pass  # Show all records
-            elif "On Time" in lateness_filter:
-                filtered_df = filtered_df[filtered_df['Is Late'] == False]
-            elif "Late" in lateness_filter:
-                filtered_df = filtered_df[filtered_df['Is Late'] == True]
-    
-    # Show filtered data
-    if not filtered_df.empty:
-        st.subheader("Filtered Attendance Records")
-        
-        # Style the dataframe with colors
-        def style_dataframe(row):
-            styles = []
-            for _ in row:
-                if row['Status'] == 'Completed':
-                    styles.append('background-color: #E0F7FA; color: black')  # Light blue for completed
-                elif 'Is Late' in row and row['Is Late']:
-                    styles.append('background-color: #FFCCCC; color: black')  # Light red for late
-                else:
-                    styles.append('background-color: #CCFFCC; color: black')  # Light green for on-time
-            return styles
-        
-        st.dataframe(
-            filtered_df.style.apply(style_dataframe, axis=1),
-            use_container_width=True
-        )
+    late_filter = None
+    lateness_filter = st.multiselect("Filter by Punctuality",
+                                   options=["On Time", "Late"],
+                                   default=[])
+    
+    if lateness_filter:
+        if "On Time" in lateness_filter and "Late" in lateness_filter:
+            pass  # Show all records
+        elif "On Time" in lateness_filter:
+            late_filter = False
+        elif "Late" in lateness_filter:
+            late_filter = True
+    
+    # Show filtered data, one page at a time; the store applies the date,
+    # employee and punctuality filters and the sort order
+    st.subheader("Filtered Attendance Records")
+    
+    _, total_records = show_records_grid("reports", start_date_str, end_date_str,
+                                         employee_ids=employee_filter or None, is_late=late_filter)
+    
+    if total_records:
+        # Totals come from the pre-aggregated rollups rather than the raw punches
+        rollups = get_store().rollups()
+        summary_df = rollups.employee_summary(start_date_str, end_date_str,
+                                              employee_ids=employee_filter or None, is_late=late_filter)
         
         # Calculate total hours worked and lateness statistics
-        if 'Work Hours' in filtered_df.columns and not filtered_df[filtered_df['Work Hours'].notna()].empty:
+        if not summary_df.empty:
             # Calculate hours by employee
-            hours_by_employee = filtered_df.groupby(['Employee ID', 'Employee Name'])['Work Hours'].sum().reset_index()
+            hours_by_employee = summary_df[['Employee ID', 'Employee Name', 'Work Hours']]
             
-            # Calculate lateness count by employee if we have that data
-            if 'Is Late' in filtered_df.columns:
-                lateness_by_employee = filtered_df.groupby(['Employee ID', 'Employee Name'])['Is Late'].sum().reset_index()
-                lateness_by_employee = lateness_by_employee.rename(columns={'Is Late': 'Late Count'})
-                
-                # Count days present
-                days_present = filtered_df.groupby(['Employee ID', 'Employee Name']).size().reset_index(name='Days Present')
-                
-                # Merge the data
-                summary_df = pd.merge(hours_by_employee, lateness_by_employee, on=['Employee ID', 'Employee Name'])
-                summary_df = pd.merge(summary_df, days_present, on=['Employee ID', 'Employee Name'])
-                
-                # Calculate punctuality rate
-                summary_df['Punctuality Rate'] = ((summary_df['Days Present'] - summary_df['Late Count']) / summary_df['Days Present'] * 100).round(1)
-                
-                # Show summary
-                st.subheader("Employee Summary")
-                st.dataframe(summary_df, use_container_width=True)
-            else:
-                # Just show hours summary if we don't have lateness data
-                st.subheader("Total Hours Summary")
-                st.dataframe(hours_by_employee, use_container_width=True)
+            # Show summary
+            st.subheader("Employee Summary")
+            st.dataframe(summary_df, use_container_width=True)
             
             # Show visualization of hours worked
             st.subheader("Hours Worked by Employee")
             st.bar_chart(hours_by_employee.set_index('Employee Name')['Work Hours'])
             
-            # Show lateness visualization if we have that data
-            if 'Is Late' in filtered_df.columns:
-                late_counts = filtered_df.groupby('Date')['Is Late'].sum().reset_index()
-                late_counts['Date'] = pd.to_datetime(late_counts['Date'])
-                late_counts = late_counts.sort_values('Date')
-                
-                st.subheader("Late Arrivals by Date")
-                st.line_chart(late_counts.set_index('Date')['Is Late'])
-    else:
-        st.info("No records found for the selected criteria.")
-    
-    # Export functionality
-    if not filtered_df.empty:
+            # Show lateness visualization
+            late_counts = rollups.late_by_date(start_date_str, end_date_str,
+                                               employee_ids=employee_filter or None, is_late=late_filter)
+            
+            st.subheader("Late Arrivals by Date")
+            st.line_chart(late_counts)
+    
+    # Export functionality: the file is only built when the button is clicked,
+    # streamed chunk by chunk from the store into a temporary file
+    if total_records:
+        export_format = st.selectbox("Export format", options=list(EXPORT_FORMATS),
+                                     format_func=lambda f: f.upper())
+        mime, extension = EXPORT_FORMATS[export_format]
         st.download_button(
-            label="Export to CSV",
-            data=filtered_df.to_csv(index=False).encode('utf-8'),
-            file_name=f"attendance_report_{start_date_str}_to_{end_date_str}.csv",
-            mime="text/csv"
+            label=f"Export to {export_format.upper()}",
+            data=lambda: export_to_tempfile(get_store(), export_format,
+                                            start_date=start_date_str, end_date=end_date_str,
+                                            employee_ids=employee_filter or None, is_late=late_filter),
+            file_name=f"attendance_report_{start_date_str}_to_{end_date_str}{extension}",
+            mime=mime
         )
 
 # Helper function to check password strength
@@ -995,33 +739,28 @@ def get_admin_password():
         return "admin123"
 
 # Function to load and save employee records
+@timed("load_employee_data")
 def load_employee_data():
-    """Load employee data from the EMPLOYEES_FILE"""
-    EMPLOYEES_FILE = "employees.xlsx"
+    """Load employee data from the cached employee registry"""
     try:
-        if os.path.exists(EMPLOYEES_FILE):
-            df = pd.read_excel(EMPLOYEES_FILE)
-            return df
-        else:
-            # Create a new DataFrame if file doesn't exist
-            df = pd.DataFrame(columns=['Employee ID', 'Employee Name', 'Date Added'])
-            df.to_excel(EMPLOYEES_FILE, index=False)
-            return df
+        return employee_registry.load()
     except Exception as e:
         st.error(f"Error loading employee data: {e}")
-        return pd.DataFrame(columns=['Employee ID', 'Employee Name', 'Date Added'])
+        return pd.DataFrame(columns=EMPLOYEE_COLUMNS)
 
+@timed("save_employee_data")
 def save_employee_data(df):
-    """Save employee data to EMPLOYEES_FILE"""
-    EMPLOYEES_FILE = "employees.xlsx"
+    """Save employee data to EMPLOYEES_FILE (refreshes the registry cache)"""
     try:
-        df.to_excel(EMPLOYEES_FILE, index=False)
+        employee_registry.save(df)
         return True
     except Exception as e:
         st.error(f"Error saving employee data: {e}")
         return False
 
 # Admin Panel page
+@timed("admin_panel_page")
+@profiled("admin_panel_page")
 def admin_panel_page():
     st.header("Vistotech Admin Panel")
     
@@ -1036,9 +775,6 @@ def admin_panel_page():
     </div>
     """, unsafe_allow_html=True)
     
-    # Load data
-    df = load_data()
-    
     # Add password protection
     current_admin_password = get_admin_password()
     password = st.text_input("Enter Admin Password", type="password")
@@ -1050,53 +786,45 @@ def admin_panel_page():
     st.success("Admin access granted!")
     
     # Admin actions tabs
-    admin_tab1, admin_tab2, admin_tab3, admin_tab4 = st.tabs([
+    admin_tab1, admin_tab2, admin_tab3, admin_tab4, admin_tab5 = st.tabs([
         "Attendance Records", 
         "Employee Management", 
         "Change Password", 
-        "System Settings"
+        "System Settings",
+        "Performance"
     ])
     
+    # Count the records without loading them
+    try:
+        total_records = get_store().count()
+    except Exception as e:
+        st.error(f"Error loading data: {e}")
+        total_records = 0
+    
     # Tab 1: Attendance Records
     with admin_tab1:
         st.subheader("All Attendance Records")
-        if not df.empty:
-            # Apply styling to the dataframe
-            def style_dataframe(row):
-                styles = []
-                for _ in row:
-                    if row['Status'] == 'Completed':
-                        styles.append('background-color: #E0F7FA; color: black')  # Light blue for completed
-                    elif 'Is Late' in row and row['Is Late']:
-                        styles.append('background-color: #FFCCCC; color: black')  # Light red for late
-                    else:
-                        styles.append('background-color: #CCFFCC; color: #000080')  # Light green for on-time
-                return styles
-            
-            st.dataframe(
-                df.style.apply(style_dataframe, axis=1),
-                use_container_width=True
-            )
+        if total_records:
+            # Only the page on screen is read from the store and styled
+            df, _ = show_records_grid("admin")
             
             # Manual record editing
             with st.expander("Edit Records"):
-                # Select record to edit
+                # Select record to edit, from the page shown above
                 selected_index = st.selectbox("Select record to edit", 
                                             options=df.index,
-                                            format_func=lambda x: f"{df.loc[x, 'Employee ID']} - {df.loc[x, 'Employee Name']} - {df.loc[x, 'Date']}")
+                                            format_func=lambda x: f"{df.loc[x, 'Employee ID']} - {df.loc[x, 'Employee Name']} - {normalize_date(df.loc[x, 'Date'])}")
                 
                 if selected_index is not None:
                     # Create a 2-column layout for time fields
                     col1, col2 = st.columns(2)
                     
                     with col1:
-                        new_punch_in = st.text_input("Punch In Time", value=df.loc[selected_index, 'Punch In Time'])
+                        new_punch_in = st.text_input("Punch In Time", value=format_time(df.loc[selected_index, 'Punch In Time']))
                         
                         # Determine if this punch in would be considered late
                         try:
-                            punch_in_time = datetime.strptime(new_punch_in, '%H:%M:%S').time()
-                            cutoff_time = datetime.strptime("10:15:00", '%H:%M:%S').time()
-                            is_late = punch_in_time > cutoff_time
+                            is_late = is_late_time(new_punch_in)
                             
                             if is_late:
                                 st.warning("⚠️ This punch in time is after 10:15 AM and will be marked as LATE")
@@ -1107,32 +835,20 @@ def admin_panel_page():
                         
                     with col2:
                         new_punch_out = st.text_input("Punch Out Time", 
-                                                    value=df.loc[selected_index, 'Punch Out Time'] 
+                                                    value=format_time(df.loc[selected_index, 'Punch Out Time']) 
                                                     if pd.notna(df.loc[selected_index, 'Punch Out Time']) else "")
                     
                     # Update button
                     if st.button("Update Record"):
-                        # Update punch in time and check if it's late
-                        df.at[selected_index, 'Punch In Time'] = new_punch_in
-                        
                         try:
-                            punch_in_time = datetime.strptime(new_punch_in, '%H:%M:%S').time()
-                            cutoff_time = datetime.strptime("10:15:00", '%H:%M:%S').time()
-                            df.at[selected_index, 'Is Late'] = punch_in_time > cutoff_time
-                        except:
-                            pass
-                        
-                        # Update punch out time if provided
-                        if new_punch_out:
-                            df.at[selected_index, 'Punch Out Time'] = new_punch_out
-                            # Recalculate work hours
-                            work_hours = calculate_hours(new_punch_in, new_punch_out)
-                            df.at[selected_index, 'Work Hours'] = work_hours
-                            df.at[selected_index, 'Status'] = 'Completed'
-                        
-                        # Save data and apply formatting
-                        if save_data(df):
-                            apply_excel_formatting()
+                            # The service re-derives lateness, work hours and status from the new times
+                            # and saves the single record (the Excel store recolours just that row)
+                            punch_service.edit(selected_index, new_punch_in, new_punch_out or None)
+                        except PunchError as e:
+                            st.error(f"❌ {e}")
+                        except Exception as e:
+                            st.error(f"Error saving data: {e}")
+                        else:
                             st.success("✅ Record updated successfully")
                             st.rerun()  # Refresh the page to show updates
             
@@ -1144,13 +860,31 @@ def admin_panel_page():
                 if confirm_delete == "DELETE":
                     if st.button("Permanently Clear All Records", type="primary"):
                         # Create a new empty DataFrame with the same columns
-                        new_df = pd.DataFrame(columns=df.columns)
+                        new_df = empty_frame()
                         if save_data(new_df):
                             st.success("✅ All records have been cleared")
                             time.sleep(1)
                             st.rerun()
         else:
             st.info("No attendance records available.")
+        
+        # Backfill attendance from biometric device logs in one batch
+        with st.expander("Import Punches from Device Logs"):
+            st.write("Upload a CSV or Excel file with one row per swipe: **Employee ID** and **Timestamp** "
+                     "(or **Date** and **Time**). Each employee's first swipe of a day is the punch in, "
+                     "the last one the punch out. Days already recorded are skipped.")
+            punch_file = st.file_uploader("Device log", type=["csv", "xlsx"], key="punch_import_file")
+            allow_unregistered = st.checkbox("Keep punches from unregistered employee IDs", value=False)
+            
+            if punch_file is not None and st.button("Import Punches", type="primary"):
+                try:
+                    with st.spinner("Importing punches..."):
+                        stats = import_punches(punch_file, get_store(), allow_unregistered=allow_unregistered)
+                    st.success(f"✅ Imported {stats['added']} attendance records from {stats['events']} swipes")
+                    st.info(f"Skipped: {stats['already_recorded']} days already recorded, "
+                            f"{stats['unregistered']} swipes from unregistered IDs, {stats['invalid']} unreadable rows")
+                except Exception as e:
+                    st.error(f"Error importing punches: {e}")
     
     # Tab 2: Employee Management
     with admin_tab2:
@@ -1180,7 +914,7 @@ def admin_panel_page():
         # Add employee button
         if new_emp_id and new_emp_name:
             # Check if ID already exists
-            if not employees_df.empty and new_emp_id in employees_df['Employee ID'].astype(str).values:
+            if new_emp_id in employee_registry:
                 st.error(f"❌ Employee ID {new_emp_id} already exists! Please use a unique ID.")
             else:
                 if st.button("Add Employee", type="primary"):
@@ -1200,6 +934,22 @@ def admin_panel_page():
                     else:
                         st.error("Failed to save employee data.")
         
+        # Bulk import: validated and saved in one write instead of one per employee
+        st.markdown("---")
+        st.subheader("Bulk Import Employees")
+        st.write("Upload a CSV or Excel file with **Employee ID** and **Employee Name** columns "
+                 "(**Date Added** is optional). Registered IDs and repeated rows are skipped.")
+        employees_file = st.file_uploader("Employee list", type=["csv", "xlsx"], key="employee_import_file")
+        
+        if employees_file is not None and st.button("Import Employees", type="primary"):
+            try:
+                stats = import_employees(employees_file)
+                st.success(f"✅ Registered {stats['added']} new employees")
+                st.info(f"Skipped: {stats['already_registered']} already registered, "
+                        f"{stats['duplicates']} repeated in the file, {stats['invalid']} missing an ID or name")
+            except Exception as e:
+                st.error(f"Error importing employees: {e}")
+        
         # Delete employee section
         st.markdown("---")
         st.subheader("Delete Employee")
@@ -1267,8 +1017,25 @@ def admin_panel_page():
         st.write("Current punctuality cutoff time: **10:15 AM**")
         st.write("Employees who punch in after this time will be marked as late.")
         
-        # Excel Formatting
-        st.subheader("Excel Formatting")
+        # Bulk recomputation of derived fields
+        if st.button("Recalculate Work Hours and Lateness"):
+            try:
+                # Re-reads and retries if a punch lands while recalculating
+                get_store().transaction(recompute)
+                st.success(f"✅ Recalculated work hours and lateness for {total_records} records")
+            except Exception as e:
+                st.error(f"Error saving data: {e}")
+        
+        # Excel Export and Formatting
+        st.subheader("Excel Export")
+        st.write(f"Attendance storage backend: **{get_store().name}**")
+        if st.button("Export to Excel"):
+            try:
+                get_store().export_excel(EXCEL_FILE)
+                st.success(f"✅ Attendance exported to {EXCEL_FILE} with color formatting")
+            except Exception as e:
+                st.error(f"❌ Error exporting attendance to Excel: {e}")
+        
         if st.button("Re-apply Excel Color Formatting"):
             if apply_excel_formatting():
                 st.success("✅ Excel formatting has been applied successfully")
@@ -1279,9 +1046,180 @@ def admin_panel_page():
         st.subheader("System Information")
         st.write("Vistotech Attendance System v1.0")
         st.write("Date: May 2025")
-        st.write("Total records in database:", len(df) if not df.empty else 0)
-        st.write("Total registered employees:", len(load_employee_data()))
+        st.write("Total records in database:", total_records)
+        st.write("Total registered employees:", len(employee_registry))
+        
+        # Attendance cache effectiveness
+        cache_stats = frame_cache.stats()
+        st.write(f"Attendance cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+                 f"({cache_stats['hit_rate'] * 100:.1f}% hit rate)")
+        style_stats = style_cache.stats()
+        st.write(f"Grid styling cache: {style_stats['hits']} hits, {style_stats['misses']} misses "
+                 f"({style_stats['hit_rate'] * 100:.1f}% hit rate)")
+        chart_stats = chart_cache_stats()
+        st.write(f"Chart cache: {chart_stats['entries']} images, {chart_stats['hits']} hits, "
+                 f"{chart_stats['misses']} misses ({chart_stats['hit_rate'] * 100:.1f}% hit rate)")
+        
+        for store in store_layers(get_store()):
+            # Write-behind punch queue, when enabled
+            if hasattr(store, 'metrics'):
+                queue_stats = store.metrics()
+                st.write(f"Punch queue: depth {queue_stats['depth']} (max {queue_stats['max_depth']}), "
+                         f"{queue_stats['flushed']} punches flushed in {queue_stats['batches']} batches, "
+                         f"{queue_stats['dead_lettered']} refused by the store (see {DEAD_LETTER_FILE})")
+                st.write(f"Flush latency: last {queue_stats['last_flush_ms']:.1f} ms, "
+                         f"avg {queue_stats['avg_flush_ms']:.1f} ms, max {queue_stats['max_flush_ms']:.1f} ms "
+                         f"(every {queue_stats['interval_ms']} ms or {queue_stats['max_batch']} punches)")
+            
+            # Write-ahead journal and its last recovery
+            if hasattr(store, 'journal_stats'):
+                journal_stats = store.journal_stats()
+                st.write(f"Write journal: {journal_stats['since_checkpoint']} writes since the last checkpoint "
+                         f"(checkpoint every {journal_stats['checkpoint_every']}), "
+                         f"{journal_stats['replayed']} writes replayed at startup")
+    
+    # Tab 5: Performance
+    with admin_tab5:
+        show_performance_metrics()
+
+# Function to show the call counts and latencies of every instrumented step
+def show_performance_metrics():
+    st.subheader("Performance")
+    steps = metrics.snapshot()
+    st.caption(f"Since {datetime.fromtimestamp(metrics.started).strftime('%Y-%m-%d %H:%M:%S')}, "
+               f"across every session of this server")
+    if not steps:
+        st.info("Nothing has been timed yet.")
+        return
+    
+    summary_df = pd.DataFrame([
+        {
+            'Step': name,
+            'Calls': timing['count'],
+            'Errors': timing['errors'],
+            'Mean (ms)': timing['mean_seconds'] * 1000,
+            'p50 (ms)': timing['p50_seconds'] * 1000,
+            'p95 (ms)': timing['p95_seconds'] * 1000,
+            'p99 (ms)': timing['p99_seconds'] * 1000,
+            'Max (ms)': timing['max_seconds'] * 1000,
+            'Total (s)': timing['total_seconds']
+        }
+        for name, timing in steps.items()
+    ]).sort_values('Total (s)', ascending=False)
+    st.dataframe(summary_df.style.format(precision=1), use_container_width=True, hide_index=True)
+    st.caption("Percentiles are estimated from the latency histograms")
+    
+    # Latency histogram of one step
+    step = st.selectbox("Latency histogram for", options=summary_df['Step'].tolist(), key="performance_step")
+    buckets = steps[step]['buckets']
+    histogram = pd.DataFrame({
+        'Up to': [f"{float(bound) * 1000:g} ms" if bound != '+Inf' else "slower" for bound in buckets],
+        'Calls': list(buckets.values())
+    })
+    st.bar_chart(histogram.set_index('Up to')['Calls'], sort=False)
+    
+    # Export for Prometheus (textfile collector) or as JSON
+    st.subheader("Export Metrics")
+    export_format = st.radio("Format", options=["Prometheus text", "JSON"], horizontal=True,
+                             key="performance_format")
+    extension = ".json" if export_format == "JSON" else ".prom"
+    default_path = os.environ.get("AMS_METRICS_FILE") or f"attendance_metrics{extension}"
+    metrics_path = st.text_input("Metrics file", value=os.path.splitext(default_path)[0] + extension,
+                                 key=f"performance_path{extension}")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        if st.button("Write Metrics File"):
+            try:
+                metrics.export(metrics_path)
+                st.success(f"✅ Metrics written to {metrics_path}")
+            except Exception as e:
+                st.error(f"❌ Error writing metrics: {e}")
+    with col2:
+        st.download_button(
+            label="Download Metrics",
+            data=metrics.to_json() if extension == ".json" else metrics.to_prometheus(),
+            file_name=os.path.basename(metrics_path),
+            mime="application/json" if extension == ".json" else "text/plain"
+        )
+    with col3:
+        if st.button("Reset Metrics"):
+            metrics.reset()
+            st.rerun()
+    
+    show_profiling()
+
+# Renders that can be profiled, and how the Admin Panel names them
+PROFILED_STEPS = {
+    ALL_STEPS: "Every page render",
+    "main": "Whole rerun (any page)",
+    "punch_in_page": "Punch In page",
+    "punch_out_page": "Punch Out page",
+    "view_reports_page": "View Reports page",
+    "admin_panel_page": "Admin Panel page",
+    "render_attendance_dashboard": "Live dashboard refresh",
+}
+
+# Function to switch profiling on or off and offer the kept profiles for download
+def show_profiling():
+    st.subheader("Profiling")
+    st.caption(f"Profiler: **{profiler.engine}**. Profiling applies to every session of this server; "
+               f"the last {profiler.keep} profiles are kept in `{profiler.directory}/`.")
+    
+    steps = st.multiselect("Profile these renders", options=list(PROFILED_STEPS),
+                           default=[step for step in PROFILED_STEPS if step in profiler.steps],
+                           format_func=PROFILED_STEPS.get, key="profile_steps")
+    if st.button("Apply Profiling Settings"):
+        profiler.steps = set(steps)
+        if steps:
+            st.success("✅ Profiling is on: open the slow page, then come back here for the profile")
+        else:
+            st.success("✅ Profiling is off")
+    
+    profiles = profiler.profiles()
+    if not profiles:
+        st.info("No profiles recorded yet.")
+        return
+    
+    st.dataframe(pd.DataFrame([
+        {
+            'Started': datetime.fromtimestamp(info['started']).strftime('%Y-%m-%d %H:%M:%S'),
+            'Render': PROFILED_STEPS.get(info['step'], info['step']),
+            'Profiler': info['engine'],
+            'Duration (s)': round(info['seconds'], 3)
+        }
+        for info in profiles
+    ]), use_container_width=True, hide_index=True)
+    
+    profile_index = st.selectbox("Profile", options=range(len(profiles)), key="profile_selected",
+                                 format_func=lambda i: profiles[i]['id'])
+    info = profiles[profile_index]
+    st.caption("`.folded` holds collapsed stacks for flamegraph.pl or speedscope; "
+               "`.pstats` opens in snakeviz or `python -m pstats`")
+    download_cols = st.columns(len(info['files']))
+    for col, filename in zip(download_cols, info['files']):
+        with col:
+            st.download_button(
+                label=f"Download {os.path.splitext(filename)[1]}",
+                data=lambda name=filename: profiler.read(name),
+                file_name=filename,
+                key=f"profile_download_{filename}"
+            )
+    
+    summary_file = profiler.path(f"{info['id']}.txt")
+    if os.path.exists(summary_file):
+        with open(summary_file, encoding="utf-8") as handle:
+            st.code(handle.read(), language=None)
+
+# Function to keep the metrics file named by AMS_METRICS_FILE current
+def export_metrics():
+    try:
+        export_configured()
+    except Exception as e:
+        st.error(f"Error writing metrics: {e}")
 
 # Run the app
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    try:
+        main()
+    finally:
+        export_metrics()
\ No newline at end of file
@@ -0,0 +1,138 @@
+"""Load-test the HTTP punch API the way a bank of badge readers would use it.
+
+Starts ``attendance_api.py`` in a scratch directory, then has ``--readers``
+concurrent clients punch ``--employees`` employees in and out over HTTP.
+When they finish the script waits for ``/health`` to report no queued
+write-behind punches (that wait counts towards the throughput), stops the
+server, checks that every punch landed in the store and prints the
+throughput and latency percentiles.
+
+    python benchmarks/bench_api.py --backend sqlite --readers 16 --employees 2000
+    python benchmarks/bench_api.py --backend partitioned --port 8765
+
+Needs ``starlette``, ``uvicorn`` and ``httpx``.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from attendance_storage import BACKENDS, get_store  # noqa: E402
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(workdir, backend, port):
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "attendance_api.py"), "--backend", backend, "--port", str(port)],
+        cwd=workdir, env={**os.environ, "PYTHONPATH": ROOT}
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).raise_for_status()
+            return server
+        except httpx.HTTPError:
+            if server.poll() is not None:
+                raise RuntimeError("The punch API exited during startup")
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("The punch API did not start within 30s")
+
+
+async def _reader(client, employees, latencies, failures):
+    for emp_id in employees:
+        for path, expected in (("/punch-in", 201), ("/punch-out", 200)):
+            started = time.perf_counter()
+            response = await client.post(path, json={"employee_id": emp_id})
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != expected:
+                failures.append((path, emp_id, response.status_code, response.text))
+
+
+async def _load(port, readers, employees):
+    latencies, failures = [], []
+    ids = [f"R{i:05d}" for i in range(employees)]
+    limits = httpx.Limits(max_connections=readers)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            _reader(client, ids[r::readers], latencies, failures) for r in range(readers)
+        ))
+        elapsed = time.perf_counter() - started
+    return elapsed, latencies, failures
+
+
+def _drain(port, timeout=120):
+    # Write-behind punches are only in the store once the queue is empty
+    started = time.perf_counter()
+    while httpx.get(f"http://127.0.0.1:{port}/health", timeout=10).json()['queued']:
+        if time.perf_counter() - started > timeout:
+            raise RuntimeError(f"Queued punches were not flushed within {timeout}s")
+        time.sleep(0.01)
+    return time.perf_counter() - started
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] * 1000
+
+
+def run(backend, readers, employees, port):
+    workdir = tempfile.mkdtemp(prefix="ams-api-")
+    os.chdir(workdir)
+    get_store(backend).initialize()
+
+    server = _start_server(workdir, backend, port)
+    try:
+        elapsed, latencies, failures = asyncio.run(_load(port, readers, employees))
+        drained = _drain(port)
+    finally:
+        # The server flushes anything still queued as it shuts down
+        server.terminate()
+        server.wait(timeout=60)
+
+    df = get_store(backend).load()
+    completed = int((df['Status'] == 'Completed').sum())
+    punches = len(latencies)
+
+    print(f"backend={backend} readers={readers} employees={employees}")
+    print(f"elapsed={elapsed:.2f}s drain={drained:.2f}s "
+          f"throughput={punches / (elapsed + drained) * 60:.0f} punches/min")
+    print(f"latency p50={_percentile(latencies, 0.5):.1f}ms p95={_percentile(latencies, 0.95):.1f}ms "
+          f"p99={_percentile(latencies, 0.99):.1f}ms max={max(latencies) * 1000:.1f}ms")
+    print(f"records={len(df)} completed={completed} expected={employees} failed_requests={len(failures)}")
+    for failure in failures[:5]:
+        print("  ", *failure)
+    return len(df) == employees and completed == employees and not failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="sqlite")
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--employees", type=int, default=1000)
+    parser.add_argument("--port", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    ok = run(args.backend, args.readers, args.employees, args.port or _free_port())
+    if not ok:
+        print("LOST PUNCHES DETECTED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
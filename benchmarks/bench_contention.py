@@ -0,0 +1,104 @@
+"""Measure attendance store throughput with several kiosks writing at once.
+
+Each worker process plays one kiosk: it punches its own employees in and out
+against a shared store in a scratch directory.  When all workers finish the
+script checks that no punch was lost and prints the throughput.
+
+    python benchmarks/bench_contention.py --backend sqlite --workers 8 --punches 50
+    python benchmarks/bench_contention.py --backend excel --mode transaction
+
+``--mode punch`` uses single-record insert/update; ``--mode transaction``
+appends through ``AttendanceStore.transaction`` to exercise the optimistic
+version check and its retries.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from attendance_storage import BACKENDS, get_store  # noqa: E402
+
+
+def _record(worker, i):
+    return {
+        'Employee ID': f"{worker}-{i}",
+        'Employee Name': f"Kiosk {worker} Employee {i}",
+        'Date': "2025-05-13",
+        'Punch In Time': "09:30:00",
+        'Punch Out Time': None,
+        'Work Hours': None,
+        'Status': 'In Progress',
+        'Is Late': False
+    }
+
+
+def _worker(workdir, backend, mode, worker, punches, start_event):
+    os.chdir(workdir)
+    store = get_store(backend)
+    start_event.wait()
+    for i in range(punches):
+        record = _record(worker, i)
+        if mode == "punch":
+            record_id = store.insert(record)
+            store.update(record_id, {
+                'Punch Out Time': "18:00:00",
+                'Work Hours': 8.5,
+                'Status': 'Completed'
+            })
+        else:
+            record.update({'Punch Out Time': "18:00:00", 'Work Hours': 8.5, 'Status': 'Completed'})
+            store.transaction(lambda df, record=record: pd.concat([df, pd.DataFrame([record])], ignore_index=True))
+
+
+def run(backend, mode, workers, punches):
+    workdir = tempfile.mkdtemp(prefix="ams-contention-")
+    os.chdir(workdir)
+    get_store(backend).initialize()
+
+    start_event = multiprocessing.Event()
+    processes = [
+        multiprocessing.Process(target=_worker, args=(workdir, backend, mode, w, punches, start_event))
+        for w in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    started = time.perf_counter()
+    start_event.set()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+
+    failed = [p.exitcode for p in processes if p.exitcode != 0]
+    df = get_store(backend).load()
+    expected = workers * punches
+    completed = int((df['Status'] == 'Completed').sum())
+
+    print(f"backend={backend} mode={mode} workers={workers} punches/worker={punches}")
+    print(f"elapsed={elapsed:.2f}s throughput={expected / elapsed:.1f} punches/s")
+    print(f"records={len(df)} completed={completed} expected={expected} failed_workers={len(failed)}")
+    return len(df) == expected and completed == expected and not failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="sqlite")
+    parser.add_argument("--mode", choices=["punch", "transaction"], default="punch")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--punches", type=int, default=25)
+    args = parser.parse_args(argv)
+
+    ok = run(args.backend, args.mode, args.workers, args.punches)
+    if not ok:
+        print("LOST UPDATES DETECTED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
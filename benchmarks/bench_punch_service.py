@@ -0,0 +1,131 @@
+"""pytest-benchmark suite for the punch service against large histories.
+
+Each storage backend is filled with a synthetic history of 10k, 100k and 1M
+records, then punch in/out, status, duplicate-punch checks and admin edits
+are timed through ``PunchService`` exactly as the kiosk pages and the punch
+API run them.  A punch should cost the same whatever the history size; a
+benchmark that grows with it is a regression.
+
+    python -m pytest benchmarks/bench_punch_service.py
+    AMS_BENCH_SIZES=10000 AMS_BENCH_BACKENDS=sqlite,partitioned python -m pytest benchmarks/bench_punch_service.py
+    python -m pytest benchmarks/bench_punch_service.py --benchmark-autosave --benchmark-compare
+
+Histories come from ``attendance_generate.py`` with a fixed seed and are
+built once per backend and size in a temporary directory.
+The Excel backend rewrites its workbook on every punch, so it is only run
+at the smallest size.  Needs ``pytest-benchmark``.
+"""
+import itertools
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from attendance_employees import EmployeeRegistry  # noqa: E402
+from attendance_generate import generate_records  # noqa: E402
+from attendance_schema import DATE_FORMAT  # noqa: E402
+from attendance_service import (  # noqa: E402
+    AlreadyPunchedInError,
+    PunchService,
+    edit_fields,
+    punch_in_record,
+    punch_out_fields,
+)
+from attendance_storage import ARROW_DIR, BACKENDS, EXCEL_FILE, PARTITION_DIR, SQLITE_FILE  # noqa: E402
+
+SIZES = [int(size) for size in os.environ.get("AMS_BENCH_SIZES", "10000,100000,1000000").split(",")]
+STORE_BACKENDS = os.environ.get("AMS_BENCH_BACKENDS", ",".join(sorted(BACKENDS))).split(",")
+
+# Largest history worth rewriting as a workbook on every punch
+EXCEL_MAX_RECORDS = 10000
+
+# Employees in the synthetic history (see attendance_generate.py)
+HISTORY_EMPLOYEES = 500
+
+# "Today" for the benchmarks: the weekday after the history ends
+TODAY = datetime(2025, 6, 2, 9, 30)
+
+STORE_PATHS = {
+    'excel': EXCEL_FILE,
+    'sqlite': SQLITE_FILE,
+    'partitioned': PARTITION_DIR,
+    'arrow': ARROW_DIR,
+}
+
+
+# Function to open a bare backend (no journal or queue) inside ``directory``
+def open_backend(backend, directory):
+    store = BACKENDS[backend](os.path.join(directory, STORE_PATHS[backend]))
+    if hasattr(store, 'legacy_excel'):
+        store.legacy_excel = None
+    return store
+
+
+HISTORIES = [
+    (backend, size) for backend in STORE_BACKENDS for size in SIZES
+    if backend != 'excel' or size <= EXCEL_MAX_RECORDS
+]
+
+
+@pytest.fixture(scope="module", params=HISTORIES, ids=[f"{b}-{s}" for b, s in HISTORIES])
+def history(request, tmp_path_factory):
+    backend, size = request.param
+    directory = str(tmp_path_factory.mktemp(f"{backend}-{size}"))
+    store = open_backend(backend, directory)
+    store.initialize()
+    store.save(generate_records(size, HISTORY_EMPLOYEES, end=TODAY.date() - timedelta(days=1)), expected_version=None)
+
+    # An empty registry lets any employee ID punch, as on a fresh install
+    service = PunchService(store, EmployeeRegistry(os.path.join(directory, "employees.xlsx")), clock=lambda: TODAY)
+    service.punch_in("ON-SITE")
+    record_ids = store.query(columns=['Employee ID']).index
+    return {
+        'service': service,
+        'new_ids': (f"B{i:07d}" for i in itertools.count()),
+        'edit_id': record_ids[len(record_ids) // 2],
+    }
+
+
+def test_punch_in_and_out(benchmark, history):
+    service, new_ids = history['service'], history['new_ids']
+
+    def punch():
+        emp_id = next(new_ids)
+        service.punch_in(emp_id)
+        service.punch_out(emp_id)
+
+    benchmark(punch)
+
+
+def test_status(benchmark, history):
+    status = benchmark(history['service'].status, "ON-SITE")
+    assert status['state'] == 'punched_in'
+
+
+def test_duplicate_punch_in(benchmark, history):
+    service = history['service']
+
+    def punch_again():
+        with pytest.raises(AlreadyPunchedInError):
+            service.punch_in("ON-SITE")
+
+    benchmark(punch_again)
+
+
+def test_edit(benchmark, history):
+    record = benchmark(history['service'].edit, history['edit_id'], "10:20:00", "18:05:00")
+    assert record['Is Late'] and record['Work Hours'] == 7.75
+
+
+def test_rules(benchmark):
+    today = TODAY.strftime(DATE_FORMAT)
+
+    def apply_rules():
+        punch_in_record("1001", "Employee", today, "10:16:00")
+        punch_out_fields("10:16:00", "18:30:00")
+        edit_fields("09:05:00", "17:45:00")
+
+    benchmark(apply_rules)
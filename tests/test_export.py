@@ -0,0 +1,75 @@
+"""Exports written a chunk at a time must hold exactly what a whole-frame export would."""
+import pandas as pd
+import pytest
+
+from attendance_export import EXPORT_FORMATS, export_records
+from attendance_schema import COLUMNS, filter_dates, to_display
+from attendance_storage import PartitionedStore, SQLiteStore
+
+
+def punches():
+    records = []
+    for day in range(1, 9):
+        for emp_id in ("1001", "1002", "1003"):
+            late = emp_id == "1002" and day % 2 == 0
+            records.append({
+                'Employee ID': emp_id,
+                'Employee Name': f"Employee {emp_id}",
+                'Date': f"2025-0{5 + day % 2}-{day:02d}",
+                'Punch In Time': "10:30:00" if late else "09:00:00",
+                'Punch Out Time': None if day == 8 else "17:45:30",
+                'Work Hours': None if day == 8 else (7.26 if late else 8.76),
+                'Status': 'In Progress' if day == 8 else 'Completed',
+                'Is Late': late
+            })
+    return records
+
+
+@pytest.fixture(params=["sqlite", "partitioned"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        store = SQLiteStore(str(tmp_path / "attendance.db"), legacy_excel=None)
+    else:
+        store = PartitionedStore(str(tmp_path / "attendance"), legacy_excel=None)
+    store.initialize()
+    store.insert_many(punches())
+    return store
+
+
+def read_back(path, fmt):
+    if fmt == 'csv':
+        return pd.read_csv(path, dtype={'Employee ID': str})
+    if fmt == 'xlsx':
+        return pd.read_excel(path, dtype={'Employee ID': str})
+    return pd.read_parquet(path)
+
+
+def values(column):
+    return [None if pd.isna(value) else value for value in column.tolist()]
+
+
+@pytest.mark.parametrize("fmt", sorted(EXPORT_FORMATS))
+@pytest.mark.parametrize("filters", [
+    {},
+    {'start_date': "2025-05-03", 'end_date': "2025-06-06"},
+    {'employee_ids': ["1002"], 'is_late': True},
+])
+def test_chunked_export_matches_full_export(store, tmp_path, fmt, filters):
+    path = str(tmp_path / ("export" + EXPORT_FORMATS[fmt][1]))
+    export_records(store, fmt, path, chunk_size=4, **filters)
+
+    full = filter_dates(store.load(), filters.get('start_date'), filters.get('end_date'))
+    if 'employee_ids' in filters:
+        full = full[full['Employee ID'].isin(filters['employee_ids'])]
+    if 'is_late' in filters:
+        full = full[full['Is Late'] == filters['is_late']]
+    expected = to_display(full)[COLUMNS].reset_index(drop=True)
+
+    exported = read_back(path, fmt)
+    assert len(exported) == len(expected) > 0
+    # Sorted the same way, since stores may hand chunks over in different orders
+    key = ['Date', 'Employee ID']
+    exported = exported.sort_values(key).reset_index(drop=True)
+    expected = expected.sort_values(key).reset_index(drop=True)
+    for column in COLUMNS:
+        assert values(exported[column]) == values(expected[column]), column
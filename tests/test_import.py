@@ -0,0 +1,73 @@
+"""Imported device logs must not double employee days the store already has."""
+import io
+
+from attendance_employees import EmployeeRegistry
+from attendance_import import import_employees, import_punches
+from attendance_queue import FlushPolicy, QueuedStore
+from attendance_storage import SQLiteStore
+
+
+class Upload(io.BytesIO):
+    def __init__(self, name, text):
+        super().__init__(text.encode())
+        self.name = name
+
+
+def open_store(tmp_path):
+    store = SQLiteStore(str(tmp_path / "attendance.db"), legacy_excel=None)
+    store.initialize()
+    return store
+
+
+def open_registry(tmp_path):
+    registry = EmployeeRegistry(str(tmp_path / "employees.xlsx"))
+    import_employees(Upload("staff.csv", "Employee ID,Employee Name\n1001,Ada\n1002,Grace\n1003,Alan\n"),
+                     registry=registry)
+    return registry
+
+
+LOG = """Employee ID,Timestamp
+1001,2025-06-02 08:55:00
+1001,2025-06-02 08:55:00
+1001,2025-06-02 17:30:00
+1002,2025-06-02 09:20:00
+1003,2025-06-03 09:00:00
+1003,2025-06-03 18:00:00
+"""
+
+
+def test_reimport_adds_nothing(tmp_path):
+    store, registry = open_store(tmp_path), open_registry(tmp_path)
+
+    stats = import_punches(Upload("gate.csv", LOG), store, registry=registry)
+    assert (stats['days'], stats['added'], stats['already_recorded']) == (3, 3, 0)
+
+    stats = import_punches(Upload("gate.csv", LOG), store, registry=registry)
+    assert (stats['added'], stats['already_recorded']) == (0, 3)
+    assert len(store.load()) == 3
+
+    record = store.get(store.punch_index().completed_record("1001", "2025-06-02"))
+    assert (record['Punch In Time'], record['Punch Out Time']) == ("08:55:00", "17:30:00")
+
+
+def test_import_skips_days_punched_at_the_kiosk(tmp_path):
+    registry = open_registry(tmp_path)
+    # The kiosk punch is still queued when the import runs
+    store = QueuedStore(open_store(tmp_path), FlushPolicy(interval_ms=60000), journal_dir=str(tmp_path)).start()
+    store.insert({
+        'Employee ID': "1002",
+        'Employee Name': "Grace",
+        'Date': "2025-06-02",
+        'Punch In Time': "09:25:00",
+        'Punch Out Time': None,
+        'Work Hours': None,
+        'Status': 'In Progress',
+        'Is Late': True
+    })
+
+    stats = import_punches(Upload("gate.csv", LOG), store, registry=registry)
+    assert (stats['added'], stats['already_recorded']) == (2, 1)
+    store.stop()
+    df = store.store.load()
+    assert sorted(df['Employee ID']) == ["1001", "1002", "1003"]
+    assert df.loc[df['Employee ID'] == "1002", 'Punch In Time'].tolist() == [9 * 3600 + 25 * 60]
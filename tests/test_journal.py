@@ -0,0 +1,91 @@
+"""The journal must replay unacknowledged writes and rebuild a torn store."""
+import threading
+import time
+
+from attendance_journal import JournaledStore, read_journal
+from attendance_storage import ExcelStore, SQLiteStore
+
+
+def punch(emp_id, date="2025-06-02"):
+    return {
+        'Employee ID': emp_id,
+        'Employee Name': f"Employee {emp_id}",
+        'Date': date,
+        'Punch In Time': "09:00:00",
+        'Punch Out Time': None,
+        'Work Hours': None,
+        'Status': 'In Progress',
+        'Is Late': False
+    }
+
+
+def employees(store):
+    return sorted(store.load()['Employee ID'])
+
+
+def test_crash_before_apply_is_replayed_once(tmp_path):
+    path = str(tmp_path / "attendance.db")
+    journaled = JournaledStore(SQLiteStore(path, legacy_excel=None)).start()
+    journaled.insert_many([punch("1001")])
+    # Journaled but never applied: the process died in between
+    with journaled.journal_lock():
+        journaled._sync_position()
+        journaled._append({'op': 'insert', 'lsn': journaled._lsn + 1,
+                           'records': [punch("1002"), punch("1001")]})
+
+    reopened = JournaledStore(SQLiteStore(path, legacy_excel=None)).start()
+    assert reopened.journal_stats()['replayed'] == 1
+    # 1001 already punched in that day, so only 1002 is added
+    assert employees(reopened) == ["1001", "1002"]
+
+    again = JournaledStore(SQLiteStore(path, legacy_excel=None)).start()
+    assert again.journal_stats()['replayed'] == 0
+    assert employees(again) == ["1001", "1002"]
+
+
+def test_torn_workbook_is_rebuilt_from_checkpoint_and_journal(tmp_path):
+    path = str(tmp_path / "attendance.xlsx")
+    journaled = JournaledStore(ExcelStore(path)).start()
+    ids = journaled.insert_many([punch("1001"), punch("1002")])
+    journaled.checkpoint()
+    assert read_journal(journaled.journal_path)['events'] == []
+
+    # A bulk save journals only a marker and is checkpointed right away
+    journaled.save(journaled.load().drop(ids[0]))
+    assert read_journal(journaled.journal_path)['events'] == []
+    assert 'frame' not in open(journaled.journal_path).read()
+
+    journaled.insert_many([punch("1003")])
+    journaled.update(ids[1], {'Punch Out Time': "18:00:00", 'Status': 'Completed'})
+    expected = journaled.load()
+
+    with open(path, "wb") as handle:
+        handle.write(b"PK\x03\x04 torn")
+
+    rebuilt = JournaledStore(ExcelStore(path)).start()
+    assert rebuilt.journal_stats()['rebuilt']
+    df = rebuilt.load()
+    assert list(df.index) == list(expected.index)
+    assert employees(rebuilt) == ["1002", "1003"]
+    assert rebuilt.get(ids[1])['Punch Out Time'] == "18:00:00"
+
+
+def test_checkpoints_stay_off_the_writing_thread(tmp_path):
+    writer = threading.current_thread()
+    loads = []
+
+    class WatchedStore(ExcelStore):
+        def load(self, start_date=None, end_date=None):
+            loads.append(threading.current_thread() is writer)
+            return super().load(start_date, end_date)
+
+    journaled = JournaledStore(WatchedStore(str(tmp_path / "attendance.xlsx")), checkpoint_every=2).start()
+    loads.clear()
+    for emp_id in ("1001", "1002", "1003"):
+        journaled.insert_many([punch(emp_id)])
+
+    deadline = time.monotonic() + 10
+    while journaled.journal_stats()['checkpoints'] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert journaled.journal_stats()['checkpoints'] >= 1
+    assert loads and not any(loads)
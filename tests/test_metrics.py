@@ -0,0 +1,57 @@
+"""Step timings must add up in the snapshot and in both export formats."""
+import json
+
+import pytest
+
+from attendance_metrics import BUCKETS, Metrics, metrics, timed
+
+
+def test_timings_count_errors_and_quantiles():
+    recorded = Metrics()
+    for seconds in [0.002] * 90 + [0.2] * 10:
+        recorded.observe("render.grid", seconds)
+    recorded.observe("render.grid", 3.0, failed=True)
+
+    timing = recorded.snapshot()["render.grid"]
+    assert (timing['count'], timing['errors'], timing['max_seconds']) == (101, 1, 3.0)
+    assert timing['total_seconds'] == pytest.approx(0.18 + 2.0 + 3.0)
+    assert sum(timing['buckets'].values()) == 101
+    assert BUCKETS[0] < timing['p50_seconds'] <= 0.0025
+    assert 0.1 < timing['p95_seconds'] <= 0.25
+
+
+def test_timed_records_calls_and_errors():
+    @timed("test.decorated")
+    def work(fail=False):
+        if fail:
+            raise ValueError("boom")
+
+    work()
+    with pytest.raises(ValueError):
+        work(fail=True)
+    with timed("test.block"):
+        pass
+
+    steps = metrics.snapshot()
+    assert (steps["test.decorated"]['count'], steps["test.decorated"]['errors']) == (2, 1)
+    assert steps["test.block"]['count'] >= 1
+
+
+def test_exports_prometheus_text_and_json(tmp_path):
+    recorded = Metrics()
+    recorded.observe('load "all"', 0.004)
+    recorded.observe('load "all"', 50.0, failed=True)
+
+    recorded.export(str(tmp_path / "ams.prom"))
+    text = (tmp_path / "ams.prom").read_text()
+    name = 'ams_step_duration_seconds'
+    assert f'{name}_bucket{{step="load \\"all\\"",le="0.005"}} 1' in text
+    assert f'{name}_bucket{{step="load \\"all\\"",le="+Inf"}} 2' in text
+    assert f'{name}_count{{step="load \\"all\\""}} 2' in text
+    assert 'ams_step_errors_total{step="load \\"all\\""} 1' in text
+
+    recorded.export(str(tmp_path / "ams.json"))
+    exported = json.loads((tmp_path / "ams.json").read_text())
+    assert exported['steps']['load "all"']['count'] == 2
+    # No temporary files are left next to the exports
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["ams.json", "ams.prom"]
@@ -0,0 +1,94 @@
+"""Partitioned stores must read only the months asked for and keep ids in their month."""
+import pandas as pd
+import pytest
+
+from attendance_migrate import main as migrate
+from attendance_schema import RECORD_ID, concat_frames, normalize
+from attendance_storage import ArrowStore, ExcelStore, PartitionedStore, StorageError, partition_for_id
+
+STORES = [PartitionedStore, ArrowStore]
+
+
+def punch(emp_id, date):
+    return {
+        'Employee ID': emp_id,
+        'Employee Name': f"Employee {emp_id}",
+        'Date': date,
+        'Punch In Time': "09:00:00",
+        'Punch Out Time': None,
+        'Work Hours': None,
+        'Status': 'In Progress',
+        'Is Late': False
+    }
+
+
+@pytest.fixture(params=STORES, ids=lambda cls: cls.name)
+def store(request, tmp_path):
+    store = request.param(str(tmp_path / "attendance"), legacy_excel=None)
+    store.initialize()
+    return store
+
+
+def fill(store):
+    return store.insert_many([
+        punch("1001", "2025-05-30"),
+        punch("1002", "2025-06-02"),
+        punch("1003", "2025-06-02"),
+        punch("1004", "2025-07-01"),
+    ])
+
+
+def test_record_ids_map_to_their_month(store):
+    ids = fill(store)
+    assert [partition_for_id(i) for i in ids] == ["2025-05", "2025-06", "2025-06", "2025-07"]
+    assert store.partitions() == ["2025-05", "2025-06", "2025-07"]
+
+    store.update(ids[1], {'Punch Out Time': "18:00:00", 'Status': 'Completed'})
+    assert store.get(ids[1])['Punch Out Time'] == "18:00:00"
+    with pytest.raises(StorageError):
+        store.update(ids[1], {'Date': "2025-07-02"})
+
+    # A whole-store save keeps ids that match their month and renumbers the rest
+    added = normalize(pd.DataFrame([punch("1005", "2025-06-03")], index=pd.Index([ids[0]], name=RECORD_ID)))
+    store.save(concat_frames([store.load(), added]))
+    stored = store.load()
+    assert set(ids) < set(stored.index)
+    new_id = (set(stored.index) - set(ids)).pop()
+    assert partition_for_id(new_id) == "2025-06"
+    assert store.get(new_id)['Employee ID'] == "1005"
+    assert store.get(ids[0])['Employee ID'] == "1001"
+
+
+def test_date_bounded_loads_read_only_their_months(store, monkeypatch):
+    fill(store)
+    read = []
+    load_partition = store.load_partition
+    monkeypatch.setattr(store, 'load_partition', lambda partition: read.append(partition) or load_partition(partition))
+
+    june = store.load("2025-06-01", "2025-06-30")
+    assert read == ["2025-06"]
+    assert sorted(june['Employee ID']) == ["1002", "1003"]
+    with pytest.raises(StorageError):
+        store.save(june)
+
+    full = store.load()
+    expected = full[(full['Date'] >= "2025-06-02") & full['Employee ID'].isin(["1002", "1004"])]
+    queried = store.query("2025-06-02", "2025-07-31", employee_ids=["1002", "1004"], columns=['Employee ID', 'Date'])
+    assert list(queried.columns) == ['Employee ID', 'Date']
+    assert sorted(queried.index) == sorted(expected.index)
+    assert store.count("2025-06-01", "2025-06-30") == 2
+    assert store.date_bounds() == (pd.Timestamp("2025-05-30"), pd.Timestamp("2025-07-01"))
+
+
+def test_excel_migrates_into_arrow(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    workbook = ExcelStore(str(tmp_path / "old.xlsx"))
+    workbook.initialize()
+    fill(workbook)
+
+    assert migrate(["import-excel", "--to", "arrow", "--excel", "old.xlsx"]) == 0
+    migrated = ArrowStore(legacy_excel=None).load()
+    assert sorted(migrated['Employee ID']) == ["1001", "1002", "1003", "1004"]
+    assert all(partition_for_id(i) == d.strftime("%Y-%m") for i, d in migrated['Date'].items())
+    # A store that already has records is only replaced with --force
+    assert migrate(["import-excel", "--to", "arrow", "--excel", "old.xlsx"]) == 1
@@ -0,0 +1,57 @@
+"""Profiles must only be taken for switched-on steps and keep readable stacks on disk."""
+import json
+import re
+
+from attendance_profiling import Profiler
+
+
+def slow_sum():
+    return sum(i * i for i in range(200000))
+
+
+def render():
+    return slow_sum() + slow_sum()
+
+
+def test_profile_writes_stacks_summary_and_metadata(tmp_path):
+    profiler = Profiler(directory=str(tmp_path), steps="render_page")
+    with profiler.profile("render_page"):
+        render()
+
+    [info] = profiler.profiles()
+    assert info['step'] == "render_page"
+    assert info['seconds'] > 0
+    for filename in info['files']:
+        assert (tmp_path / filename).stat().st_size > 0
+    assert json.loads((tmp_path / f"{info['id']}.json").read_text()) == info
+
+    folded = profiler.read(f"{info['id']}.folded").decode().splitlines()
+    assert all(re.fullmatch(r"[^ ].* \d+", line) for line in folded)
+    # The time under slow_sum is reached through render
+    assert any("render (test_profiling.py" in line and "slow_sum (test_profiling.py" in line for line in folded)
+    assert b"slow_sum" in profiler.read(f"{info['id']}.txt")
+
+
+def test_only_switched_on_steps_are_profiled(tmp_path):
+    profiler = Profiler(directory=str(tmp_path), steps="render_page")
+    with profiler.profile("other_page"):
+        render()
+    assert profiler.profiles() == []
+
+    # A render inside one being profiled runs unprofiled
+    with profiler.profile("render_page"):
+        with profiler.profile("render_page"):
+            render()
+    assert len(profiler.profiles()) == 1
+
+
+def test_only_the_newest_profiles_are_kept(tmp_path):
+    profiler = Profiler(directory=str(tmp_path), keep=2, steps="all")
+    for _ in range(4):
+        with profiler.profile("render_page"):
+            slow_sum()
+
+    kept = profiler.profiles()
+    assert len(kept) == 2
+    expected = {f"{info['id']}.json" for info in kept} | {f for info in kept for f in info['files']}
+    assert {p.name for p in tmp_path.iterdir()} == expected
@@ -0,0 +1,204 @@
+"""Queued punches the store refuses must not hold up the rest of the queue."""
+import atexit
+import json
+import os
+
+from attendance_queue import DEAD_LETTER_FILE, JOURNAL_PATTERN, FlushPolicy, QueuedStore, recover_orphaned_journals
+from attendance_storage import SQLiteStore, _sort_records
+
+
+def punch(emp_id, date="2025-06-02"):
+    return {
+        'Employee ID': emp_id,
+        'Employee Name': f"Employee {emp_id}",
+        'Date': date,
+        'Punch In Time': "09:00:00",
+        'Punch Out Time': None,
+        'Work Hours': None,
+        'Status': 'In Progress',
+        'Is Late': False
+    }
+
+
+def open_store(tmp_path):
+    store = SQLiteStore(str(tmp_path / "attendance.db"), legacy_excel=None)
+    store.initialize()
+    return store
+
+
+def dead_letters(tmp_path):
+    with open(tmp_path / DEAD_LETTER_FILE, encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle]
+
+
+def test_update_to_missing_record_is_dead_lettered(tmp_path):
+    store = open_store(tmp_path)
+    queue = QueuedStore(store, FlushPolicy(interval_ms=60000), journal_dir=str(tmp_path)).start()
+    try:
+        queue.update(999, {'Punch Out Time': "18:00:00"})
+        queue.insert(punch("1001"))
+        queue.insert(punch("1002"))
+        assert queue.flush() == 2
+        assert queue.metrics()['depth'] == 0
+        assert queue.metrics()['dead_lettered'] == 1
+    finally:
+        queue.stop()
+
+    assert sorted(store.load()['Employee ID']) == ["1001", "1002"]
+    [entry] = dead_letters(tmp_path)
+    assert entry['event']['target'] == 999 and "999" in entry['error']
+    # Nothing is left behind for the next start to replay
+    assert not list(tmp_path.glob(JOURNAL_PATTERN))
+
+
+def test_orphaned_journal_with_missing_record_recovers(tmp_path):
+    store = open_store(tmp_path)
+    events = [
+        {'op': 'insert', 'record': punch("1001"), 'seq': 1},
+        {'op': 'update', 'target': 999, 'fields': {'Punch Out Time': "18:00:00"}, 'seq': 2},
+        {'op': 'insert', 'record': punch("1002"), 'seq': 3},
+    ]
+    path = tmp_path / JOURNAL_PATTERN.replace("*", "12345")
+    path.write_text("".join(json.dumps(event) + "\n" for event in events), encoding="utf-8")
+
+    assert recover_orphaned_journals(store, str(tmp_path)) == 3
+    assert sorted(store.load()['Employee ID']) == ["1001", "1002"]
+    assert len(dead_letters(tmp_path)) == 1
+    assert not os.path.exists(path)
+
+
+class CountingStore(SQLiteStore):
+    def __init__(self, path):
+        super().__init__(path, legacy_excel=None)
+        self.writes = []
+
+    def insert_many(self, records):
+        self.writes.append(('insert_many', len(records)))
+        return super().insert_many(records)
+
+    def update_many(self, updates):
+        self.writes.append(('update_many', len(updates)))
+        return super().update_many(updates)
+
+
+def test_flush_batches_interleaved_punches(tmp_path):
+    store = CountingStore(str(tmp_path / "attendance.db"))
+    store.initialize()
+    queue = QueuedStore(store, FlushPolicy(interval_ms=60000), journal_dir=str(tmp_path)).start()
+    try:
+        # Kiosk traffic: punch ins and punch outs alternate
+        for emp_id in ("1001", "1002", "1003"):
+            record_id = queue.insert(punch(emp_id))
+            queue.update(record_id, {'Punch Out Time': "18:00:00"})
+        assert queue.flush() == 6
+    finally:
+        queue.stop()
+
+    assert store.writes == [('insert_many', 3), ('update_many', 3)]
+    assert [store.get(i)['Punch Out Time'] for i in store.load().index] == ["18:00:00"] * 3
+
+
+def crash(queue):
+    # Stop the flusher without flushing and let go of the journal, as a
+    # killed process would
+    atexit.unregister(queue.stop)
+    with queue._lock:
+        queue._stopping = True
+        queue._lock.notify_all()
+    queue._thread.join()
+    queue.journal.close()
+
+
+class KioskDuringFlush(SQLiteStore):
+    def __init__(self, path):
+        super().__init__(path, legacy_excel=None)
+        self.during_insert = None
+
+    def insert_many(self, records):
+        record_ids = super().insert_many(records)
+        if self.during_insert is not None:
+            self.during_insert()
+            self.during_insert = None
+        return record_ids
+
+
+def test_punch_out_survives_crash_between_flushes(tmp_path):
+    store = KioskDuringFlush(str(tmp_path / "attendance.db"))
+    store.initialize()
+    queue = QueuedStore(store, FlushPolicy(interval_ms=60000), journal_dir=str(tmp_path)).start()
+    first = queue.insert(punch("1001"))
+    # 1002 punches out while the flush writing its punch in is under way
+    second = queue.insert(punch("1002"))
+    store.during_insert = lambda: queue.update(second, {'Punch Out Time': "17:00:00"})
+    assert queue.flush() == 2
+    # 1001 punches out after its punch in was flushed
+    queue.update(first, {'Punch Out Time': "18:00:00"})
+    crash(queue)
+
+    assert recover_orphaned_journals(store, str(tmp_path)) == 2
+    assert not os.path.exists(tmp_path / DEAD_LETTER_FILE)
+    punch_outs = {store.get(i)['Employee ID']: store.get(i)['Punch Out Time'] for i in store.load().index}
+    assert punch_outs == {"1001": "18:00:00", "1002": "17:00:00"}
+
+
+class NoFullLoads(SQLiteStore):
+    def __init__(self, path):
+        super().__init__(path, legacy_excel=None)
+        self.full_loads = 0
+
+    def load(self, start_date=None, end_date=None):
+        self.full_loads += start_date is None and end_date is None
+        return super().load(start_date, end_date)
+
+
+def test_queued_queries_and_exports_stay_pushed_down(tmp_path):
+    store = NoFullLoads(str(tmp_path / "attendance.db"))
+    store.initialize()
+    stored = store.insert_many([punch("1001", "2025-06-01"), punch("1002")])
+    queue = QueuedStore(store, FlushPolicy(interval_ms=60000), journal_dir=str(tmp_path)).start()
+    try:
+        queue.update(stored[1], {'Punch Out Time': "18:00:00"})
+        queued = queue.insert(punch("1003"))
+        queue.insert(punch("1004", "2025-06-03"))
+        store.full_loads = 0
+
+        df = queue.query("2025-06-02", "2025-06-02", columns=['Employee ID', 'Punch Out Time'])
+        assert list(df.index) == [stored[1], queued]
+        assert list(df.columns) == ['Employee ID', 'Punch Out Time']
+        assert df['Punch Out Time'].tolist()[0] == 18 * 3600 and df['Punch Out Time'].isna().tolist() == [False, True]
+        chunks = list(queue.iter_chunks(chunk_size=2))
+        assert [list(chunk.index) for chunk in chunks] == [stored, [queued, queued - 1]]
+        assert store.full_loads == 0
+    finally:
+        queue.stop()
+
+
+def test_queued_pages_merge_queued_punches(tmp_path):
+    store = open_store(tmp_path)
+    stored = store.insert_many([
+        {**punch(f"{1000 + i}", f"2025-06-0{1 + i % 3}"), 'Punch In Time': f"{8 + i % 5:02d}:{i:02d}:00",
+         'Employee Name': ["Asha", "Bilal", None][i % 3], 'Is Late': i % 4 == 0}
+        for i in range(30)
+    ])
+    queue = QueuedStore(store, FlushPolicy(interval_ms=60000), journal_dir=str(tmp_path)).start()
+    try:
+        for i in range(6):
+            queue.insert({**punch(f"{2000 + i}", f"2025-06-0{1 + i % 3}"), 'Punch In Time': f"{8 + i}:{i:02d}:30",
+                          'Employee Name': ["Chen", None][i % 2], 'Is Late': i % 2 == 0})
+        queue.update(stored[3], {'Punch Out Time': "17:00:00"})
+
+        everything = queue.load()
+        for sort_by in ('Punch In Time', 'Employee Name', 'Date'):
+            for descending in (False, True):
+                expected = _sort_records(everything, sort_by, descending)
+                for offset in (0, 3, 10, 30, 34, 40):
+                    rows, total = queue.page(sort_by=sort_by, descending=descending, offset=offset, limit=7)
+                    assert total == len(expected)
+                    assert list(rows.index) == list(expected.index[offset:offset + 7])
+        late = everything[everything['Is Late']]
+        rows, total = queue.page(is_late=True, sort_by='Punch In Time', offset=2, limit=5)
+        assert total == queue.count(is_late=True) == len(late)
+        assert list(rows.index) == list(_sort_records(late, 'Punch In Time').index[2:7])
+        assert queue.page(limit=50)[0].loc[stored[3], 'Punch Out Time'] == 17 * 3600
+    finally:
+        queue.stop()
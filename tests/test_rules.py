@@ -0,0 +1,50 @@
+"""The vectorised rules must agree with the single-punch helpers."""
+import numpy as np
+import pandas as pd
+
+from attendance_rules import (
+    calculate_hours,
+    compute_is_late,
+    compute_work_hours,
+    is_late_time,
+    recompute,
+)
+from attendance_schema import format_time, normalize
+
+
+def random_times(count, seed):
+    seconds = np.random.default_rng(seed).integers(0, 24 * 3600, count)
+    return [format_time(s) for s in seconds]
+
+
+def test_vectorised_rules_match_scalar_helpers():
+    punch_in = random_times(2000, 1) + ["10:15:00", "10:15:01", None, "23:30:00"]
+    punch_out = random_times(2000, 2) + ["18:00:00", None, "17:00:00", "01:15:00"]
+
+    late = compute_is_late(punch_in)
+    assert late.tolist() == [is_late_time(p) for p in punch_in]
+
+    hours = compute_work_hours(punch_in, punch_out)
+    expected = [calculate_hours(p, o) for p, o in zip(punch_in, punch_out)]
+    assert hours.isna().tolist() == [h is None for h in expected]
+    assert hours.dropna().tolist() == [h for h in expected if h is not None]
+
+    # A punch in at the cutoff is on time; a punch out past midnight wraps
+    assert late.tolist()[-4:] == [False, True, False, True]
+    assert hours.tolist()[-1] == 1.75
+
+
+def test_recompute_completes_punched_out_records():
+    df = normalize(pd.DataFrame({
+        'Employee ID': ["1001", "1002"],
+        'Date': ["2025-06-02", "2025-06-02"],
+        'Punch In Time': ["10:20:00", "09:00:00"],
+        'Punch Out Time': ["18:50:00", None],
+        'Status': ['In Progress', 'In Progress'],
+        'Is Late': [False, True],
+    }))
+    df = recompute(df)
+    assert df['Is Late'].tolist() == [True, False]
+    assert df['Status'].tolist() == ['Completed', 'In Progress']
+    assert df['Work Hours'].iloc[0] == np.float32(8.5)
+    assert pd.isna(df['Work Hours'].iloc[1])
@@ -0,0 +1,69 @@
+"""Frames must normalise to the canonical dtypes and survive a trip through display values."""
+from datetime import time
+
+import pandas as pd
+
+from attendance_schema import (
+    COLUMNS,
+    RECORD_ID,
+    display_record,
+    display_values,
+    empty_frame,
+    normalize,
+    to_display,
+)
+
+
+def raw_frame():
+    # The shapes old workbooks and device exports hand over
+    return pd.DataFrame({
+        'Employee ID': [1001.0, " 1002 ", 1003],
+        'Employee Name': ["Ada", "Grace", None],
+        'Date': ["2025-06-02", "2025-06-02 00:00:00", pd.Timestamp("2025-06-03")],
+        'Punch In Time': ["9:05", time(10, 30, 15), "36000"],
+        'Punch Out Time': ["17:30:00", None, "19:00:00.000000"],
+        'Work Hours': ["8.42", None, 9],
+        'Status': ['Completed', 'In Progress', 'Completed'],
+        'Is Late': ["False", "yes", 0],
+    })
+
+
+def test_normalize_gives_canonical_dtypes_and_values():
+    df = normalize(raw_frame())
+
+    assert list(df.columns) == COLUMNS
+    assert df.index.name == RECORD_ID
+    assert df['Employee ID'].dtype == 'category'
+    assert df['Employee Name'].dtype == 'category'
+    assert df['Date'].dtype.kind == 'M'
+    assert str(df['Punch In Time'].dtype) == 'Int32'
+    assert str(df['Punch Out Time'].dtype) == 'Int32'
+    assert df['Work Hours'].dtype == 'float32'
+    assert list(df['Status'].cat.categories) == ['In Progress', 'Completed']
+    assert df['Is Late'].dtype == bool
+
+    assert df['Employee ID'].tolist() == ["1001", "1002", "1003"]
+    assert df['Date'].dt.strftime('%Y-%m-%d').tolist() == ["2025-06-02", "2025-06-02", "2025-06-03"]
+    assert df['Punch In Time'].tolist() == [9 * 3600 + 5 * 60, 10 * 3600 + 30 * 60 + 15, 36000]
+    assert df['Punch Out Time'].isna().tolist() == [False, True, False]
+    assert df['Is Late'].tolist() == [False, True, False]
+
+
+def test_display_round_trip_keeps_values_and_dtypes():
+    df = normalize(raw_frame())
+    display = to_display(df)
+    assert display['Punch In Time'].tolist() == ["09:05:00", "10:30:15", "10:00:00"]
+    assert display['Punch Out Time'].tolist() == ["17:30:00", None, "19:00:00"]
+
+    pd.testing.assert_frame_equal(normalize(display), df)
+    # Single records agree with the whole-frame conversion
+    for record_id in df.index:
+        assert display_record(df, record_id) == display_values(display.loc[record_id].to_dict())
+
+
+def test_missing_columns_are_added_empty():
+    df = normalize(pd.DataFrame({'Employee ID': ["1001"], 'Date': ["2025-06-02"]}))
+    assert list(df.columns) == COLUMNS
+    assert df['Punch In Time'].isna().all()
+    assert not df['Is Late'].any()
+    pd.testing.assert_frame_equal(normalize(empty_frame()), empty_frame())
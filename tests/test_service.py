@@ -0,0 +1,60 @@
+"""Admin edits through the punch service must store HH:MM:SS and re-derive hours and lateness."""
+from datetime import datetime
+
+import pytest
+
+from attendance_employees import EmployeeRegistry
+from attendance_service import InvalidPunchError, PunchService
+from attendance_storage import SQLiteStore
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def service(tmp_path):
+    store = SQLiteStore(str(tmp_path / "attendance.db"), legacy_excel=None)
+    store.initialize()
+    # An empty registry lets anyone punch
+    registry = EmployeeRegistry(str(tmp_path / "employees.xlsx"))
+    return PunchService(store, registry, Clock(datetime(2025, 6, 2, 8, 50)))
+
+
+def test_edit_stores_typed_times_as_hh_mm_ss(service):
+    record_id = service.punch_in("1001")['Record ID']
+    service.clock.now = datetime(2025, 6, 2, 17, 20)
+    assert service.punch_out("1001")['Work Hours'] == 8.5
+
+    edited = service.edit(record_id, "10:5", "18:30")
+    stored = service.store.get(record_id)
+    assert (stored['Punch In Time'], stored['Punch Out Time']) == ("10:05:00", "18:30:00")
+    assert stored['Work Hours'] == 8.42
+    assert not stored['Is Late']
+    assert edited['Punch In Time'] == "10:05:00"
+
+
+def test_edit_without_punch_out_recomputes_from_the_stored_one(service):
+    record_id = service.punch_in("1001")['Record ID']
+    service.clock.now = datetime(2025, 6, 2, 17, 20)
+    service.punch_out("1001")
+
+    edited = service.edit(record_id, "10:20")
+    assert edited['Punch In Time'] == "10:20:00"
+    assert edited['Punch Out Time'] == "17:20:00"
+    assert edited['Work Hours'] == 7.0
+    assert edited['Is Late']
+
+
+def test_edit_of_an_open_punch_keeps_it_open(service):
+    record_id = service.punch_in("1001")['Record ID']
+    edited = service.edit(record_id, "9:00:00")
+    assert edited['Punch In Time'] == "09:00:00"
+    assert edited['Punch Out Time'] is None
+    assert edited['Status'] == 'In Progress'
+    with pytest.raises(InvalidPunchError):
+        service.edit(record_id, "nine")
@@ -0,0 +1,76 @@
+"""Record ids must survive whole-store saves; stored rollups must match the records."""
+import pandas as pd
+
+from attendance_rollups import Rollups
+from attendance_rules import recompute
+from attendance_schema import RECORD_ID, concat_frames, normalize
+from attendance_storage import SQLiteStore
+
+
+def punch(emp_id, date="2025-06-02", punch_in="09:00:00"):
+    return {
+        'Employee ID': emp_id,
+        'Employee Name': f"Employee {emp_id}",
+        'Date': date,
+        'Punch In Time': punch_in,
+        'Punch Out Time': None,
+        'Work Hours': None,
+        'Status': 'In Progress',
+        'Is Late': False
+    }
+
+
+def open_store(tmp_path):
+    store = SQLiteStore(str(tmp_path / "attendance.db"), legacy_excel=None)
+    store.initialize()
+    return store
+
+
+def test_sqlite_ids_survive_save(tmp_path):
+    store = open_store(tmp_path)
+    ids = store.insert_many([punch("1001"), punch("1002"), punch("1003")])
+    store.update(ids[1], {'Punch Out Time': "18:00:00"})
+
+    store.save(store.load())
+    assert list(store.load().index) == ids
+
+    store.transaction(recompute)
+    assert list(store.load().index) == ids
+    assert store.get(ids[1])['Punch Out Time'] == "18:00:00"
+
+
+def test_sqlite_save_gives_new_rows_fresh_ids(tmp_path):
+    store = open_store(tmp_path)
+    ids = store.insert_many([punch("1001"), punch("1002")])
+    added = normalize(pd.DataFrame([punch("1003")], index=pd.Index([0], name=RECORD_ID)))
+
+    store.save(concat_frames([store.load(), added]))
+    df = store.load()
+    assert list(df.index[:2]) == ids
+    assert df.index[2] > max(ids)
+    assert df.loc[df.index[2], 'Employee ID'] == "1003"
+
+
+def assert_rollups_match(store):
+    expected = Rollups.build(store.load())
+    for kwargs in ({}, {'employee_ids': ["1002"]}, {'is_late': False}):
+        pd.testing.assert_frame_equal(
+            store.rollups().employee_summary("2025-06-01", "2025-07-31", **kwargs),
+            expected.employee_summary("2025-06-01", "2025-07-31", **kwargs)
+        )
+        pd.testing.assert_series_equal(
+            store.rollups().late_by_date("2025-06-02", "2025-07-01", **kwargs),
+            expected.late_by_date("2025-06-02", "2025-07-01", **kwargs)
+        )
+
+
+def test_sqlite_rollups_follow_writes(tmp_path):
+    store = open_store(tmp_path)
+    ids = store.insert_many([punch("1001"), punch("1002", punch_in="10:30:00"), punch("1001", "2025-07-01")])
+    store.update(ids[1], {'Is Late': True, 'Punch Out Time': "18:00:00", 'Work Hours': 7.5})
+    # Another instance stands in for another process writing the same file
+    SQLiteStore(store.path, legacy_excel=None).update(ids[0], {'Work Hours': 8.0})
+    assert_rollups_match(store)
+
+    store.save(store.load().drop(ids[2]))
+    assert_rollups_match(store)